@@ -0,0 +1,72 @@
+"""The compiled status classifier compared with the keyword loops it replaced
+
+Classifies the same subjects with both, a few of them accented. The reports read
+the status of an email several times (table, HTML, exporter), the records keep
+it after the first one.
+
+    make bench-status
+"""
+
+import pytest
+
+from conftest import ROUNDS
+
+from email_monitor.classifier import StatusClassifier
+from email_monitor.conifg import PASS_KEYWORDS, WARNING_KEYWORDS
+from email_monitor.monitor import EmailBackup
+
+COUNT = 100_000
+OUTCOMES = ["success", "Succès", "failed", "warning", "Reușit", "Échec", "SUCCES"]
+
+
+def loop_status(subject: str) -> str:
+    """EmailBackup.get_status as it was, before the classifier"""
+    if any(pass_key in subject.lower() for pass_key in PASS_KEYWORDS):
+        return "success"
+    elif any(pass_key in subject.lower() for pass_key in WARNING_KEYWORDS):
+        return "warning"
+    else:
+        return "failure"
+
+
+@pytest.fixture(scope="module")
+def subjects():
+    return [
+        f"[Sauvegarde] Client {i % 50} - Job {i % 99} {OUTCOMES[i % len(OUTCOMES)]}"
+        for i in range(COUNT)
+    ]
+
+
+@pytest.mark.benchmark(group="status-classify")
+@pytest.mark.parametrize("classifier", ["keyword-loops", "classifier"])
+def test_classify(benchmark, subjects, classifier):
+    classify = (
+        loop_status if classifier == "keyword-loops" else StatusClassifier().classify
+    )
+
+    statuses = benchmark.pedantic(
+        lambda: [classify(subject) for subject in subjects], rounds=ROUNDS
+    )
+
+    # Accents are ignored now, "SUCCES" and "Reușit" are successes
+    benchmark.extra_info["different_statuses"] = sum(
+        status != loop_status(subject) for subject, status in zip(subjects, statuses)
+    )
+
+
+@pytest.mark.benchmark(group="status-three-reads")
+@pytest.mark.parametrize("classifier", ["keyword-loops", "cached"])
+def test_three_reads_per_email(benchmark, subjects, classifier):
+    def emails():
+        # New records every round, the cached statuses would hide the first read
+        return ([EmailBackup(s, "backup@example.com", "") for s in subjects],), {}
+
+    def read(emails):
+        for email in emails:
+            for _ in range(3):
+                if classifier == "keyword-loops":
+                    loop_status(email.subject)
+                else:
+                    email.get_status()
+
+    benchmark.pedantic(read, setup=emails, rounds=ROUNDS)
@@ -0,0 +1,96 @@
+"""Bytes on the wire of the cache syncs, plain IMAP vs COMPRESS and QRESYNC
+
+Runs the same syncs against a fake server advertising nothing, then one
+advertising COMPRESS=DEFLATE, ENABLE, CONDSTORE and QRESYNC. Every sync opens a
+new connection, as a command of the CLI does:
+
+- initial: empty cache, every header of the window is fetched
+- unchanged: nothing arrived since the previous sync
+- changed: a few messages expunged and a few delivered since
+
+The bytes both ways are in the extra info, with the cached emails whose message
+is gone after a changed sync.
+
+    make bench-imap
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import CLIENTS, run_measured
+from fake_servers import FakeIMAPServer, build_mailbox
+
+from email_monitor.cache import MailboxCache
+from email_monitor.monitor import EmailClient
+
+COUNT = 2000
+CHANGES = 10
+PLAIN = ("IMAP4rev1", "IDLE", "UIDPLUS")
+CAPABILITIES = {
+    "plain": PLAIN,
+    "extensions": PLAIN + ("ENABLE", "COMPRESS=DEFLATE", "CONDSTORE", "QRESYNC"),
+}
+
+
+@pytest.fixture(params=CAPABILITIES)
+def server(request):
+    with FakeIMAPServer(
+        build_mailbox(COUNT, CLIENTS), capabilities=CAPABILITIES[request.param]
+    ) as server:
+        yield server
+
+
+def sync(server: FakeIMAPServer, cache: MailboxCache, since: datetime) -> None:
+    email_client = EmailClient(
+        "monitor@example.com", "x", "127.0.0.1", server.port, ssl=False
+    )
+    email_client.ensure_connected()
+    cache.sync(email_client, since=since)
+    email_client.logout()
+
+
+@pytest.mark.benchmark(group="imap-sync")
+@pytest.mark.parametrize("kind", ["initial", "unchanged", "changed"])
+def test_cache_sync(benchmark, server, tmp_path, kind):
+    since = datetime.now() - timedelta(days=30)
+    path = tmp_path / "cache.sqlite3"
+    caches = []
+    expunged = []
+
+    def setup():
+        if caches:
+            caches.pop().close()
+
+        if kind == "initial":
+            path.unlink(missing_ok=True)
+
+        cache = MailboxCache(path)
+        caches.append(cache)
+
+        if kind == "initial":
+            return
+
+        sync(server, cache, since)
+
+        if kind == "changed":
+            cached = [
+                uid
+                for (uid,) in cache._db.execute("SELECT uid FROM emails ORDER BY uid")
+            ]
+            expunged[:] = cached[:CHANGES]
+            server.expunge(expunged)
+
+            for client in CLIENTS[:CHANGES]:
+                server.deliver(f"[Sauvegarde] {client} - success", "b@example.com")
+
+    run_measured(benchmark, [server], lambda: sync(server, caches[-1], since), setup)
+
+    cache = caches.pop()
+
+    if kind == "changed":
+        # Cached emails whose message is gone, shown in the reports as if not
+        stale = f"SELECT COUNT(*) FROM emails WHERE uid <= {expunged[-1]}"
+        benchmark.extra_info["stale_emails"] = cache._db.execute(stale).fetchone()[0]
+
+    cache.close()
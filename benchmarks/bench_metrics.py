@@ -0,0 +1,79 @@
+"""Bytes downloaded to read backup metrics: whole messages vs partial fetches
+
+Fills a fake IMAP server with backup reports carrying a log attachment, then
+reads the metrics of every report from the RFC822 message, as fetch_email
+would, and with the MetricsExtractor (BODYSTRUCTURE then a partial BODY.PEEK of
+the text part). The bytes are in the extra info.
+
+    make bench-metrics
+"""
+
+from email import message_from_bytes
+
+import pytest
+
+from conftest import run_measured
+from fake_servers import FakeIMAPServer, build_mailbox
+
+from email_monitor.metrics import MetricsExtractor, parse_metrics
+from email_monitor.monitor import EmailClient
+
+COUNT = 200
+ATTACHMENT_SIZE = 200_000
+
+
+@pytest.fixture(scope="module")
+def reports_server():
+    messages = build_mailbox(
+        COUNT,
+        ["Client 1", "Client 2", "Client 3"],
+        noise_ratio=0,
+        reports=True,
+        attachment_size=ATTACHMENT_SIZE,
+    )
+
+    with FakeIMAPServer(messages) as server:
+        yield server
+
+
+@pytest.fixture
+def email_client(reports_server):
+    email_client = EmailClient(
+        "monitor@example.com", "x", "127.0.0.1", reports_server.port, ssl=False
+    )
+    email_client.ensure_connected()
+
+    yield email_client
+
+    email_client.logout()
+
+
+def whole_messages(email_client: EmailClient, uids: list) -> dict:
+    metrics = {}
+
+    for uid in uids:
+        _, data = email_client.mail.uid("FETCH", str(uid), "(RFC822)")
+        message = message_from_bytes(data[0][1])
+        text = next(message.walk()).get_payload(0).get_payload(decode=True)
+        metrics[uid] = parse_metrics(text.decode())
+
+    return metrics
+
+
+def partial_fetches(email_client: EmailClient, uids: list) -> dict:
+    return dict(MetricsExtractor().fetch_metrics(email_client, uids))
+
+
+READERS = {"rfc822": whole_messages, "partial": partial_fetches}
+
+
+@pytest.mark.benchmark(group="body-metrics")
+@pytest.mark.parametrize("fetch", READERS)
+def test_read_metrics(benchmark, reports_server, email_client, fetch):
+    uids = email_client.uid_search("ALL")
+
+    metrics = run_measured(
+        benchmark, [reports_server], lambda: READERS[fetch](email_client, uids)
+    )
+
+    assert metrics == whole_messages(email_client, uids)
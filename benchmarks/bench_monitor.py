@@ -0,0 +1,100 @@
+"""Benchmarks of the monitor hot paths against the fake IMAP and SMTP servers
+
+Besides the wall time measured by pytest-benchmark, every benchmark records in
+its extra info the IMAP round trips and bytes of one run, the peak of the Python
+allocations (tracemalloc) and the peak RSS of the process.
+
+    make bench
+"""
+
+from datetime import datetime
+
+import pytest
+from typer.testing import CliRunner
+
+from conftest import run_measured
+
+from email_monitor import app
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.monitor import EmailClient, Monitor
+
+runner = CliRunner()
+
+
+def invoke(*args):
+    result = runner.invoke(app, list(args), catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def remove_cache(config_file):
+    def setup():
+        (config_file.parent / "cache.sqlite3").unlink(missing_ok=True)
+
+    return setup
+
+
+def test_cli_emails(benchmark, imap_server, config_file):
+    run_measured(
+        benchmark,
+        [imap_server],
+        lambda: invoke("emails", "--config", str(config_file), "--no-cache"),
+    )
+
+
+@pytest.mark.parametrize("cache", ["no-cache", "cold-cache", "warm-cache"])
+def test_cli_backups(benchmark, imap_server, config_file, cache):
+    date = datetime.now().strftime("%d-%m-%Y")
+    args = ["backups", date, "--config", str(config_file)]
+
+    if cache == "no-cache":
+        args.append("--no-cache")
+
+    run_measured(
+        benchmark,
+        [imap_server],
+        lambda: invoke(*args),
+        setup=remove_cache(config_file) if cache == "cold-cache" else None,
+    )
+
+
+def test_cli_send_report(benchmark, imap_server, smtp_server, config_file):
+    date = datetime.now().strftime("%d-%m-%Y")
+
+    run_measured(
+        benchmark,
+        [imap_server, smtp_server],
+        lambda: invoke(
+            "send-report",
+            date,
+            "--config",
+            str(config_file),
+            "--no-cache",
+            "--to-address",
+            "ops@example.com",
+            "--subject",
+            "Backups",
+        ),
+    )
+
+    assert smtp_server.messages
+
+
+@pytest.mark.parametrize("server_side_filter", [True, False])
+def test_monitor_get_backups(benchmark, imap_server, config_file, server_side_filter):
+    app_config = Config(config_file)
+    monitor = Monitor(
+        ClientService(app_config),
+        email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+        server_side_filter=server_side_filter,
+    )
+
+    try:
+        backups = run_measured(
+            benchmark, [imap_server], lambda: monitor.get_backups(datetime.now())
+        )
+    finally:
+        monitor.logout()
+
+    assert any(backups.values())
@@ -0,0 +1,54 @@
+"""Fetch and parse of a large window, headers parsed inline vs by worker processes
+
+Runs the same search against the fake server, parsing the FETCH chunks in the
+connection's process then in pools of worker processes started with the first
+chunk, as in a command. The parsing of a chunk overlaps the FETCH of the next
+ones, which pays off with a latency:
+
+    EMAIL_MONITOR_BENCH_SIZES=20000 EMAIL_MONITOR_BENCH_LATENCY=0.02 make bench-parse
+"""
+
+from datetime import datetime, timedelta
+import os
+
+import pytest
+
+from conftest import run_measured
+
+from email_monitor.monitor import EmailClient, ParsePool
+
+SINCE = datetime.now() - timedelta(days=30)
+QUERY = f'(SINCE "{SINCE:%d-%b-%Y}")'
+
+
+def search(server, workers: int) -> list:
+    pool = ParsePool(workers) if workers else None
+    email_client = EmailClient(
+        "monitor@example.com", "x", "127.0.0.1", server.port, ssl=False, pool=pool
+    )
+    email_client.ensure_connected()
+
+    try:
+        return [email.uid for email in email_client.iter_emails(QUERY)]
+    finally:
+        email_client.logout()
+
+        if pool:
+            pool.close()
+
+
+@pytest.fixture(scope="module")
+def expected_uids(imap_server):
+    return search(imap_server, 0)
+
+
+@pytest.mark.benchmark(group="header-parse")
+@pytest.mark.parametrize(
+    "workers",
+    sorted({0, 2, os.cpu_count() or 1}),
+    ids=lambda workers: f"{workers}workers" if workers else "inline",
+)
+def test_fetch_and_parse(benchmark, imap_server, expected_uids, workers):
+    uids = run_measured(benchmark, [imap_server], lambda: search(imap_server, workers))
+
+    assert uids == expected_uids, "the workers changed the emails found"
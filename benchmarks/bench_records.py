@@ -0,0 +1,56 @@
+"""The EmailBackup record compared with the pydantic model it replaced
+
+Builds the same emails with both classes, from already parsed values like
+parse_headers does. The tracemalloc peak of the extra info is the memory the
+records hold.
+
+    make bench-records
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Union
+
+from pydantic import BaseModel
+import pytest
+
+from conftest import run_measured
+
+from email_monitor.monitor import EmailBackup
+
+COUNT = 100_000
+
+
+class PydanticEmailBackup(BaseModel):
+    """EmailBackup as it was, before it became a slotted record"""
+
+    subject: str
+    sender: str
+    date: Union[datetime, str]
+
+
+@pytest.fixture(scope="module")
+def values():
+    start = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+    return [
+        (
+            f"[Sauvegarde] Client {i % 50} - Job {i % 99} success",
+            f"backup-{i % 50}@example.com",
+            start + timedelta(seconds=i),
+        )
+        for i in range(COUNT)
+    ]
+
+
+@pytest.mark.benchmark(group="email-records")
+@pytest.mark.parametrize(
+    "record", [PydanticEmailBackup, EmailBackup], ids=["pydantic", "slotted"]
+)
+def test_build_records(benchmark, values, record):
+    records = run_measured(
+        benchmark,
+        [],
+        lambda: [record(subject=s, sender=f, date=d) for s, f, d in values],
+    )
+
+    assert len(records) == COUNT
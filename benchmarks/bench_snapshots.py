@@ -0,0 +1,65 @@
+"""A send-report --on-change run with nothing new compared with a full report
+
+Times what a run does before any network access: rendering the full report as
+send-report does for one recipient, then comparing the statuses with the last
+snapshot as a send-report --on-change run does when nothing changed. The SMTP
+traffic saved on top is one email per recipient and --to-clients client.
+
+    make bench-snapshots
+"""
+
+from datetime import datetime, timedelta
+from functools import partial
+
+import pytest
+
+from email_monitor import rendering
+from email_monitor.monitor import EmailBackup
+from email_monitor.snapshots import SnapshotStore, client_states
+
+CLIENTS = 500
+OUTCOMES = ["success", "failed", "warning"]
+SCOPE = "send-report:Rapport"
+
+
+@pytest.fixture(scope="module")
+def results():
+    now = datetime.now()
+
+    return {
+        f"Client {i}": [
+            EmailBackup(
+                f"[Sauvegarde] Client {i} - Job {i % 99} {OUTCOMES[i % 3]}",
+                "backup@example.com",
+                now - timedelta(minutes=i),
+            )
+        ]
+        for i in range(CLIENTS)
+    }
+
+
+@pytest.mark.benchmark(group="send-report")
+def test_full_report(benchmark, results):
+    def render():
+        # The cache of the rendered reports would hide the cost across runs
+        rendering._cache.clear()
+        return rendering.report_emails(
+            partial(rendering.results_report, results), "Rapport", ["ops@example.com"]
+        )
+
+    assert len(benchmark(render)) == 1
+
+
+@pytest.mark.benchmark(group="send-report")
+def test_on_change_without_change(benchmark, results, tmp_path):
+    snapshots = SnapshotStore(tmp_path / "snapshots.sqlite3")
+    snapshots.save(SCOPE, client_states(results))
+
+    try:
+        transitions = benchmark(
+            lambda: snapshots.changes(SCOPE, client_states(results))
+        )
+    finally:
+        snapshots.close()
+
+    assert not transitions
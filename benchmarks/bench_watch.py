@@ -0,0 +1,77 @@
+"""A refresh of the watch status board compared with rebuilding the backups table
+
+Every refresh changes the backup of one client, then prints the table of every
+client, as console.build_table (the backups command) then as the StatusBoard of
+monitor watch.
+
+    make bench-watch
+"""
+
+from datetime import datetime, timedelta
+import io
+from itertools import count
+
+import pytest
+from rich.console import Console
+
+from email_monitor.console import console as app_console
+from email_monitor.dashboard import StatusBoard
+from email_monitor.monitor import EmailBackup
+
+CLIENTS = 200
+OUTCOMES = ["success", "failed", "warning"]
+
+
+def build_status() -> dict:
+    now = datetime.now()
+
+    return {
+        f"Client {i}": EmailBackup(
+            f"[Sauvegarde] Client {i} - Job {i % 99} {OUTCOMES[i % 3]}",
+            "backup@example.com",
+            now - timedelta(minutes=i),
+        )
+        for i in range(CLIENTS)
+    }
+
+
+def build_table(status: dict):
+    """The Rich table of the backups command, built from scratch"""
+    return app_console.build_table(
+        title="Sauvegardes",
+        header=["Client", "Email", "Date", "Status"],
+        rows=[
+            [client, email.subject, email.date.strftime("%d-%m-%Y %H:%M"), "ok"]
+            for client, email in status.items()
+        ],
+    )
+
+
+@pytest.mark.benchmark(group="watch-refresh")
+@pytest.mark.parametrize("view", ["rebuilt-table", "status-board"])
+def test_refresh(benchmark, view):
+    console = Console(file=io.StringIO(), width=130, color_system="256")
+    status = build_status()
+    board = StatusBoard(status)
+    clients = list(status)
+    refreshes = count()
+
+    current = status if view == "rebuilt-table" else board.status
+
+    def refresh():
+        client = clients[next(refreshes) % len(clients)]
+        email = current[client]
+        email = EmailBackup(f"{email.subject} !", email.sender, email.date)
+
+        if view == "rebuilt-table":
+            status[client] = email
+            console.print(build_table(status))
+        else:
+            board.update(client, email)
+            console.print(board)
+
+    console.print(board)
+    benchmark(refresh)
+
+    if view == "status-board":
+        benchmark.extra_info["rows_rendered"] = board.rendered_rows
@@ -0,0 +1,117 @@
+"""Fixtures of the benchmark suite: fake servers seeded with synthetic mailboxes
+
+The mailbox sizes and the latency added to every command are read from the
+environment so the same suite covers quick local runs and large mailboxes:
+
+    EMAIL_MONITOR_BENCH_SIZES=10000,100000 EMAIL_MONITOR_BENCH_LATENCY=0.02 make bench
+"""
+
+import json
+import os
+from pathlib import Path
+import resource
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_servers import FakeIMAPServer, FakeSMTPServer, build_mailbox
+
+CLIENTS = [f"Client {i}" for i in range(1, 21)]
+SIZES = [
+    int(size)
+    for size in os.environ.get("EMAIL_MONITOR_BENCH_SIZES", "10000").split(",")
+]
+LATENCY = float(os.environ.get("EMAIL_MONITOR_BENCH_LATENCY", "0"))
+ROUNDS = int(os.environ.get("EMAIL_MONITOR_BENCH_ROUNDS", "3"))
+
+
+def run_measured(benchmark, servers, function, setup=None):
+    """Benchmark function and attach the traffic and memory of one run
+
+    Args:
+        benchmark: pytest-benchmark fixture
+        servers (list): Fake servers whose counters are reported
+        function (Callable): Code measured, called without arguments
+        setup (Callable): Called before every round, outside of the timing
+    """
+
+    def reset():
+        if setup:
+            setup()
+
+        for server in servers:
+            server.counters.reset()
+
+    result = benchmark.pedantic(function, setup=reset, rounds=ROUNDS)
+
+    # Counters of the last round only
+    for server in servers:
+        name = type(server).__name__.replace("Fake", "").replace("Server", "").lower()
+        benchmark.extra_info[f"{name}_round_trips"] = server.counters.round_trips
+        benchmark.extra_info[f"{name}_bytes_sent"] = server.counters.bytes_sent
+        benchmark.extra_info[f"{name}_bytes_received"] = server.counters.bytes_received
+
+    # Separate run, tracemalloc slows the code down too much to be timed
+    reset()
+    tracemalloc.start()
+    try:
+        function()
+        benchmark.extra_info["tracemalloc_peak_kb"] = (
+            tracemalloc.get_traced_memory()[1] // 1024
+        )
+    finally:
+        tracemalloc.stop()
+
+    benchmark.extra_info["peak_rss_kb"] = resource.getrusage(
+        resource.RUSAGE_SELF
+    ).ru_maxrss
+
+    return result
+
+
+@pytest.fixture(scope="session", params=SIZES, ids=lambda size: f"{size}msgs")
+def imap_server(request):
+    with FakeIMAPServer(build_mailbox(request.param, CLIENTS), latency=LATENCY) as s:
+        s.size = request.param
+        yield s
+
+
+@pytest.fixture(scope="session")
+def smtp_server():
+    with FakeSMTPServer(latency=LATENCY) as server:
+        yield server
+
+
+@pytest.fixture
+def config_file(tmp_path, imap_server, smtp_server, monkeypatch):
+    """Configuration pointing to the fake servers, with an empty cache"""
+    config = {
+        "clients": [
+            {"name": name, "email": f"{name.lower().replace(' ', '')}@example.com"}
+            for name in CLIENTS
+        ],
+        "email": {
+            "server": "127.0.0.1",
+            "port": imap_server.port,
+            "ssl": False,
+            "smtp_server": "127.0.0.1",
+            "smtp_port": smtp_server.port,
+            "email": "monitor@example.com",
+            "password": "secret",
+        },
+        "cache_file": str(tmp_path / "cache.sqlite3"),
+        "snapshot_file": str(tmp_path / "snapshots.sqlite3"),
+    }
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+
+    monkeypatch.setenv("EMAIL_MONITOR_CONFIG", str(path))
+
+    yield path
+
+    from email_monitor import get_app_config
+
+    get_app_config.cache_clear()
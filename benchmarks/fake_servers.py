@@ -0,0 +1,851 @@
+"""In-process stand-ins for the IMAP and SMTP servers of the monitor
+
+Only the subset of IMAP4rev1 the monitor speaks is implemented: LOGIN, SELECT,
+SEARCH/UID SEARCH, FETCH/UID FETCH (BODYSTRUCTURE and partial BODY sections
+included), STATUS, NOOP, IDLE and LOGOUT, plus COMPRESS=DEFLATE, ENABLE and the
+CONDSTORE/QRESYNC modification sequences when advertised. Every command and
+every byte going through the sockets is counted so benchmarks can report round
+trips and bandwidth, compressed bytes as sent on the wire.
+"""
+
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.header import Header
+from email.utils import format_datetime
+import random
+import re
+import select
+import socketserver
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MONTHS = {
+    m: i
+    for i, m in enumerate(
+        [
+            "Jan",
+            "Feb",
+            "Mar",
+            "Apr",
+            "May",
+            "Jun",
+            "Jul",
+            "Aug",
+            "Sep",
+            "Oct",
+            "Nov",
+            "Dec",
+        ],
+        1,
+    )
+}
+
+TOKEN_PATTERN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+BOUNDARY = "fake-boundary"
+CHANGEDSINCE_PATTERN = re.compile(rb"\s*\(CHANGEDSINCE (\d+)( VANISHED)?\)\s*$", re.I)
+SECTION_PATTERN = re.compile(rb"(BODY(?:\.PEEK)?)\[([^\]]*)\](?:<(\d+)\.(\d+)>)?")
+
+
+@dataclass
+class FakeMessage:
+    uid: int
+    subject: str
+    sender: str
+    date: datetime
+    body: bytes = b""
+    seen: bool = False
+    # Makes the message multipart/mixed: the body, then this file in base64
+    attachment: bytes = b""
+    # Modification sequence, its UID when 0
+    modseq: int = 0
+
+    def headers(self) -> bytes:
+        subject = self.subject
+
+        if not subject.isascii():
+            subject = Header(subject, "utf-8").encode()
+
+        if self.attachment:
+            content_type = f'multipart/mixed; boundary="{BOUNDARY}"'
+        else:
+            content_type = 'text/plain; charset="utf-8"'
+
+        return (
+            f"Subject: {subject}\r\n"
+            f"From: {self.sender}\r\n"
+            f"Date: {format_datetime(self.date)}\r\n"
+            f"Message-ID: <{self.uid}@fake>\r\n"
+            "MIME-Version: 1.0\r\n"
+            f"Content-Type: {content_type}\r\n"
+            "\r\n"
+        ).encode()
+
+    def text(self) -> bytes:
+        """Everything after the headers, BODY[TEXT]"""
+        if not self.attachment:
+            return self.body
+
+        boundary = b"--" + BOUNDARY.encode()
+
+        return b"\r\n".join(
+            [
+                boundary,
+                b'Content-Type: text/plain; charset="utf-8"',
+                b"",
+                self.body,
+                boundary,
+                b"Content-Type: application/zip",
+                b"Content-Transfer-Encoding: base64",
+                b'Content-Disposition: attachment; filename="logs.zip"',
+                b"",
+                self.encoded_attachment(),
+                boundary + b"--",
+                b"",
+            ]
+        )
+
+    def encoded_attachment(self) -> bytes:
+        return base64.encodebytes(self.attachment).replace(b"\n", b"\r\n")
+
+    def bodystructure(self) -> bytes:
+        lines = self.body.count(b"\n")
+        text = (
+            b'("text" "plain" ("charset" "utf-8") NIL NIL "7bit" '
+            + f"{len(self.body)} {lines} NIL NIL NIL)".encode()
+        )
+
+        if not self.attachment:
+            return text
+
+        attachment = (
+            b'("application" "zip" ("name" "logs.zip") NIL NIL "base64" '
+            + str(len(self.encoded_attachment())).encode()
+            + b' NIL ("attachment" ("filename" "logs.zip")) NIL)'
+        )
+
+        return b'(%s%s "mixed" ("boundary" "%s") NIL NIL)' % (
+            text,
+            attachment,
+            BOUNDARY.encode(),
+        )
+
+    def rfc822(self) -> bytes:
+        return self.headers() + self.text()
+
+
+@dataclass
+class Counters:
+    commands: Dict[str, int] = field(default_factory=dict)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    connections: int = 0
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.commands.values())
+
+    def reset(self) -> None:
+        self.commands.clear()
+        self.bytes_sent = self.bytes_received = self.connections = 0
+
+
+def build_mailbox(
+    size: int,
+    clients: List[str],
+    end: Optional[datetime] = None,
+    span: timedelta = timedelta(days=7),
+    body_size: int = 0,
+    noise_ratio: float = 0.5,
+    seed: int = 0,
+    reports: bool = False,
+    attachment_size: int = 0,
+) -> List[FakeMessage]:
+    """Build a synthetic mailbox with backup reports and unrelated emails
+
+    Args:
+        size (int): Number of messages
+        clients (List[str]): Client names used in the backup subjects
+        end (Optional[datetime]): Date of the newest message, now by default
+        span (timedelta): Time between the oldest and the newest message
+        body_size (int): Size of each body, stands for the log attachments
+        noise_ratio (float): Share of messages that are not backup reports
+        seed (int): Random seed, the same seed gives the same mailbox
+        reports (bool): Backup emails get a Veeam-like summary as body
+        attachment_size (int): Bytes of the log file attached to backup emails
+
+    Returns:
+        List[FakeMessage]: Messages sorted by date, UIDs start at 1
+    """
+    rng = random.Random(seed)
+    attachment = rng.randbytes(attachment_size)
+    end = end or datetime.now(timezone.utc)
+    step = span / max(size, 1)
+    body = (b"x" * 76 + b"\r\n") * (body_size // 78) if body_size else b""
+
+    messages = []
+
+    for i in range(size):
+        date = end - span + step * (i + 1)
+
+        if rng.random() < noise_ratio:
+            subject = f"Newsletter {rng.randint(1, 10_000)}"
+            sender = "news@example.com"
+        else:
+            client = rng.choice(clients)
+            status = rng.choice(["success", "succès", "warning", "failed"])
+            subject = f"[Sauvegarde] {client} - Job {rng.randint(1, 99)} {status}"
+            sender = f"backup-{client.lower().replace(' ', '')}@example.com"
+
+            if reports or attachment:
+                messages.append(
+                    FakeMessage(
+                        i + 1,
+                        subject,
+                        sender,
+                        date,
+                        _report(rng, status) if reports else body,
+                        attachment=attachment,
+                    )
+                )
+                continue
+
+        messages.append(FakeMessage(i + 1, subject, sender, date, body))
+
+    return messages
+
+
+def _report(rng: random.Random, status: str) -> bytes:
+    errors = int(status == "failed")
+    warnings = int(status == "warning")
+
+    return (
+        "Veeam Backup & Replication\r\n"
+        f"Success {3 - errors - warnings}   Warning {warnings}   Error {errors}\r\n"
+        f"Duration 0:{rng.randint(1, 59):02d}:{rng.randint(0, 59):02d}\r\n"
+        f"Transferred {rng.randint(1, 900)}.{rng.randint(0, 9)} GB\r\n"
+    ).encode()
+
+
+class _Mailbox:
+    def __init__(self, messages: List[FakeMessage], uidvalidity: int) -> None:
+        self.messages = messages
+        self.uidvalidity = uidvalidity
+        # Modification sequence of the expunged UIDs, for VANISHED
+        self.expunged: Dict[int, int] = {}
+
+        for message in messages:
+            message.modseq = message.modseq or message.uid
+
+        self.highestmodseq = max((m.modseq for m in messages), default=1)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    @property
+    def uidnext(self) -> int:
+        return (self.messages[-1].uid if self.messages else 0) + 1
+
+
+class FakeIMAPServer:
+    def __init__(
+        self,
+        messages: List[FakeMessage] = None,
+        latency: float = 0.0,
+        capabilities: Tuple[str, ...] = ("IMAP4rev1", "IDLE", "UIDPLUS"),
+        uidvalidity: int = 1,
+    ) -> None:
+        """Threaded IMAP server listening on localhost
+
+        Args:
+            messages (List[FakeMessage]): INBOX content
+            latency (float): Seconds slept before answering each command
+            capabilities (Tuple[str, ...]): Advertised capabilities
+            uidvalidity (int): UIDVALIDITY of INBOX
+        """
+        self.mailbox = _Mailbox(list(messages or []), uidvalidity)
+        self.latency = latency
+        self.capabilities = capabilities
+        self.counters = Counters()
+
+        server = self
+
+        class Handler(_IMAPHandler):
+            imap = server
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeIMAPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeIMAPServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def deliver(self, subject: str, sender: str, date: datetime = None, body=b""):
+        """Append a message to INBOX and wake up the IDLE connections"""
+        with self.mailbox.changed:
+            self.mailbox.highestmodseq += 1
+            message = FakeMessage(
+                self.mailbox.uidnext,
+                subject,
+                sender,
+                date or datetime.now(timezone.utc),
+                body,
+                modseq=self.mailbox.highestmodseq,
+            )
+            self.mailbox.messages.append(message)
+            self.mailbox.changed.notify_all()
+            return message
+
+    def expunge(self, uids: List[int]) -> None:
+        """Remove messages from INBOX, each expunge raises HIGHESTMODSEQ"""
+        with self.mailbox.lock:
+            mailbox = self.mailbox
+            removed = set(uids) & {m.uid for m in mailbox.messages}
+            mailbox.messages = [m for m in mailbox.messages if m.uid not in removed]
+
+            for uid in sorted(removed):
+                mailbox.highestmodseq += 1
+                mailbox.expunged[uid] = mailbox.highestmodseq
+
+    def reset_uidvalidity(self, uidvalidity: int) -> None:
+        with self.mailbox.lock:
+            self.mailbox.uidvalidity = uidvalidity
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+    imap: FakeIMAPServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.imap.counters.connections += 1
+        self.selected = False
+        self.compressor = self.decompressor = None
+        self.inflated = b""
+
+    # -- I/O --------------------------------------------------------------
+
+    def send(self, data: bytes) -> None:
+        if self.compressor:
+            data = self.compressor.compress(data) + self.compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+
+        self.imap.counters.bytes_sent += len(data)
+        self.wfile.write(data)
+
+    def read_line(self) -> bytes:
+        if not self.decompressor:
+            line = self.rfile.readline()
+            self.imap.counters.bytes_received += len(line)
+            return line
+
+        while b"\n" not in self.inflated:
+            data = self.rfile.read1(65536)
+
+            if not data:
+                break
+
+            self.imap.counters.bytes_received += len(data)
+            self.inflated += self.decompressor.decompress(data)
+
+        line, newline, self.inflated = self.inflated.partition(b"\n")
+        return line + newline
+
+    def handle(self) -> None:
+        self.send(b"* OK Fake IMAP server ready\r\n")
+
+        while True:
+            line = self.read_line()
+
+            if not line:
+                return
+
+            tag, _, rest = line.rstrip(b"\r\n").partition(b" ")
+            command, _, args = rest.partition(b" ")
+            command = command.upper().decode()
+
+            if command == "UID":
+                sub, _, args = args.partition(b" ")
+                command = "UID " + sub.upper().decode()
+
+            counters = self.imap.counters.commands
+            counters[command] = counters.get(command, 0) + 1
+
+            if self.imap.latency:
+                time.sleep(self.imap.latency)
+
+            handler = getattr(self, "do_" + command.replace(" ", "_"), None)
+
+            try:
+                if handler is None:
+                    self.send(tag + b" BAD Unknown command\r\n")
+                elif handler(tag, args) is False:
+                    return
+            except (ValueError, IndexError, KeyError) as ex:
+                self.send(tag + f" BAD {ex}\r\n".encode())
+
+    # -- Commands ---------------------------------------------------------
+
+    def do_CAPABILITY(self, tag, args):
+        self.send(f"* CAPABILITY {' '.join(self.imap.capabilities)}\r\n".encode())
+        self.send(tag + b" OK CAPABILITY completed\r\n")
+
+    def do_COMPRESS(self, tag, args):
+        if "COMPRESS=DEFLATE" not in self.imap.capabilities:
+            self.send(tag + b" BAD COMPRESS not supported\r\n")
+            return
+
+        self.send(tag + b" OK DEFLATE active\r\n")
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        self.decompressor = zlib.decompressobj(-15)
+
+    def do_ENABLE(self, tag, args):
+        enabled = [
+            name
+            for name in args.decode().upper().split()
+            if name in self.imap.capabilities
+        ]
+        self.send(f"* ENABLED {' '.join(enabled)}\r\n".encode())
+        self.send(tag + b" OK ENABLE completed\r\n")
+
+    def do_STATUS(self, tag, args):
+        mailbox = self.imap.mailbox
+        name, _, items = args.partition(b" ")
+        values = {
+            "MESSAGES": len(mailbox.messages),
+            "UIDNEXT": mailbox.uidnext,
+            "UIDVALIDITY": mailbox.uidvalidity,
+            "HIGHESTMODSEQ": mailbox.highestmodseq,
+        }
+        answer = " ".join(
+            f"{item} {values[item]}"
+            for item in items.decode().upper().strip("()").split()
+        )
+        self.send(b"* STATUS " + name + f" ({answer})\r\n".encode())
+        self.send(tag + b" OK STATUS completed\r\n")
+
+    def do_LOGIN(self, tag, args):
+        self.send(tag + b" OK LOGIN completed\r\n")
+
+    def do_LOGOUT(self, tag, args):
+        self.send(b"* BYE Logging out\r\n")
+        self.send(tag + b" OK LOGOUT completed\r\n")
+        return False
+
+    def do_NOOP(self, tag, args):
+        self._send_exists_update()
+        self.send(tag + b" OK NOOP completed\r\n")
+
+    def do_SELECT(self, tag, args):
+        mailbox = self.imap.mailbox
+
+        with mailbox.lock:
+            self.known_exists = len(mailbox.messages)
+            self.send(
+                f"* {self.known_exists} EXISTS\r\n"
+                "* 0 RECENT\r\n"
+                f"* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid\r\n"
+                f"* OK [UIDNEXT {mailbox.uidnext}] Predicted next UID\r\n"
+                "* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)\r\n".encode()
+            )
+
+            if "CONDSTORE" in self.imap.capabilities:
+                self.send(
+                    f"* OK [HIGHESTMODSEQ {mailbox.highestmodseq}] Highest\r\n".encode()
+                )
+
+        self.selected = True
+        self.send(tag + b" OK [READ-WRITE] SELECT completed\r\n")
+
+    do_EXAMINE = do_SELECT
+
+    def do_SEARCH(self, tag, args, uid=False):
+        messages = self._snapshot()
+        tokens = TOKEN_PATTERN.findall(args)
+
+        if tokens and tokens[0].upper() == b"CHARSET":
+            tokens = tokens[2:]
+
+        predicate = _parse_search(tokens, len(messages), messages)
+
+        result = [
+            str(m.uid if uid else seq)
+            for seq, m in enumerate(messages, 1)
+            if predicate(seq, m)
+        ]
+
+        self.send(f"* SEARCH {' '.join(result)}\r\n".encode().replace(b" \r", b"\r"))
+        self.send(tag + b" OK SEARCH completed\r\n")
+
+    def do_UID_SEARCH(self, tag, args):
+        self.do_SEARCH(tag, args, uid=True)
+
+    def do_FETCH(self, tag, args, uid=False):
+        messages = self._snapshot()
+        message_set, _, items = args.partition(b" ")
+        modifier = CHANGEDSINCE_PATTERN.search(items)
+        changed_since = int(modifier.group(1)) if modifier else None
+
+        if modifier:
+            items = items[: modifier.start()] + b" MODSEQ"
+
+        if uid:
+            by_uid = {m.uid: (seq, m) for seq, m in enumerate(messages, 1)}
+            last = messages[-1].uid if messages else 0
+            wanted = [by_uid[u] for u in _parse_set(message_set, last) if u in by_uid]
+            # "n:*" always includes the last message
+            if message_set.endswith(b"*") and messages and not wanted:
+                wanted = [(len(messages), messages[-1])]
+        else:
+            wanted = [
+                (seq, messages[seq - 1])
+                for seq in _parse_set(message_set, len(messages))
+                if 0 < seq <= len(messages)
+            ]
+
+        if changed_since is not None:
+            wanted = [(seq, m) for seq, m in wanted if m.modseq > changed_since]
+
+            if uid and modifier.group(2):
+                requested = set(_parse_set(message_set, last))
+                vanished = [
+                    str(expunged)
+                    for expunged, modseq in sorted(self.imap.mailbox.expunged.items())
+                    if modseq > changed_since and expunged in requested
+                ]
+
+                if vanished:
+                    self.send(f"* VANISHED (EARLIER) {','.join(vanished)}\r\n".encode())
+
+        for seq, message in wanted:
+            self.send(self._fetch_response(seq, message, items, uid))
+
+        self.send(tag + b" OK FETCH completed\r\n")
+
+    def do_UID_FETCH(self, tag, args):
+        self.do_FETCH(tag, args, uid=True)
+
+    def do_IDLE(self, tag, args):
+        self.send(b"+ idling\r\n")
+        mailbox = self.imap.mailbox
+
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], 0.05)
+
+            if readable:
+                line = self.read_line()
+
+                if not line or line.strip().upper() == b"DONE":
+                    break
+
+            self._send_exists_update()
+
+        self.send(tag + b" OK IDLE terminated\r\n")
+
+    # -- Helpers ----------------------------------------------------------
+
+    def _snapshot(self) -> List[FakeMessage]:
+        with self.imap.mailbox.lock:
+            return list(self.imap.mailbox.messages)
+
+    def _send_exists_update(self) -> None:
+        with self.imap.mailbox.lock:
+            exists = len(self.imap.mailbox.messages)
+
+        if self.selected and exists != self.known_exists:
+            self.known_exists = exists
+            self.send(f"* {exists} EXISTS\r\n".encode())
+
+    def _fetch_response(self, seq: int, message: FakeMessage, items: bytes, uid: bool):
+        parts = []
+        literal_items = []
+
+        upper = items.upper()
+
+        if uid or b"UID" in re.sub(rb"\[.*?\]", b"", upper).split():
+            parts.append(f"UID {message.uid}".encode())
+
+        if b"FLAGS" in re.sub(rb"\[.*?\]", b"", upper).split():
+            parts.append(b"FLAGS (\\Seen)" if message.seen else b"FLAGS ()")
+
+        if b"MODSEQ" in upper.split():
+            parts.append(f"MODSEQ ({message.modseq})".encode())
+
+        if re.search(rb"(?<![.\w])BODYSTRUCTURE(?![.\w])", upper):
+            parts.append(b"BODYSTRUCTURE " + message.bodystructure())
+
+        if re.search(rb"(?<![.\w])RFC822(?![.\w])", upper):
+            literal_items.append((b"RFC822", message.rfc822()))
+            message.seen = True
+
+        for match in SECTION_PATTERN.finditer(items):
+            name, section, start, length = match.groups()
+            data = self._section(message, section.upper())
+
+            label = b"BODY[" + section + b"]"
+
+            if start is not None:
+                data = data[int(start) : int(start) + int(length)]
+                label += b"<" + start + b">"
+
+            literal_items.append((label, data))
+
+            if name.upper() == b"BODY":
+                message.seen = True
+
+        response = f"* {seq} FETCH (".encode() + b" ".join(parts)
+
+        for label, data in literal_items:
+            if not response.endswith(b"("):
+                response += b" "
+            response += label + f" {{{len(data)}}}\r\n".encode() + data
+
+        return response + b")\r\n"
+
+    @staticmethod
+    def _section(message: FakeMessage, section: bytes) -> bytes:
+        if section == b"":
+            return message.rfc822()
+
+        if section == b"HEADER":
+            return message.headers()
+
+        if section == b"TEXT":
+            return message.text()
+
+        # Section 1 of a single part message is its body
+        if section == b"1":
+            return message.body
+
+        if section == b"2" and message.attachment:
+            return message.encoded_attachment()
+
+        if section.startswith(b"HEADER.FIELDS"):
+            names = re.findall(rb"[\w-]+", section[len(b"HEADER.FIELDS") :])
+            wanted = {n.lower() for n in names}
+            lines = [
+                line
+                for line in message.headers().split(b"\r\n")
+                if line.split(b":", 1)[0].lower() in wanted
+            ]
+            return b"\r\n".join(lines) + b"\r\n\r\n"
+
+        raise ValueError(f"Unsupported section {section.decode()}")
+
+
+def _parse_set(message_set: bytes, last: int) -> List[int]:
+    result = []
+
+    for part in message_set.split(b","):
+        first, _, end = part.partition(b":")
+        first = last if first == b"*" else int(first)
+        end = first if not end else (last if end == b"*" else int(end))
+        result.extend(range(min(first, end), max(first, end) + 1))
+
+    return result
+
+
+def _parse_date(value: bytes) -> datetime:
+    day, month, year = value.strip(b'"').decode().split("-")
+    return datetime(int(year), MONTHS[month.title()], int(day)).date()
+
+
+def _unquote(value: bytes) -> str:
+    if value.startswith(b'"'):
+        value = value[1:-1].replace(b'\\"', b'"').replace(b"\\\\", b"\\")
+    return value.decode()
+
+
+Predicate = Callable[[int, FakeMessage], bool]
+
+
+def _parse_search(tokens: List[bytes], exists: int, messages) -> Predicate:
+    position = 0
+    last_uid = messages[-1].uid if messages else 0
+
+    def parse_key() -> Predicate:
+        nonlocal position
+        token = tokens[position]
+        position += 1
+        key = token.upper()
+
+        if key == b"(":
+            keys = []
+            while tokens[position] != b")":
+                keys.append(parse_key())
+            position += 1
+            return lambda s, m: all(k(s, m) for k in keys)
+
+        if key == b"ALL":
+            return lambda s, m: True
+
+        if key == b"OR":
+            left, right = parse_key(), parse_key()
+            return lambda s, m: left(s, m) or right(s, m)
+
+        if key == b"NOT":
+            inner = parse_key()
+            return lambda s, m: not inner(s, m)
+
+        if key in (b"SINCE", b"BEFORE", b"ON"):
+            day = _parse_date(tokens[position])
+            position += 1
+            return {
+                b"SINCE": lambda s, m: m.date.date() >= day,
+                b"BEFORE": lambda s, m: m.date.date() < day,
+                b"ON": lambda s, m: m.date.date() == day,
+            }[key]
+
+        if key in (b"SUBJECT", b"FROM"):
+            value = _unquote(tokens[position]).lower()
+            position += 1
+            attribute = "subject" if key == b"SUBJECT" else "sender"
+            return lambda s, m: value in getattr(m, attribute).lower()
+
+        if key == b"UID":
+            uids = set(_parse_set(tokens[position], last_uid))
+            position += 1
+            return lambda s, m: m.uid in uids or (
+                tokens[position - 1].endswith(b"*") and m.uid == last_uid
+            )
+
+        if key[:1].isdigit() or key[:1] == b"*":
+            seqs = set(_parse_set(token, exists))
+            return lambda s, m: s in seqs
+
+        raise ValueError(f"Unsupported search key {token.decode()}")
+
+    keys = []
+
+    while position < len(tokens):
+        keys.append(parse_key())
+
+    return lambda s, m: all(k(s, m) for k in keys)
+
+
+class FakeSMTPServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        refused: Iterable[str] = (),
+        messages_per_connection: int = 0,
+    ) -> None:
+        """SMTP sink accepting every message, over plain TCP
+
+        Args:
+            latency (float): Seconds slept before answering each command
+            refused (Iterable[str]): Recipients answered with a 550
+            messages_per_connection (int): Messages after which the connection is
+                dropped, as many servers do, never if 0
+        """
+        self.latency = latency
+        self.refused = set(refused)
+        self.messages_per_connection = messages_per_connection
+        self.messages: List[Tuple[str, List[str], bytes]] = []
+        self.counters = Counters()
+
+        server = self
+
+        class Handler(_SMTPHandler):
+            smtp = server
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeSMTPServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    smtp: FakeSMTPServer
+
+    def send(self, data: bytes) -> None:
+        self.smtp.counters.bytes_sent += len(data)
+        self.wfile.write(data)
+
+    def handle(self) -> None:
+        self.smtp.counters.connections += 1
+        self.send(b"220 fake ESMTP\r\n")
+        sender, recipients = "", []
+        messages = 0
+
+        while True:
+            line = self.rfile.readline()
+            self.smtp.counters.bytes_received += len(line)
+
+            if not line:
+                return
+
+            command = line[:4].upper().decode(errors="replace")
+            counters = self.smtp.counters.commands
+            counters[command] = counters.get(command, 0) + 1
+
+            if self.smtp.latency:
+                time.sleep(self.smtp.latency)
+
+            if command in ("EHLO", "HELO"):
+                self.send(b"250-fake\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif command == "AUTH":
+                self.send(b"235 Authentication successful\r\n")
+            elif command == "MAIL":
+                sender, recipients = line[10:].strip().decode().strip("<>"), []
+                self.send(b"250 OK\r\n")
+            elif command == "RCPT":
+                recipient = line[8:].strip().decode().strip("<>")
+
+                if recipient in self.smtp.refused:
+                    self.send(b"550 No such user\r\n")
+                else:
+                    recipients.append(recipient)
+                    self.send(b"250 OK\r\n")
+            elif command == "DATA":
+                self.send(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                data = b""
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data += chunk
+                self.smtp.counters.bytes_received += len(data)
+                self.smtp.messages.append((sender, recipients, data))
+                self.send(b"250 OK queued\r\n")
+                messages += 1
+
+                if messages == self.smtp.messages_per_connection:
+                    return
+            elif command == "QUIT":
+                self.send(b"221 Bye\r\n")
+                return
+            elif command in ("RSET", "NOOP"):
+                self.send(b"250 OK\r\n")
+            else:
+                self.send(b"502 Command not implemented\r\n")
@@ -1,18 +1,46 @@
 import sys
-from typing import Dict, List
-from datetime import datetime
+from functools import lru_cache, partial
+from contextlib import contextmanager, nullcontext
+from importlib.util import find_spec
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from datetime import datetime, timedelta
 from pathlib import Path
 import typer
 
-from email_monitor.clients import ClientService
 from email_monitor.console import console
 from email_monitor.conifg import Config, InvalidConfig
-from email_monitor.monitor import EmailBackup, EmailClient, Monitor
-from email_monitor.smtp_client import SMTPClient
+from email_monitor.profiling import profile_command, profiler
+
+# The modules pulling pydantic, imaplib, smtplib or sqlite3 are imported by the
+# commands needing them, so --help and the light commands start fast
+if TYPE_CHECKING:
+    from email_monitor.cache import MailboxCache
+    from email_monitor.monitor import BackupHistory, EmailBackup, MailSource, ParsePool
 
 app = typer.Typer(rich_markup_mode="rich")
 
-app_config = Config()
+
+@lru_cache(maxsize=None)
+def get_app_config(config: Optional[Path] = None) -> Config:
+    """Load and validate the configuration once per process
+
+    Args:
+        config (Optional[Path]): Alternative configuration file, the default one
+            comes from EMAIL_MONITOR_CONFIG
+
+    Returns:
+        Config: Validated configuration
+    """
+    return Config(config)
 
 
 @app.command("clients")
@@ -20,9 +48,10 @@ def show_clients(
     config: Path = typer.Option(None, help="Path to alternative configuration file")
 ):
     """Show the list of backups in the config file"""
+    from email_monitor.clients import ClientService
+
     try:
-        if config:
-            app_config.set_config_file(config)
+        app_config = get_app_config(config)
 
         client_service = ClientService(app_config)
 
@@ -41,114 +70,527 @@ def show_clients(
 def get_emails(
     config: Path = typer.Option(None, help="Path to alternative configuration file"),
     date: str = typer.Argument(None, help="Date to retrieve backups from: dd-mm-yyyy"),
+    archive: List[Path] = typer.Option(
+        None, help="Read this mbox, Maildir or .eml directory instead of IMAP"
+    ),
+    workers: int = typer.Option(
+        0,
+        help="Processes parsing the headers of archives or large IMAP fetches, "
+        "0 to parse in this one",
+    ),
+    output_format: str = typer.Option(
+        "table",
+        "--format",
+        help="table, or json, jsonl, csv or parquet streamed as the emails come",
+    ),
+    output_file: Path = typer.Option(
+        None, "--output", "-o", help="Write the records there instead of stdout"
+    ),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
+    profile: bool = typer.Option(False, help="Print the time spent in each phase"),
+    profile_json: Path = typer.Option(
+        None, help="Write the timings and counters to this JSON file"
+    ),
 ):
     """Show all backup emails: They have to had the word 'Sauvegarde' in the subject"""
+    from email_monitor.clients import ClientService
+    from email_monitor.monitor import Monitor
 
-    search_query = "ALL"
+    since = None
 
-    try:
-        if config:
-            app_config.set_config_file(config)
+    with _records_output(output_format, output_file), profile_command(
+        profile, profile_json
+    ), _parse_pool(workers) as pool:
+        try:
+            _check_format(output_format)
+            app_config = get_app_config(config)
+
+            if date:
+                date = datetime.strptime(date, "%d-%m-%Y")
+                since = date - timedelta(hours=24)
+
+            monitor = Monitor(
+                ClientService(app_config),
+                email_clients=_get_sources(app_config, archive, pool),
+                server_side_filter=False,
+                cache=_get_cache(app_config, no_cache),
+            )
 
-        if date:
-            date = datetime.strptime(date, "%d-%m-%Y")
-            search_query = EmailClient.get_date_imap_query(date)
+            if output_format != "table":
+                from email_monitor import output
+
+                try:
+                    with _open_output(output_file) as stream:
+                        # Streamed unsorted, sorting would hold every email
+                        output.write_records(
+                            output.email_records(monitor.iter_emails(since=since)),
+                            output_format,
+                            output.EMAIL_COLUMNS,
+                            stream,
+                        )
+                finally:
+                    monitor.logout()
+
+                return
+
+            try:
+                emails = monitor.get_emails(since=since)
+            finally:
+                monitor.logout()
+
+            with profiler.span("render.table"):
+                table = console.build_table(
+                    title="Emails",
+                    header=["Sender", "Subject", "Date"],
+                    rows=[e.get_row() for e in emails],
+                )
 
-        client = EmailClient.from_config(app_config.get_email_config())
-        client.connect()
-        client.select_mailbox()
+                console.print(table)
+        except typer.BadParameter:
+            raise
+        except Exception as ex:
+            console.log_warning(ex)
 
-        emails = client.get_all_emails(search_query)
 
-        client.logout()
+@app.command("backups")
+def sauvegardes(
+    config: Path = typer.Option(None, help="Path to alternative configuration file"),
+    date: str = typer.Argument(None, help="Date to retrieve backups from: dd-mm-yyyy"),
+    from_date: str = typer.Option(
+        None, "--from", help="First day of a history range: dd-mm-yyyy"
+    ),
+    to_date: str = typer.Option(
+        None, "--to", help="Last day of a history range, today by default"
+    ),
+    archive: List[Path] = typer.Option(
+        None, help="Read this mbox, Maildir or .eml directory instead of IMAP"
+    ),
+    workers: int = typer.Option(
+        0,
+        help="Processes parsing the headers of archives or large IMAP fetches, "
+        "0 to parse in this one",
+    ),
+    output_format: str = typer.Option(
+        "table",
+        "--format",
+        help="table, or json, jsonl, csv or parquet streamed as the emails come",
+    ),
+    output_file: Path = typer.Option(
+        None, "--output", "-o", help="Write the records there instead of stdout"
+    ),
+    metrics: bool = typer.Option(
+        False, help="Read size, duration and job counts from the start of the bodies"
+    ),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
+    profile: bool = typer.Option(False, help="Print the time spent in each phase"),
+    profile_json: Path = typer.Option(
+        None, help="Write the timings and counters to this JSON file"
+    ),
+):
+    """Show the table of bakcups for the give date, or the daily history of a range"""
+    with _records_output(output_format, output_file), profile_command(
+        profile, profile_json
+    ), _parse_pool(workers) as pool:
+        try:
+            _check_format(output_format)
 
-        table = console.build_table(
-            title="Emails",
-            header=["Sender", "Subject", "Date"],
-            rows=[e.get_row() for e in emails],
-        )
+            if metrics and output_format == "table" and (from_date or to_date):
+                # The history table has one cell per day, no room for the metrics
+                raise typer.BadParameter(
+                    "the history table has no metrics, use a --format with --from/--to",
+                    param_hint="--metrics",
+                )
 
-        console.print(table)
-    except Exception as ex:
-        console.log_warning(ex)
+            if output_format != "table":
+                _write_backups(
+                    config,
+                    date,
+                    from_date,
+                    to_date,
+                    no_cache,
+                    archive,
+                    pool,
+                    output_format,
+                    output_file,
+                    metrics,
+                )
+                return
 
+            if from_date or to_date:
+                history = _get_history(
+                    config, from_date, to_date, no_cache, archive, pool
+                )
+                results = None
+            else:
+                results = _get_backup_results(
+                    config, date, no_cache, archive, pool, metrics
+                )
 
-@app.command("backups")
-def sauvegardes(
+            with profiler.span("render.table"):
+                if results is None:
+                    table = _build_history_table(history)
+                else:
+                    table = _build_results_table(results, metrics)
+
+                console.print(table)
+
+        except FileNotFoundError as ex:
+            console.log_warning(ex)
+
+        except ValueError as ex:
+            console.log_warning("Invalid date format")
+
+        except InvalidConfig:
+            console.log_warning("The configuration file was wrongly formatted")
+
+
+@app.command("send-report")
+def report(
     config: Path = typer.Option(None, help="Path to alternative configuration file"),
+    to_address: List[str] = typer.Option(
+        None, "--to-address", "-t", help="Address to write to, can be repeated"
+    ),
+    subject: str = typer.Option(..., "--subject", "-s", help="Email's subject"),
     date: str = typer.Argument(None, help="Date to retrieve backups from: dd-mm-yyyy"),
+    from_date: str = typer.Option(
+        None, "--from", help="First day of a history range: dd-mm-yyyy"
+    ),
+    to_date: str = typer.Option(
+        None, "--to", help="Last day of a history range, today by default"
+    ),
+    to_clients: bool = typer.Option(
+        False, help="Also send every client its own report at its configured email"
+    ),
+    connections: int = typer.Option(
+        4, help="SMTP connections used at once when sending many reports"
+    ),
+    on_change: bool = typer.Option(
+        False,
+        help="Only send the clients whose status changed since the last "
+        "--on-change report of this subject, nothing if none",
+    ),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
+    profile: bool = typer.Option(False, help="Print the time spent in each phase"),
+    profile_json: Path = typer.Option(
+        None, help="Write the timings and counters to this JSON file"
+    ),
 ):
-    """Show the table of bakcups for the give date"""
+    """Send the report to the ops addresses and optionally to every client"""
+    from email_monitor import rendering
+    from email_monitor.clients import ClientService
+    from email_monitor.smtp_client import SMTPClient
+    from email_monitor.snapshots import SnapshotStore, client_states
+
+    with profile_command(profile, profile_json):
+        try:
+            app_config = get_app_config(config)
+
+            recipients = [*(to_address or []), *app_config.get_report_recipients()]
+            clients = ClientService(app_config).get_all() if to_clients else []
+
+            if not recipients and not clients:
+                console.log_warning("No recipient, use --to-address or --to-clients")
+                sys.exit(2)
+
+            if on_change and (from_date or to_date):
+                console.log_warning(
+                    "--on-change compares the last backups, not a history"
+                )
+                sys.exit(2)
+
+            if from_date or to_date:
+                history = _get_history(config, from_date, to_date, no_cache)
+                build_table = partial(rendering.history_report, history)
+            else:
+                results = _get_backup_results(config, date, no_cache)
+                build_table = partial(rendering.results_report, results)
+
+            if on_change:
+                # The full reports don't count, only the last --on-change one
+                scope = f"send-report:{subject}"
+                states = client_states(results)
+                snapshots = SnapshotStore(app_config.get_snapshot_file())
+                transitions = snapshots.changes(scope, states)
+
+                if not transitions:
+                    console.print("No status change since the last report")
+                    return
+
+                changed = {transition.client for transition in transitions}
+                clients = [client for client in clients if client.name in changed]
+                build_table = partial(rendering.changes_report, transitions)
+
+            with profiler.span("render.html"):
+                emails = rendering.report_emails(
+                    build_table, subject, recipients, clients
+                )
+
+            smtp_client = SMTPClient.from_config(app_config.get_email_config())
+
+            console.print(f"Sending {len(emails)} email(s)...")
+
+            sent = smtp_client.send_many(emails, max_connections=connections)
+
+            console.print(
+                console.build_table(
+                    title="Envois",
+                    header=["Destinataire", "Statut", "Durée (ms)", "Erreur"],
+                    rows=[
+                        [
+                            result.to_address,
+                            "[green]OK[/green]" if result.ok else "[red]Échec[/red]",
+                            f"{result.latency * 1000:.0f}",
+                            result.error,
+                        ]
+                        for result in sent
+                    ],
+                )
+            )
+
+            if not all(result.ok for result in sent):
+                sys.exit(42)
+
+            # Only once every email went out, the next run reports the changes again
+            if on_change:
+                snapshots.save(scope, states)
+
+        except FileNotFoundError as ex:
+            console.log_warning(ex)
+        except ValueError as ex:
+            console.log_warning("Invalid date format")
+        except InvalidConfig:
+            console.log_warning("The configuration file was wrongly formatted")
+        except Exception as ex:
+            console.log_error("Couldn't send message")
+            console.log_error(ex)
+            sys.exit(42)
+
+
+@app.command("serve")
+def serve(
+    config: Path = typer.Option(None, help="Path to alternative configuration file"),
+    idle_timeout: int = typer.Option(600, help="Seconds before IDLE is restarted"),
+    poll_interval: int = typer.Option(
+        30, help="Seconds between two checks when the server has no IDLE"
+    ),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
+):
+    """Keep monitoring the mailbox and print every new backup as it arrives"""
+    from email_monitor.clients import ClientService
+    from email_monitor.daemon import MonitorDaemon
+    from email_monitor.monitor import EmailClient, Monitor
+
     try:
+        app_config = get_app_config(config)
 
-        results = _get_backup_results(config, date)
+        monitor = Monitor(
+            ClientService(app_config),
+            email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+            cache=_get_cache(app_config, no_cache),
+        )
 
-        table = _build_results_table(results)
+        daemon = MonitorDaemon(
+            monitor, idle_timeout=idle_timeout, poll_interval=poll_interval
+        )
+        daemon.load()
+
+        console.print(
+            _build_results_table(
+                {
+                    name: [email] if email else []
+                    for name, email in daemon.status.items()
+                }
+            )
+        )
 
-        console.print(table)
+        daemon.run(on_change=_log_backup)
+
+    except KeyboardInterrupt:
+        console.print("Monitoring stopped")
 
     except FileNotFoundError as ex:
         console.log_warning(ex)
 
-    except ValueError as ex:
-        console.log_warning("Invalid date format")
-
     except InvalidConfig:
         console.log_warning("The configuration file was wrongly formatted")
 
 
-@app.command("send-report")
-def report(
+@app.command("watch")
+def watch(
     config: Path = typer.Option(None, help="Path to alternative configuration file"),
-    to_address: str = typer.Option(
-        ..., "--to-address", "-t", help="Address to write to"
+    idle_timeout: int = typer.Option(600, help="Seconds before IDLE is restarted"),
+    poll_interval: int = typer.Option(
+        30, help="Seconds between two checks when the server has no IDLE"
     ),
-    subject: str = typer.Option(..., "--subject", "-s", help="Email's subject"),
-    date: str = typer.Argument(None, help="Date to retrieve backups from: dd-mm-yyyy"),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
 ):
-    console.print(f"Sending email to {to_address}...")
+    """Live status board, updated as new backups arrive"""
+    from rich.live import Live
+
+    from email_monitor.clients import ClientService
+    from email_monitor.daemon import MonitorDaemon
+    from email_monitor.dashboard import StatusBoard
+    from email_monitor.monitor import EmailClient, Monitor
 
     try:
+        app_config = get_app_config(config)
+
+        monitor = Monitor(
+            ClientService(app_config),
+            email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+            cache=_get_cache(app_config, no_cache),
+        )
+
+        daemon = MonitorDaemon(
+            monitor, idle_timeout=idle_timeout, poll_interval=poll_interval
+        )
+        daemon.load()
+
+        board = StatusBoard(daemon.status)
+
+        # Redrawn after each poll only, nothing runs while waiting on IDLE
+        with Live(board, console=console, auto_refresh=False) as live:
 
-        results = _get_backup_results(config, date)
+            def on_poll(email_client: EmailClient, latency: float) -> None:
+                board.polled(latency)
+                live.refresh()
 
-        html_table = _build_html_results_table(results)
+            daemon.run(on_change=board.update, on_poll=on_poll)
 
-        if config:
-            app_config.set_config_file(config)
+    except KeyboardInterrupt:
+        console.print("Monitoring stopped")
 
-        client_config = app_config.get_email_config()
+    except FileNotFoundError as ex:
+        console.log_warning(ex)
 
-        smtp_client = SMTPClient(
-            username=client_config["email"],
-            password=client_config["password"],
-            smtp_server=client_config["server"],
-            smtp_port=465,
+    except InvalidConfig:
+        console.log_warning("The configuration file was wrongly formatted")
+
+
+@app.command("exporter")
+def exporter(
+    config: Path = typer.Option(None, help="Path to alternative configuration file"),
+    host: str = typer.Option("0.0.0.0", help="Address to listen on"),
+    port: int = typer.Option(9842, help="Port to listen on"),
+    ttl: int = typer.Option(300, help="Seconds between two refreshes of the status"),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
+):
+    """Serve the backups status as Prometheus metrics on /metrics"""
+    from email_monitor.clients import ClientService
+    from email_monitor.exporter import BackupExporter
+    from email_monitor.monitor import EmailClient, Monitor
+
+    try:
+        app_config = get_app_config(config)
+
+        monitor = Monitor(
+            ClientService(app_config),
+            email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+            cache=_get_cache(app_config, no_cache),
         )
 
-        smtp_client.send_html_email(
-            to_address=to_address, subject=subject, html_text=html_table, csv_text=""
+        console.print(f"Serving metrics on http://{host}:{port}/metrics")
+
+        try:
+            BackupExporter(monitor, ttl=ttl).serve(host, port)
+        finally:
+            monitor.logout()
+
+    except KeyboardInterrupt:
+        console.print("Exporter stopped")
+
+    except FileNotFoundError as ex:
+        console.log_warning(ex)
+
+    except InvalidConfig:
+        console.log_warning("The configuration file was wrongly formatted")
+
+
+@app.command("schedule")
+def schedule(
+    config: Path = typer.Option(None, help="Path to alternative configuration file"),
+    once: bool = typer.Option(False, help="Run every job now, then exit"),
+    connections: int = typer.Option(
+        4, help="SMTP connections used at once when sending many reports"
+    ),
+    no_cache: bool = typer.Option(False, help="Query the server, bypassing the cache"),
+):
+    """Run the jobs of the schedule key of the configuration, in one process"""
+    from email_monitor.clients import ClientService
+    from email_monitor.monitor import EmailClient, Monitor
+    from email_monitor.schedule import Scheduler
+    from email_monitor.smtp_client import SMTPClient
+
+    try:
+        app_config = get_app_config(config)
+
+        monitor = Monitor(
+            ClientService(app_config),
+            email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+            cache=_get_cache(app_config, no_cache),
+        )
+        scheduler = Scheduler(
+            monitor,
+            app_config,
+            SMTPClient.from_config(app_config.get_email_config()),
+            connections=connections,
         )
 
+        try:
+            if once:
+                sent = scheduler.run_jobs(scheduler.get_jobs())
+
+                if not all(result.ok for result in sent):
+                    sys.exit(42)
+            else:
+                jobs = scheduler.get_jobs()
+                console.print(
+                    f"{len(jobs)} job(s) scheduled: "
+                    + ", ".join(f"{job.name} ({job.cron})" for job in jobs)
+                )
+                scheduler.run()
+        finally:
+            monitor.logout()
+
+    except KeyboardInterrupt:
+        console.print("Scheduler stopped")
+
     except FileNotFoundError as ex:
         console.log_warning(ex)
-    except ValueError as ex:
-        console.log_warning("Invalid date format")
+
     except InvalidConfig:
         console.log_warning("The configuration file was wrongly formatted")
-    except Exception as ex:
-        console.log_error("Couldn't send message")
-        console.log_error(ex)
-        sys.exit(42)
 
 
-def _get_backup_results(config: Path, date: str) -> Dict[str, List[EmailBackup]]:
-    client = EmailClient.from_config(app_config.get_email_config())
-    client.connect()
-    client.select_mailbox()
+def _log_backup(client: str, email: Optional["EmailBackup"]):
+    if email is None:
+        console.log_error(f"{client}: no backup in the last 24 hours")
+        return
+
+    message = f"{email.date:%d-%m-%Y %H:%M} {client}: {email.subject}"
+
+    status = email.get_status()
+
+    if status == "success":
+        console.log_success(message)
+    elif status == "warning":
+        console.log_warning(message)
+    else:
+        console.log_error(message)
 
-    if config:
-        app_config.set_config_file(config)
+
+def _get_backup_results(
+    config: Path,
+    date: str,
+    no_cache: bool = False,
+    archives: List[Path] = None,
+    pool: Optional["ParsePool"] = None,
+    metrics: bool = False,
+) -> Dict[str, List["EmailBackup"]]:
+    from email_monitor.clients import ClientService
+    from email_monitor.monitor import Monitor
+
+    app_config = get_app_config(config)
 
     if not date:
         date = datetime.now()
@@ -157,14 +599,229 @@ def _get_backup_results(config: Path, date: str) -> Dict[str, List[EmailBackup]]
 
     client_service = ClientService(app_config)
 
-    monitor = Monitor(client_service, email_client=client)
+    monitor = Monitor(
+        client_service,
+        email_clients=_get_sources(app_config, archives, pool),
+        cache=_get_cache(app_config, no_cache),
+    )
+
+    try:
+        # The reports only show the last email of each client
+        last_backups = monitor.get_last_backups(date)
+
+        if metrics:
+            from email_monitor.metrics import MetricsExtractor
+
+            MetricsExtractor().extract(e for e in last_backups.values() if e)
+    finally:
+        monitor.logout()
+
+    return {client: [email] if email else [] for client, email in last_backups.items()}
+
+
+def _get_history(
+    config: Path,
+    from_date: Optional[str],
+    to_date: Optional[str],
+    no_cache: bool,
+    archives: List[Path] = None,
+    pool: Optional["ParsePool"] = None,
+    metrics: bool = False,
+) -> "BackupHistory":
+    """Backups of every day from from_date to to_date, a week by default"""
+    from email_monitor.clients import ClientService
+    from email_monitor.monitor import Monitor
+
+    app_config = get_app_config(config)
+
+    last_day = datetime.strptime(to_date, "%d-%m-%Y") if to_date else datetime.now()
+    last_day = last_day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if from_date:
+        since = datetime.strptime(from_date, "%d-%m-%Y")
+    else:
+        since = last_day - timedelta(days=6)
+
+    if since > last_day:
+        raise ValueError("The range ends before it starts")
+
+    until = last_day + timedelta(days=1, microseconds=-1)
+
+    monitor = Monitor(
+        ClientService(app_config),
+        email_clients=_get_sources(app_config, archives, pool),
+        cache=_get_cache(app_config, no_cache),
+    )
+
+    try:
+        history = monitor.get_history(since, until)
+
+        if metrics:
+            from email_monitor.metrics import MetricsExtractor
+
+            MetricsExtractor().extract(
+                email for emails in history.emails.values() for email in emails.values()
+            )
+
+        return history
+    finally:
+        monitor.logout()
+
+
+def _write_backups(
+    config: Path,
+    date: Optional[str],
+    from_date: Optional[str],
+    to_date: Optional[str],
+    no_cache: bool,
+    archives: Optional[List[Path]],
+    pool: Optional["ParsePool"],
+    output_format: str,
+    output_file: Optional[Path],
+    metrics: bool = False,
+) -> None:
+    """Stream the backups of a day, or the history of a range, as records
+
+    For a day every email is written as soon as it is matched to its client,
+    the clients without email come last. With metrics the emails are held by
+    batches while their bodies are read.
+    """
+    from email_monitor import output
+    from email_monitor.clients import ClientService
+    from email_monitor.monitor import Monitor
+
+    if from_date or to_date:
+        history = _get_history(
+            config, from_date, to_date, no_cache, archives, pool, metrics
+        )
+
+        with _open_output(output_file) as stream:
+            output.write_records(
+                output.history_records(history, metrics),
+                output_format,
+                output.HISTORY_COLUMNS + (output.METRICS_COLUMNS if metrics else []),
+                stream,
+            )
+
+        return
+
+    app_config = get_app_config(config)
+    date = datetime.strptime(date, "%d-%m-%Y") if date else datetime.now()
+    client_service = ClientService(app_config)
+
+    monitor = Monitor(
+        client_service,
+        email_clients=_get_sources(app_config, archives, pool),
+        cache=_get_cache(app_config, no_cache),
+    )
+
+    backups = monitor.iter_backups(date)
+
+    if metrics:
+        from email_monitor.metrics import with_metrics
+
+        backups = with_metrics(backups)
+
+    try:
+        with _open_output(output_file) as stream:
+            output.write_records(
+                output.backup_records(
+                    backups,
+                    [client.name for client in client_service.get_all()],
+                    metrics,
+                ),
+                output_format,
+                output.BACKUP_COLUMNS + (output.METRICS_COLUMNS if metrics else []),
+                stream,
+            )
+    finally:
+        monitor.logout()
+
+
+def _check_format(output_format: str) -> None:
+    from email_monitor.output import FORMATS
+
+    if output_format not in FORMATS:
+        raise typer.BadParameter(
+            f"{output_format} isn't one of {', '.join(FORMATS)}",
+            param_hint="--format",
+        )
+
+    if output_format == "parquet" and not find_spec("pyarrow"):
+        raise typer.BadParameter(
+            "parquet needs pyarrow: pip install email-monitor[parquet]",
+            param_hint="--format",
+        )
+
+
+@contextmanager
+def _records_output(output_format: str, output_file: Optional[Path]) -> Iterator[None]:
+    """Print the console messages to stderr while the records go to stdout
+
+    The warnings and the profile would otherwise end up among the records.
+    """
+    if output_format == "table" or output_file:
+        yield
+        return
+
+    console.stderr = True
+
+    try:
+        yield
+    finally:
+        console.stderr = False
+
+
+def _open_output(output_file: Optional[Path]) -> ContextManager[BinaryIO]:
+    """The file to write the records to, or stdout, left open"""
+    if output_file:
+        return open(output_file, "wb")
+
+    return nullcontext(sys.stdout.buffer)
 
-    results = monitor.get_backups(date)
 
-    return results
+def _parse_pool(workers: int) -> ContextManager[Optional["ParsePool"]]:
+    """The processes parsing the headers of a command, shared by its sources
 
+    Created before the sources are searched in their threads, nothing to close
+    without workers.
+    """
+    if workers <= 0:
+        return nullcontext()
 
-def _build_results_table(results: Dict[str, List[EmailBackup]]):
+    from email_monitor.monitor import ParsePool
+
+    return ParsePool(workers)
+
+
+def _get_sources(
+    app_config: Config,
+    archives: Optional[List[Path]],
+    pool: Optional["ParsePool"] = None,
+) -> List["MailSource"]:
+    """The archives if any, the configured IMAP mailboxes otherwise"""
+    if archives:
+        from email_monitor.archive import ArchiveSource
+
+        return [ArchiveSource(path, pool=pool) for path in archives]
+
+    from email_monitor.monitor import EmailClient
+
+    return EmailClient.from_configs(app_config.get_email_configs(), pool=pool)
+
+
+def _get_cache(app_config: Config, no_cache: bool) -> Optional["MailboxCache"]:
+    from email_monitor.cache import MailboxCache
+
+    if no_cache:
+        return None
+
+    return MailboxCache(app_config.get_cache_file())
+
+
+def _build_results_table(
+    results: Dict[str, List["EmailBackup"]], metrics: bool = False
+):
 
     rows = []
 
@@ -174,20 +831,19 @@ def _build_results_table(results: Dict[str, List[EmailBackup]]):
             last_email: EmailBackup = results[client][-1]
 
             if last_email.has_passed():
-                last_email.subject = (
-                    "[bold green]" + last_email.subject + "[/bold green]"
-                )
+                subject = "[bold green]" + last_email.subject + "[/bold green]"
                 status = ":thumbs_up:"
             else:
-                last_email.subject = "[bold red]" + last_email.subject + "[/bold red]"
+                subject = "[bold red]" + last_email.subject + "[/bold red]"
                 status = ":warning:"
 
             rows.append(
                 (
                     client,
-                    last_email.subject,
+                    subject,
                     last_email.date.strftime("%A, %d %B %Y %I:%M %p"),
                     status,
+                    *(_metrics_cells(last_email.metrics) if metrics else ()),
                 )
             )
         except IndexError:
@@ -197,84 +853,68 @@ def _build_results_table(results: Dict[str, List[EmailBackup]]):
                     "",
                     "[bold red]Missing[/bold red]",
                     ":warning:",
+                    *(("",) * 4 if metrics else ()),
                 )
             )
 
-    return console.build_table(
-        title="Sauvegardes", header=["Client", "Email", "Date", "Status"], rows=rows
-    )
+    header = ["Client", "Email", "Date", "Status"]
+
+    if metrics:
+        header += ["Size", "Duration", "Jobs", "Errors"]
 
+    return console.build_table(title="Sauvegardes", header=header, rows=rows)
 
-def _build_html_results_table(results: Dict[str, List[EmailBackup]]) -> str:
-
-    head = """<head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Rapport des Sauvegardes</title>
-                <style>
-                    body {
-                        font-family: Arial, sans-serif;
-                        margin: 0;
-                        padding: 0;
-                    }
-                    h1 {
-                        text-align: center;
-                        margin-top: 20px;
-                    }
-                    table {
-                        width: 80%;
-                        border-collapse: collapse;
-                        margin: 20px auto;
-                    }
-                    th, td {
-                        border: 1px solid #ddd;
-                        padding: 8px;
-                        text-align: left;
-                    }
-                    th {
-                        background-color: #f2f2f2;
-                    }
-                    tr:nth-child(even) {
-                        background-color: #f2f2f2;
-                    }
-                    tr:hover {
-                        background-color: #ddd;
-                    }
-                    .success {
-                        color: green;
-                        font-weight: bold;
-                    }
-                    .failure {
-                        color: red;
-                        font-weight: bold;
-                    }
-                    .warning {
-                        color: #FFBF00;
-                        font-weight: bold;
-                    }
-                </style>
-            </head>"""
-
-    report_html = f"<html>{head}<body><h1>Rapport des Sauvegardes</h1><br><br>"
-
-    report_html = (
-        report_html
-        + "<table><thead><tr><th>Client</th><th>Email</th><th>Date</th><th>Status</th></tr></thead><tbody>"
+
+def _metrics_cells(metrics) -> Tuple[str, str, str, str]:
+    """Size, duration, jobs and errors of a BackupMetrics, empty when unknown"""
+    if metrics is None:
+        return ("",) * 4
+
+    size = f"{metrics.size / 1024**3:.1f} GiB" if metrics.size is not None else ""
+    duration = (
+        str(timedelta(seconds=int(metrics.duration)))
+        if metrics.duration is not None
+        else ""
     )
+    errors = "" if metrics.errors is None else str(metrics.errors)
 
-    for client in results.keys():
+    if metrics.errors:
+        errors = f"[bold red]{errors}[/bold red]"
 
-        try:
-            last_email: EmailBackup = results[client][-1]
+    return size, duration, "" if metrics.jobs is None else str(metrics.jobs), errors
 
-            status = last_email.get_status()
 
-            report_html += f'<tr><td>{client}</td><td>{last_email.subject}</td><td>{last_email.date.strftime("%A, %d %B %Y %I:%M %p")}</td><td class="{status}">{status.title()}</td>'
+HISTORY_SYMBOLS = {
+    "success": "[green]✔[/green]",
+    "warning": "[yellow]![/yellow]",
+    "failure": "[bold red]✘[/bold red]",
+    "missing": "[red]·[/red]",
+}
 
-        except IndexError:
 
-            report_html += f'<tr><td>{client}</td><td>-</td><td>Missing</td><td class="failure">Failure</td>'
+def _build_history_table(history: "BackupHistory"):
 
-    report_html = report_html + "</tbody></table></body></html>"
+    rows = [
+        (
+            client,
+            *(HISTORY_SYMBOLS[history.get_status(client, day)] for day in history.days),
+            f"{history.success_rate(client):.0%}",
+            str(history.streak(client)),
+        )
+        for client in history.emails.keys()
+    ]
 
-    return report_html
+    return console.build_table(
+        title=(
+            f"Historique des sauvegardes du {history.days[0]:%d/%m/%Y} "
+            f"au {history.days[-1]:%d/%m/%Y}"
+        ),
+        header=[
+            "Client",
+            # Day of the month only, a few weeks have to fit in the console width
+            *(day.strftime("%d") for day in history.days),
+            "Succès",
+            "Série",
+        ],
+        rows=rows,
+    )
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+import mmap
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from email_monitor.monitor import (
+    BACKUP_CRITERIA,
+    EmailBackup,
+    MailSource,
+    ParsePool,
+    parse_headers,
+)
+
+# Messages parsed per task, large enough to hide the inter-process overhead
+BATCH_SIZE = 1000
+# Headers bigger than this are cut, a backup report never comes close
+MAX_HEADER_SIZE = 64 * 1024
+HEADER_ENDS = (b"\n\n", b"\n\r\n")
+
+
+class ArchiveSource(MailSource):
+    def __init__(self, path: Path, pool: Optional[ParsePool] = None) -> None:
+        """Read the emails of an mbox file, a Maildir or a directory of .eml files
+
+        Only the headers are read. An mbox is memory-mapped and split on its
+        "From " lines without loading it, the pages are left to the OS cache.
+
+        Args:
+            path (Path): mbox file, Maildir (with cur/ and new/), .eml file or
+                directory of .eml files
+            pool (Optional[ParsePool]): Processes parsing the headers, None to
+                parse in this one
+        """
+        self.path = Path(path).expanduser()
+        self.pool = pool
+        self.account = "archive"
+        self.mailbox = str(self.path)
+
+    def __repr__(self) -> str:
+        return f"ArchiveSource({self.path})"
+
+    def fetch_emails(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        criteria: str = BACKUP_CRITERIA,
+        client_names: List[str] = None,
+    ) -> Iterator[EmailBackup]:
+        """Stream the emails of the archive in file order, see MailSource
+
+        A day of margin is kept on both ends like the cache, Monitor keeps the
+        days of the window in the emails timezone.
+        """
+        start = (since - timedelta(days=1)).timestamp() if since else float("-inf")
+        end = (until + timedelta(days=1)).timestamp() if until else float("inf")
+
+        for email in self._parse(criteria):
+            if (
+                isinstance(email.date, datetime)
+                and start <= email.date.timestamp() <= end
+            ):
+                yield email
+
+    def _parse(self, criteria: str) -> Iterator[EmailBackup]:
+        if self.path.is_dir():
+            tasks = ((_parse_files, batch, criteria) for batch in self._file_batches())
+        elif self.path.suffix.lower() == ".eml":
+            tasks = iter([(_parse_files, [self.path], criteria)])
+        else:
+            tasks = (
+                (_parse_mbox, self.path, spans, criteria)
+                for spans in _batches(_mbox_spans(self.path))
+            )
+
+        if self.pool is None:
+            for function, *args in tasks:
+                yield from function(*args)
+            return
+
+        for emails in self.pool.map(tasks):
+            yield from emails
+
+    def _file_batches(self) -> Iterator[List[Path]]:
+        if (self.path / "cur").is_dir() or (self.path / "new").is_dir():
+            # Maildir file names start with the delivery timestamp
+            files = (
+                path
+                for folder in ("cur", "new")
+                if (self.path / folder).is_dir()
+                for path in sorted((self.path / folder).iterdir())
+            )
+        else:
+            files = iter(sorted(self.path.glob("*.eml")))
+
+        return _batches(files)
+
+
+def _batches(items: Iterator) -> Iterator[list]:
+    batch = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _mbox_spans(path: Path) -> Iterator[Tuple[int, int]]:
+    """Offsets of the headers of every message of an mbox, From_ line excluded"""
+    with open(path, "rb") as file:
+        if not file.seek(0, 2):
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0 if mm[:5] == b"From " else mm.find(b"\nFrom ")
+
+            while start != -1:
+                if mm[start : start + 1] == b"\n":
+                    start += 1
+
+                next_start = mm.find(b"\nFrom ", start)
+                end = len(mm) if next_start == -1 else next_start
+
+                headers_start = mm.find(b"\n", start, end) + 1
+
+                if headers_start:
+                    yield headers_start, _header_end(mm, headers_start, end)
+
+                start = next_start
+
+
+def _header_end(data, start: int, end: int) -> int:
+    limit = min(end, start + MAX_HEADER_SIZE)
+    ends = [data.find(marker, start, limit) for marker in HEADER_ENDS]
+    found = [position + 1 for position in ends if position != -1]
+
+    return min(found) if found else limit
+
+
+def _parse_mbox(
+    path: Path, spans: List[Tuple[int, int]], criteria: str
+) -> List[EmailBackup]:
+    """Parse the headers at spans of an mbox, run in the worker processes too"""
+    with open(path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        emails = (parse_headers(mm[start:end], criteria) for start, end in spans)
+
+        return [email for email in emails if email]
+
+
+def _parse_files(paths: List[Path], criteria: str) -> List[EmailBackup]:
+    """Parse the headers of one message per file (Maildir, .eml)"""
+    emails = []
+
+    for path in paths:
+        with open(path, "rb") as file:
+            data = file.read(MAX_HEADER_SIZE)
+
+        email = parse_headers(data[: _header_end(data, 0, len(data))], criteria)
+
+        if email:
+            emails.append(email)
+
+    return emails
@@ -0,0 +1,365 @@
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterator, List, Optional
+
+from email_monitor.monitor import BACKUP_CRITERIA, EmailBackup, EmailClient
+from email_monitor.profiling import profiler
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mailboxes (
+    account TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    criteria TEXT NOT NULL,
+    max_uid INTEGER NOT NULL,
+    synced_since TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    highestmodseq INTEGER,
+    PRIMARY KEY (account, mailbox)
+);
+CREATE TABLE IF NOT EXISTS emails (
+    account TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    date TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (account, mailbox, uidvalidity, uid)
+);
+CREATE INDEX IF NOT EXISTS emails_timestamp
+    ON emails (account, mailbox, timestamp);
+"""
+# Rows read or written at once, bounds the memory of large syncs and reads
+BATCH_SIZE = 500
+
+
+class MailboxCache:
+    def __init__(self, cache_file: Path) -> None:
+        """Local SQLite cache of the backup emails headers
+
+        Emails are keyed by (account, mailbox, UIDVALIDITY, UID), only the UIDs
+        above the highest cached one are fetched on each sync. The cache can be
+        shared by threads syncing different mailboxes.
+
+        Args:
+            cache_file (Path): SQLite database, created if missing
+        """
+        self.cache_file = Path(cache_file)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.cache_file, check_same_thread=False)
+        # The readers of iter_emails don't block the syncs, nor the other way round
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(mailboxes)")]
+
+        # Caches created before CONDSTORE support
+        if "highestmodseq" not in columns:
+            with self._db:
+                self._db.execute(
+                    "ALTER TABLE mailboxes ADD COLUMN highestmodseq INTEGER"
+                )
+
+    def sync(
+        self,
+        email_client: EmailClient,
+        since: Optional[datetime] = None,
+        criteria: str = BACKUP_CRITERIA,
+    ) -> int:
+        """Fetch into the cache the emails missing from the selected mailbox
+
+        The first sync, or one going further back than the previous ones, searches
+        the whole window. Afterwards only the UIDs above the highest known UID are
+        searched. The mailbox cache is dropped if its UIDVALIDITY changed.
+
+        With CONDSTORE nothing is searched when the HIGHESTMODSEQ of the mailbox
+        didn't move since the last sync. With QRESYNC the emails expunged since
+        are also removed from the cache.
+
+        Args:
+            email_client (EmailClient): Connected client with a selected mailbox
+            since (Optional[datetime]): Oldest day to cache, None for the whole mailbox
+            criteria (str): Keyword the subjects have to contain
+
+        Returns:
+            int: Number of emails added to the cache
+        """
+        if email_client.uidvalidity is None:
+            raise Exception("You need to select a mailbox first")
+
+        account, mailbox = email_client.account, email_client.mailbox
+        synced_at = datetime.now().timestamp()
+        since_str = since.strftime("%Y-%m-%d") if since else ""
+
+        # Read first, the changes made during the sync are seen by the next one
+        modseq = email_client.get_highestmodseq()
+
+        with self._lock:
+            state = self._db.execute(
+                "SELECT uidvalidity, criteria, max_uid, synced_since, highestmodseq "
+                "FROM mailboxes WHERE account = ? AND mailbox = ?",
+                (account, mailbox),
+            ).fetchone()
+
+        if state and (state[0], state[1]) != (email_client.uidvalidity, criteria):
+            self.clear(account, mailbox)
+            state = None
+
+        if state and state[4] and modseq and since_str >= state[3]:
+            if modseq == state[4]:
+                profiler.count("cache.unchanged_mailboxes")
+                self._write_state(
+                    email_client, criteria, state[2], state[3], synced_at, modseq
+                )
+                return 0
+
+            self._remove(
+                account, mailbox, email_client.get_vanished(state[2], state[4])
+            )
+
+        if state is None or since_str < state[3]:
+            search_query = (
+                EmailClient.get_since_imap_query(since, criteria)
+                if since
+                else EmailClient.get_subject_imap_query(criteria)
+            )
+            max_uid = state[2] if state else 0
+            floor_uid = 0
+        else:
+            search_query = (
+                f"(UID {state[2] + 1}:* {EmailClient.get_subject_imap_query(criteria)})"
+            )
+            max_uid = floor_uid = state[2]
+            since_str = state[3]
+
+        with self._lock:
+            cached_uids = {
+                uid
+                for (uid,) in self._db.execute(
+                    "SELECT uid FROM emails WHERE account = ? AND mailbox = ?",
+                    (account, mailbox),
+                )
+            }
+
+        # "UID n:*" always matches the last message, even below n
+        uids = [
+            uid
+            for uid in email_client.uid_search(search_query)
+            if uid > floor_uid and uid not in cached_uids
+        ]
+
+        rows = []
+        added = 0
+
+        for email_backup in email_client.iter_parsed(uids, criteria):
+            if len(rows) >= BATCH_SIZE:
+                self._insert(rows)
+                added += len(rows)
+                rows = []
+
+            rows.append(
+                (
+                    account,
+                    mailbox,
+                    email_client.uidvalidity,
+                    email_backup.uid,
+                    email_backup.subject,
+                    email_backup.sender,
+                    email_backup.date.isoformat(),
+                    email_backup.date.timestamp(),
+                )
+            )
+
+        max_uid = max([max_uid, *uids, (email_client.uidnext or 1) - 1])
+
+        self._insert(rows)
+        # Written last, an interrupted sync is simply done again
+        self._write_state(email_client, criteria, max_uid, since_str, synced_at, modseq)
+
+        return added + len(rows)
+
+    def _write_state(
+        self,
+        email_client: EmailClient,
+        criteria: str,
+        max_uid: int,
+        since_str: str,
+        synced_at: float,
+        modseq: Optional[int],
+    ) -> None:
+        with profiler.span("cache.write"), self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO mailboxes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    email_client.account,
+                    email_client.mailbox,
+                    email_client.uidvalidity,
+                    criteria,
+                    max_uid,
+                    since_str,
+                    synced_at,
+                    modseq,
+                ),
+            )
+
+    def _remove(self, account: str, mailbox: str, uids: List[int]) -> None:
+        """Drop the emails of expunged messages"""
+        if not uids:
+            return
+
+        profiler.count("cache.vanished", len(uids))
+
+        with profiler.span("cache.write"), self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM emails WHERE account = ? AND mailbox = ? AND uid = ?",
+                [(account, mailbox, uid) for uid in uids],
+            )
+
+    def _insert(self, rows: List[tuple]) -> None:
+        with profiler.span("cache.write"), self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO emails VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def fetch_emails(
+        self,
+        email_client: EmailClient,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        criteria: str = BACKUP_CRITERIA,
+    ) -> Iterator[EmailBackup]:
+        """Stream the emails of a window, syncing first unless the cache covers it
+
+        The client only connects when a sync is needed.
+
+        Args:
+            email_client (EmailClient): Client of the mailbox, connected or not
+            since (Optional[datetime]): Oldest date, None for the whole mailbox
+            until (Optional[datetime]): Newest date, None for now
+            criteria (str): Keyword the subjects have to contain
+
+        Yields:
+            EmailBackup: Cached emails, see get_emails
+        """
+        account, mailbox = email_client.account, email_client.mailbox
+
+        if not self.covers(account, mailbox, since, until):
+            email_client.ensure_connected()
+            self.sync(email_client, since=since, criteria=criteria)
+
+        for email in self.iter_emails(account, mailbox, since=since, until=until):
+            email.source = email_client
+            yield email
+
+    def covers(
+        self,
+        account: str,
+        mailbox: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> bool:
+        """Whether a previous sync already fetched the whole window
+
+        Args:
+            account (str): EmailClient.account
+            mailbox (str): Mailbox name
+            since (Optional[datetime]): Oldest date, None for the whole mailbox
+            until (Optional[datetime]): Newest date, None for now
+
+        Returns:
+            bool: True if the window can be read from the cache only
+        """
+        with self._lock:
+            state = self._db.execute(
+                "SELECT synced_since, synced_at FROM mailboxes "
+                "WHERE account = ? AND mailbox = ?",
+                (account, mailbox),
+            ).fetchone()
+
+        if state is None or until is None:
+            return False
+
+        since_str = since.strftime("%Y-%m-%d") if since else ""
+
+        return state[0] <= since_str and until.timestamp() < state[1]
+
+    def get_emails(
+        self,
+        account: str,
+        mailbox: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[EmailBackup]:
+        """Cached emails of a mailbox, sorted by date, see iter_emails"""
+
+        return list(self.iter_emails(account, mailbox, since=since, until=until))
+
+    def iter_emails(
+        self,
+        account: str,
+        mailbox: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Iterator[EmailBackup]:
+        """Stream the cached emails of a mailbox, sorted by date
+
+        Naive datetimes are taken as local time. A day of margin is kept on both
+        ends, Monitor keeps the days of the window in the emails timezone.
+
+        Args:
+            account (str): EmailClient.account
+            mailbox (str): Mailbox name
+            since (Optional[datetime]): Oldest date
+            until (Optional[datetime]): Newest date
+
+        Yields:
+            EmailBackup: Cached emails
+        """
+        start = (since - timedelta(days=1)).timestamp() if since else float("-inf")
+        end = (until + timedelta(days=1)).timestamp() if until else float("inf")
+
+        # Its own connection, the cursor stays open between the yields while
+        # other threads sync and commit on the shared one
+        with closing(sqlite3.connect(self.cache_file)) as db:
+            cursor = db.execute(
+                "SELECT subject, sender, date, uid FROM emails "
+                "WHERE account = ? AND mailbox = ? AND timestamp BETWEEN ? AND ? "
+                "ORDER BY timestamp",
+                (account, mailbox, start, end),
+            )
+
+            while True:
+                with profiler.span("cache.read"):
+                    rows = cursor.fetchmany(BATCH_SIZE)
+
+                if not rows:
+                    return
+
+                for subject, sender, date, uid in rows:
+                    yield EmailBackup(
+                        subject=subject,
+                        sender=sender,
+                        date=datetime.fromisoformat(date),
+                        uid=uid,
+                    )
+
+    def clear(self, account: str, mailbox: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM emails WHERE account = ? AND mailbox = ?",
+                (account, mailbox),
+            )
+            self._db.execute(
+                "DELETE FROM mailboxes WHERE account = ? AND mailbox = ?",
+                (account, mailbox),
+            )
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,118 @@
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from email_monitor.conifg import PASS_KEYWORDS, WARNING_KEYWORDS
+
+STATUSES = ["success", "warning", "failure"]
+
+
+def fold(text: str) -> str:
+    """Lowercase text without its accents, "Succès" becomes "succes"
+
+    Letters without an ASCII base letter are dropped, from the keywords too.
+    Plain ASCII, most subjects, skips the decomposition.
+    """
+    text = text.lower()
+
+    if text.isascii():
+        return text
+
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+
+
+class KeywordRules:
+    def __init__(self, success: List[str], warning: List[str]) -> None:
+        """Keywords of one rule set, folded once
+
+        A subject is a success if it contains a success keyword anywhere, else a
+        warning if it contains a warning keyword, else a failure. The subject is
+        folded once, accents and case ignored, then searched for each keyword.
+
+        Args:
+            success (List[str]): Keywords of a successful backup
+            warning (List[str]): Keywords of a backup with warnings
+        """
+        self.success = list(success)
+        self.warning = list(warning)
+        self._success = self._compile(success)
+        self._warning = self._compile(warning)
+
+    @staticmethod
+    def _compile(keywords: List[str]) -> Tuple[str, ...]:
+        # Substring searches run in C, a few dozen of them are still faster
+        # than one re alternation scanning the subject
+        return tuple(dict.fromkeys(k for k in map(fold, keywords) if k.strip()))
+
+    def classify(self, subject: str) -> str:
+        """success, warning or failure"""
+        text = fold(subject)
+
+        for keyword in self._success:
+            if keyword in text:
+                return "success"
+
+        for keyword in self._warning:
+            if keyword in text:
+                return "warning"
+
+        return "failure"
+
+
+class StatusClassifier:
+    def __init__(
+        self,
+        success: List[str] = None,
+        warning: List[str] = None,
+        overrides: Dict[str, Dict[str, Optional[List[str]]]] = None,
+    ) -> None:
+        """Status of backup emails from their subject, global or per client rules
+
+        Args:
+            success (List[str]): Global success keywords, PASS_KEYWORDS by default
+            warning (List[str]): Global warning keywords, WARNING_KEYWORDS by
+                default
+            overrides (Dict[str, Dict[str, Optional[List[str]]]]): Keywords of
+                some clients, by client name then "success" or "warning". A list
+                left to None keeps the global one
+        """
+        self.default = KeywordRules(
+            PASS_KEYWORDS if success is None else success,
+            WARNING_KEYWORDS if warning is None else warning,
+        )
+        self.rules: Dict[str, KeywordRules] = {}
+
+        for client, keywords in (overrides or {}).items():
+            client_success = keywords.get("success")
+            client_warning = keywords.get("warning")
+
+            if client_success is None and client_warning is None:
+                continue
+
+            self.rules[client] = KeywordRules(
+                self.default.success if client_success is None else client_success,
+                self.default.warning if client_warning is None else client_warning,
+            )
+
+    @classmethod
+    def from_settings(cls, settings) -> "StatusClassifier":
+        """Classifier of the keywords of the configuration file
+
+        Args:
+            settings (Settings): Validated configuration
+        """
+        return cls(
+            settings.keywords.success,
+            settings.keywords.warning,
+            {
+                client.name: client.keywords.model_dump()
+                for client in settings.clients
+                if client.keywords
+            },
+        )
+
+    def classify(self, subject: str, client: Optional[str] = None) -> str:
+        """success, warning or failure, with the rules of client if it has some"""
+        return self.rules.get(client, self.default).classify(subject)
+
+
+default_classifier = StatusClassifier()
@@ -1,14 +1,30 @@
-from typing import List
+import re
+from email.utils import parseaddr
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from pydantic import BaseModel, EmailStr
 from rich.table import Table
 
 from email_monitor.conifg import Config
 from email_monitor.console import console
 
+if TYPE_CHECKING:
+    from email_monitor.classifier import StatusClassifier
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class Keywords(BaseModel):
+    """Subject keywords of the backup statuses, None keeps the default list"""
+
+    success: Optional[List[str]] = None
+    warning: Optional[List[str]] = None
+
 
 class Client(BaseModel):
     name: str
     email: EmailStr
+    # Replace the global keywords for this client's emails only
+    keywords: Optional[Keywords] = None
 
 
 class ClientService:
@@ -16,14 +32,19 @@ class ClientService:
         self.config = config
 
     def get_all(self) -> List[Client]:
-        clients = []
+        """Clients validated when the configuration was read, not copied"""
+
+        return self.config.clients
+
+    def get_classifier(self) -> "StatusClassifier":
+        """Status classifier with the keywords of every client"""
 
-        clients_config = self.config.get_clients()
+        return self.config.get_classifier()
 
-        for clien_dict in clients_config:
-            clients.append(Client(**clien_dict))
+    def get_match_sender(self) -> bool:
+        """Whether emails without a client name go to the client of their sender"""
 
-        return clients
+        return self.config.settings.match_sender
 
     def get_client_table(self) -> Table:
         rows = []
@@ -43,3 +64,67 @@ class ClientService:
         )
 
         return table
+
+
+class ClientMatcher:
+    def __init__(self, clients: List[Client], match_sender: bool = False) -> None:
+        """Assign emails to clients with an index of the client names' words
+
+        Names and subjects are split into lowercase words, the names are indexed by
+        their word sequence so "Client 1" never matches "Client 10". When several
+        names are found in a subject the longest one wins.
+
+        Args:
+            clients (List[Client]): Clients to match
+            match_sender (bool): Fall back to the sender address, matched against
+                the clients' email, when no name is in the subject
+        """
+        self._names: Dict[Tuple[str, ...], str] = {}
+        self._emails: Dict[str, str] = {}
+
+        for client in clients:
+            tokens = self.tokenize(client.name)
+
+            if tokens:
+                self._names.setdefault(tokens, client.name)
+
+            if match_sender:
+                self._emails.setdefault(client.email.lower(), client.name)
+
+        self._max_tokens = max((len(tokens) for tokens in self._names), default=0)
+
+    @staticmethod
+    def tokenize(text: str) -> Tuple[str, ...]:
+        return tuple(TOKEN_PATTERN.findall(text.lower()))
+
+    def match(self, subject: str, sender: str = "") -> Optional[str]:
+        """Find the client an email belongs to
+
+        Args:
+            subject (str): Email's subject
+            sender (str): Email's From header
+
+        Returns:
+            Optional[str]: Client name, None if no client matches
+        """
+        tokens = self.tokenize(subject)
+        best = None
+
+        for start in range(len(tokens)):
+            longest = min(self._max_tokens, len(tokens) - start)
+
+            # Only a strictly longer name can beat the current best match
+            for length in range(longest, len(best) if best else 0, -1):
+                name_tokens = tokens[start : start + length]
+
+                if name_tokens in self._names:
+                    best = name_tokens
+                    break
+
+        if best:
+            return self._names[best]
+
+        if self._emails and sender:
+            return self._emails.get(parseaddr(sender)[1].lower())
+
+        return None
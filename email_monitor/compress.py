@@ -0,0 +1,100 @@
+from typing import Optional
+import zlib
+
+from email_monitor.profiling import profiler
+
+# Compressed bytes read from the socket at once
+READ_SIZE = 65536
+
+
+class DeflateStream:
+    def __init__(self, sock, file) -> None:
+        """COMPRESS=DEFLATE layer (RFC 4978) of an imaplib connection
+
+        Replaces both the ``sock`` and the ``file`` of the connection, imaplib
+        keeps reading lines and literals and sending commands through them
+        while the bytes on the wire are raw deflate streams. Each command is
+        flushed with Z_SYNC_FLUSH so the server can read it at once.
+
+        Args:
+            sock (socket.socket): Socket of the connection, SSL or not
+            file (BinaryIO): Buffered reader of the socket, it may hold bytes
+                already received
+        """
+        self.sock = sock
+        self.file = file
+        self._compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+        )
+        self._decompressor = zlib.decompressobj(-15)
+        self._buffer = bytearray()
+
+    def _fill(self) -> bool:
+        data = self.file.read1(READ_SIZE)
+
+        if not data:
+            return False
+
+        profiler.count("imap.compressed_bytes_read", len(data))
+        self._buffer += self._decompressor.decompress(data)
+
+        return True
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size and self._fill():
+            pass
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        return data
+
+    def readline(self, limit: int = -1) -> bytes:
+        while True:
+            end = self._buffer.find(b"\n")
+
+            if end >= 0 or (0 <= limit <= len(self._buffer)) or not self._fill():
+                break
+
+        size = end + 1 if end >= 0 else len(self._buffer)
+
+        if limit >= 0:
+            size = min(size, limit)
+
+        return self.read(size)
+
+    def sendall(self, data: bytes) -> None:
+        data = self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        profiler.count("imap.compressed_bytes_sent", len(data))
+        self.sock.sendall(data)
+
+    def pending(self) -> int:
+        """Bytes readable without waiting on the socket, see EmailClient._idle"""
+        return len(self._buffer) + getattr(self.sock, "pending", lambda: 0)()
+
+    def reopen(self) -> None:
+        """Read the socket through a new file, one that timed out can't be read"""
+        self.file.close()
+        self.file = self.sock.makefile("rb")
+
+    def gettimeout(self) -> Optional[float]:
+        return self.sock.gettimeout()
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        self.sock.settimeout(timeout)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def shutdown(self, how: int) -> None:
+        self.sock.shutdown(how)
+
+    def close(self) -> None:
+        # imaplib closes its file, shuts its socket down then closes it, both are
+        # this stream
+        if not self.file.closed:
+            self.file.close()
+        else:
+            self.sock.close()
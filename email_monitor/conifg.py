@@ -1,14 +1,20 @@
-import json
 import os
 from pathlib import Path
 import sys
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from email_monitor.console import console
 
+# Imported when the file is read, pydantic is too slow to import for --help
+if TYPE_CHECKING:
+    from email_monitor.classifier import StatusClassifier
+    from email_monitor.clients import Client
+    from email_monitor.settings import Settings
 
 PASS_KEYWORDS = ["success", "succès", "reusit"]
 WARNING_KEYWORDS = ["warning"]
+DEFAULT_CACHE_FILE = "~/.cache/email-monitor/mailbox.sqlite3"
+DEFAULT_SNAPSHOT_FILE = "~/.cache/email-monitor/snapshots.sqlite3"
 
 
 class InvalidConfig(Exception): ...
@@ -16,15 +22,24 @@ class InvalidConfig(Exception): ...
 
 class Config:
 
-    def __init__(self) -> None:
+    def __init__(self, config_file: Path = None) -> None:
+        """Configuration file parsed and validated once, re-read when it changes
+
+        Args:
+            config_file (Path): Configuration file, EMAIL_MONITOR_CONFIG or
+                ./config.json by default
+        """
         self._config_file = Path(
-            os.environ.get("EMAIL_MONITOR_CONFIG", "./config.json")
+            config_file or os.environ.get("EMAIL_MONITOR_CONFIG", "./config.json")
         ).resolve()
+        self._settings: Optional["Settings"] = None
+        self._stamp: Optional[Tuple[int, int]] = None
 
         self.validate()
 
     def set_config_file(self, config_file: Path) -> None:
-        self._config_file = config_file
+        self._config_file = Path(config_file).resolve()
+        self._stamp = None
 
     def get_config_file(self):
         if self._config_file.exists():
@@ -32,38 +47,104 @@ class Config:
         else:
             raise FileNotFoundError
 
-    def get_clients(self) -> List[Dict[str, Any]]:
+    @property
+    def settings(self) -> "Settings":
+        """Validated settings, parsed again only if the file's mtime or size changed
+
+        A file that became invalid is reported and the previous settings are kept,
+        so a long running monitor survives a bad edit.
+        """
+        stat = os.stat(self._config_file)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        if stamp != self._stamp:
+            try:
+                self._settings = self._read_config()
+            except InvalidConfig:
+                if self._settings is None:
+                    raise
+                console.log_warning(
+                    f"Invalid configuration {self._config_file}, "
+                    "keeping the previous one"
+                )
 
-        config_json = self._read_config()
+            self._stamp = stamp
 
-        return config_json["clients"]
+        return self._settings
+
+    @property
+    def clients(self) -> List["Client"]:
+        """Validated clients, the same list as long as the file doesn't change"""
+
+        return self.settings.clients
+
+    def get_clients(self) -> List[Dict[str, Any]]:
+
+        return [client.model_dump() for client in self.clients]
 
     def get_email_config(self) -> Dict[str, Any]:
+        """Configuration of the first email account, the one sending the reports"""
 
-        config_json = self._read_config()
+        return self.get_email_configs()[0]
 
-        return config_json["email"]
+    def get_email_configs(self) -> List[Dict[str, Any]]:
+        """Configuration of every email account
 
-    def _read_config(self) -> Dict[str, Any]:
-        with open(self._config_file, mode="r", encoding="utf-8") as config:
-            return json.load(config)
+        ``email`` is either one account or a list of accounts, each with an
+        optional ``mailboxes`` list (INBOX by default).
+        """
 
-    def get_pass_keywords(self) -> List[str]:
-        return PASS_KEYWORDS
+        return [account.model_dump() for account in self.settings.email]
+
+    def get_cache_file(self) -> Path:
+
+        cache_file = os.environ.get(
+            "EMAIL_MONITOR_CACHE", self.settings.cache_file or DEFAULT_CACHE_FILE
+        )
+
+        return Path(cache_file).expanduser()
+
+    def get_snapshot_file(self) -> Path:
+        """Snapshots of the statuses sent, compared by send-report --on-change"""
+
+        snapshot_file = os.environ.get(
+            "EMAIL_MONITOR_SNAPSHOTS",
+            self.settings.snapshot_file or DEFAULT_SNAPSHOT_FILE,
+        )
+
+        return Path(snapshot_file).expanduser()
+
+    def _read_config(self) -> "Settings":
+        from pydantic import ValidationError
+
+        from email_monitor.settings import Settings
 
-    def validate(self):
         try:
+            with open(self._config_file, mode="rb") as config:
+                return Settings.model_validate_json(config.read())
+        except ValidationError as ex:
+            raise InvalidConfig(str(ex)) from ex
 
-            email = self.get_email_config()
+    def get_report_recipients(self) -> List[str]:
+        """Addresses receiving the full report besides the --to-address ones"""
 
-            if ["server", "email", "password"] != list(email.keys()):
-                raise InvalidConfig
+        return self.settings.report_recipients
 
-            clients = self.get_clients()
+    def get_pass_keywords(self) -> List[str]:
+        success = self.settings.keywords.success
+
+        return PASS_KEYWORDS if success is None else success
+
+    def get_classifier(self) -> "StatusClassifier":
+        """Classifier of the global and per client keywords of the file"""
+        from email_monitor.classifier import StatusClassifier
+
+        return StatusClassifier.from_settings(self.settings)
+
+    def validate(self):
+        try:
 
-            for client in clients:
-                if ["name", "email"] != list(client.keys()):
-                    raise InvalidConfig
+            self.settings
 
         except InvalidConfig:
             console.log_warning("Invalid configuration")
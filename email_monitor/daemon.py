@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+import imaplib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from email_monitor.console import console
+from email_monitor.monitor import BACKUP_CRITERIA, EmailBackup, EmailClient, Monitor
+
+# A last backup older than this is missing, like in the daily report
+WINDOW = timedelta(hours=24)
+
+
+class MonitorDaemon:
+    def __init__(
+        self, monitor: Monitor, idle_timeout: float = 600, poll_interval: float = 30
+    ) -> None:
+        """Keep the IMAP connections open and track the last backup of every client
+
+        Each mailbox of the monitor is watched by its own thread.
+
+        Args:
+            monitor (Monitor): Monitor whose email clients are kept connected
+            idle_timeout (float): Seconds before IDLE is restarted
+            poll_interval (float): Seconds between two NOOP if IDLE is unsupported
+        """
+        self.monitor = monitor
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        # Last backup of every client in the last 24 hours, None if missing
+        self.status: Dict[str, Optional[EmailBackup]] = {}
+        # (UIDVALIDITY, last processed UID) of every mailbox
+        self.positions: Dict[EmailClient, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Connect and fill the status table with the last 24 hours"""
+        for email_client in self.monitor.email_clients:
+            email_client.ensure_connected()
+            self.positions[email_client] = (
+                email_client.uidvalidity,
+                email_client.get_last_uid(),
+            )
+
+        self.status = self.monitor.get_last_backups(datetime.now())
+
+    def poll(self, email_client: EmailClient = None) -> Dict[str, EmailBackup]:
+        """Fetch the emails that arrived since the last poll and update the table
+
+        Args:
+            email_client (EmailClient): Mailbox to poll, the first one by default
+
+        Returns:
+            Dict[str, EmailBackup]: Clients whose last backup changed
+        """
+        email_client = email_client or self.monitor.email_client
+        uidvalidity, last_uid = self.positions[email_client]
+
+        if email_client.uidvalidity != uidvalidity:
+            # The UIDs changed meaning, start over from the last 24 hours
+            last_uid = email_client.get_last_uid()
+            since = datetime.now() - timedelta(hours=24)
+            emails = email_client.get_all_emails(
+                EmailClient.get_since_imap_query(since, BACKUP_CRITERIA)
+            )
+        else:
+            emails, last_uid = email_client.get_emails_after_uid(last_uid)
+
+        self.positions[email_client] = (email_client.uidvalidity, last_uid)
+
+        return self._update(emails)
+
+    def _update(self, emails: List[EmailBackup]) -> Dict[str, EmailBackup]:
+        changed = {}
+
+        with self._lock:
+            for client, client_emails in self.monitor.assign(emails).items():
+                for email in client_emails:
+                    current = self.status.get(client)
+
+                    if current is None or current.date <= email.date:
+                        self.status[client] = changed[client] = email
+
+        return changed
+
+    def _expire(self) -> List[str]:
+        """Clients whose last backup left the window, now missing
+
+        Called with the lock held.
+        """
+        oldest = time.time() - WINDOW.total_seconds()
+        expired = [
+            client
+            for client, email in self.status.items()
+            if email is not None and email.date.timestamp() < oldest
+        ]
+
+        for client in expired:
+            self.status[client] = None
+
+        return expired
+
+    def run(
+        self,
+        on_change: Callable[[str, Optional[EmailBackup]], None],
+        on_poll: Optional[Callable[[EmailClient, float], None]] = None,
+    ) -> None:
+        """Wait for new emails forever, reconnecting if a connection drops
+
+        The status table is loaded first unless load was already called.
+
+        Args:
+            on_change (Callable[[str, Optional[EmailBackup]], None]): Called
+                with the client name and its new last backup email, or None
+                once its last backup is more than 24 hours old, checked at
+                every poll
+            on_poll (Optional[Callable[[EmailClient, float], None]]): Called after
+                every poll of a mailbox, changes or not, with the seconds it took
+        """
+        if not self.positions:
+            self.load()
+
+        if len(self.monitor.email_clients) == 1:
+            self._watch(self.monitor.email_client, on_change, on_poll)
+            return
+
+        threads = [
+            threading.Thread(
+                target=self._watch,
+                args=(email_client, on_change, on_poll),
+                daemon=True,
+            )
+            for email_client in self.monitor.email_clients
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        # Short joins so KeyboardInterrupt still reaches the main thread
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+    def _watch(
+        self,
+        email_client: EmailClient,
+        on_change: Callable[[str, Optional[EmailBackup]], None],
+        on_poll: Optional[Callable[[EmailClient, float], None]] = None,
+    ) -> None:
+        while True:
+            try:
+                email_client.ensure_connected()
+
+                start = time.perf_counter()
+                changed = self.poll(email_client)
+                latency = time.perf_counter() - start
+
+                with self._lock:
+                    for client, email in changed.items():
+                        on_change(client, email)
+
+                    for client in self._expire():
+                        on_change(client, None)
+
+                    if on_poll:
+                        on_poll(email_client, latency)
+
+                email_client.wait_for_new_emails(self.idle_timeout, self.poll_interval)
+
+            except (imaplib.IMAP4.error, OSError) as ex:
+                # A refused SELECT, SEARCH or IDLE too, on a new connection it
+                # may succeed and the other mailboxes keep being watched
+                console.log_warning(
+                    f"Connection to {email_client.account} failed ({ex}), "
+                    "reconnecting"
+                )
+                email_client.disconnect()
+                time.sleep(self.poll_interval)
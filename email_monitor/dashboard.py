@@ -0,0 +1,149 @@
+from datetime import datetime
+import time
+from typing import Dict, List, Optional
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.segment import Segment
+from rich.text import Text
+
+from email_monitor.monitor import EmailBackup
+
+STATUS_STYLES = {
+    "success": "bold green",
+    "warning": "bold yellow",
+    "failure": "bold red",
+    "missing": "bold red",
+}
+SEPARATOR = " │ "
+DATE_WIDTH = 16
+STATUS_WIDTH = 7
+# Longest client name shown whole, longer ones are cut
+CLIENT_WIDTH = 30
+
+
+class StatusBoard:
+    def __init__(
+        self, status: Dict[str, Optional[EmailBackup]], title: str = "Sauvegardes"
+    ) -> None:
+        """Status table of every client for rich.live, re-rendering changed rows only
+
+        Each row is rendered once to segments and kept until the client's last
+        backup changes or the terminal is resized, a refresh after a poll only
+        renders the rows that changed and the footer.
+
+        Args:
+            status (Dict[str, Optional[EmailBackup]]): Last backup of every client,
+                None if missing, in display order
+            title (str): Title shown above the table
+        """
+        self.title = title
+        self.status = dict(status)
+        self.last_poll: Optional[datetime] = None
+        self.poll_latency = 0.0
+        self.render_latency = 0.0
+        # Rows rendered since the start, to check the cache does its job
+        self.rendered_rows = 0
+        self._rows: Dict[str, List[Segment]] = {}
+        self._widths_rendered: List[int] = []
+
+    def update(self, client: str, email: Optional[EmailBackup]) -> None:
+        """New last backup of client, None if missing, its row is rendered again
+        on next refresh"""
+        self.status[client] = email
+        self._rows.pop(client, None)
+
+    def polled(self, latency: float) -> None:
+        """Record a poll, the footer shows its time and duration"""
+        self.last_poll = datetime.now()
+        self.poll_latency = latency
+
+    def _widths(self, width: int) -> List[int]:
+        client_width = min(max(map(len, self.status), default=6), CLIENT_WIDTH)
+        fixed = client_width + DATE_WIDTH + STATUS_WIDTH + 3 * len(SEPARATOR)
+
+        return [client_width, max(width - fixed, 10), DATE_WIDTH, STATUS_WIDTH]
+
+    @staticmethod
+    def _render_row(
+        console: Console, cells: List[Text], widths: List[int]
+    ) -> List[Segment]:
+        row = Text()
+
+        for index, (cell, width) in enumerate(zip(cells, widths)):
+            cell.truncate(width, overflow="ellipsis", pad=True)
+
+            if index:
+                row.append(SEPARATOR, style="dim")
+
+            row.append_text(cell)
+
+        return list(row.render(console))
+
+    def _client_row(
+        self, console: Console, client: str, widths: List[int]
+    ) -> List[Segment]:
+        email = self.status[client]
+        status = email.get_status() if email else "missing"
+        style = STATUS_STYLES[status]
+        self.rendered_rows += 1
+
+        return self._render_row(
+            console,
+            [
+                Text(client, style="bold"),
+                Text(email.subject if email else "-", style=style),
+                Text(email.date.strftime("%d-%m-%Y %H:%M") if email else "Missing"),
+                Text(status.title(), style=style),
+            ],
+            widths,
+        )
+
+    def footer(self) -> Text:
+        failing = sum(
+            1
+            for email in self.status.values()
+            if email is None or email.get_status() == "failure"
+        )
+        last_poll = f"{self.last_poll:%H:%M:%S}" if self.last_poll else "-"
+
+        return Text(
+            f"Last poll {last_poll} · poll {self.poll_latency * 1000:.0f} ms"
+            f" · render {self.render_latency * 1000:.1f} ms"
+            f" · {failing}/{len(self.status)} failing",
+            style="dim",
+        )
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        start = time.perf_counter()
+        widths = self._widths(options.max_width)
+
+        if widths != self._widths_rendered:
+            self._rows.clear()
+            self._widths_rendered = widths
+
+        yield Text(self.title, style="bold", justify="center")
+        yield from self._render_row(
+            console,
+            [
+                Text(column, style="bold")
+                for column in ["Client", "Email", "Date", "Status"]
+            ],
+            widths,
+        )
+        yield Segment.line()
+        yield Segment(
+            "─" * sum(widths + [3 * len(SEPARATOR)]), console.get_style("dim")
+        )
+        yield Segment.line()
+
+        for client in self.status:
+            if client not in self._rows:
+                self._rows[client] = self._client_row(console, client, widths)
+
+            yield from self._rows[client]
+            yield Segment.line()
+
+        self.render_latency = time.perf_counter() - start
+        yield self.footer()
@@ -0,0 +1,247 @@
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import imaplib
+import threading
+import time
+from typing import Dict, List, Optional
+
+from email_monitor.console import console
+from email_monitor.monitor import EmailBackup, EmailClient, Monitor
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STATUSES = ["success", "warning", "failure", "missing"]
+
+
+class BackupExporter:
+    def __init__(self, monitor: Monitor, ttl: float = 300) -> None:
+        """Serve the last backup of every client in the Prometheus text format
+
+        The status is refreshed by a background thread every ttl seconds, the
+        scrapes only read the last results and never reach the IMAP server. The
+        IMAP connections are kept open between two refreshes.
+
+        Args:
+            monitor (Monitor): Monitor whose last backups are exported
+            ttl (float): Seconds between two refreshes
+        """
+        self.monitor = monitor
+        self.ttl = ttl
+        self.status: Dict[str, Optional[EmailBackup]] = {}
+        self.last_success: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.collections = 0
+        self.errors: Dict[str, int] = {}
+        # Failed refreshes that aren't IMAP or network errors, bugs included
+        self.failures: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def refresh(self) -> bool:
+        """Fetch the last backups, the previous ones are kept on IMAP errors
+
+        Returns:
+            bool: True if the status was updated
+        """
+        start = time.perf_counter()
+
+        try:
+            status = self.monitor.get_last_backups(datetime.now())
+        except Exception as ex:
+            imap_error = isinstance(ex, (imaplib.IMAP4.error, OSError))
+            counts = self.errors if imap_error else self.failures
+
+            with self._lock:
+                self.collections += 1
+                name = type(ex).__name__
+                counts[name] = counts.get(name, 0) + 1
+
+            if imap_error:
+                console.log_warning(f"Couldn't refresh the backups ({ex})")
+            else:
+                console.log_error(f"Refreshing the backups failed: {ex!r}")
+
+            # Reconnect on the next refresh
+            for email_client in self.monitor.email_clients:
+                if isinstance(email_client, EmailClient):
+                    email_client.disconnect()
+
+            return False
+
+        with self._lock:
+            self.collections += 1
+            self.status = status
+            self.last_success = time.time()
+            self.last_duration = time.perf_counter() - start
+
+        return True
+
+    def start(self) -> None:
+        """Refresh in a daemon thread until stop is called"""
+        self._stop.clear()
+        threading.Thread(target=self._refresh_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _refresh_forever(self) -> None:
+        while not self._stop.wait(self.ttl):
+            self.refresh()
+
+    def render(self, now: Optional[float] = None) -> str:
+        """Metrics in the Prometheus text exposition format
+
+        Args:
+            now (Optional[float]): Timestamp the ages are computed from
+
+        Returns:
+            str: Metrics, one sample per line
+        """
+        now = now or time.time()
+
+        with self._lock:
+            status = dict(self.status)
+            last_success, last_duration = self.last_success, self.last_duration
+            collections, errors = self.collections, dict(self.errors)
+            failures = dict(self.failures)
+
+        lines = [
+            "# HELP email_monitor_backup_status Status of the last backup email",
+            "# TYPE email_monitor_backup_status gauge",
+        ]
+
+        for client, email in status.items():
+            current = email.get_status() if email else "missing"
+
+            for name in STATUSES:
+                lines.append(
+                    _sample(
+                        "email_monitor_backup_status",
+                        int(name == current),
+                        client=client,
+                        status=name,
+                    )
+                )
+
+        timestamps = {
+            client: email.date.timestamp()
+            for client, email in status.items()
+            if email and isinstance(email.date, datetime)
+        }
+
+        lines += [
+            "# HELP email_monitor_backup_last_timestamp_seconds Date of the last "
+            "backup email",
+            "# TYPE email_monitor_backup_last_timestamp_seconds gauge",
+        ]
+        lines += [
+            _sample(
+                "email_monitor_backup_last_timestamp_seconds", timestamp, client=client
+            )
+            for client, timestamp in timestamps.items()
+        ]
+
+        lines += [
+            "# HELP email_monitor_backup_age_seconds Age of the last backup email",
+            "# TYPE email_monitor_backup_age_seconds gauge",
+        ]
+        lines += [
+            _sample("email_monitor_backup_age_seconds", now - timestamp, client=client)
+            for client, timestamp in timestamps.items()
+        ]
+
+        lines += [
+            "# HELP email_monitor_collections_total Refreshes of the backup status",
+            "# TYPE email_monitor_collections_total counter",
+            _sample("email_monitor_collections_total", collections),
+            "# HELP email_monitor_imap_errors_total Failed refreshes by error type",
+            "# TYPE email_monitor_imap_errors_total counter",
+        ]
+        lines += [
+            _sample("email_monitor_imap_errors_total", count, type=name)
+            for name, count in sorted(errors.items())
+        ]
+        lines += [
+            "# HELP email_monitor_collection_errors_total Refreshes failed on "
+            "another error, by type",
+            "# TYPE email_monitor_collection_errors_total counter",
+        ]
+        lines += [
+            _sample("email_monitor_collection_errors_total", count, type=name)
+            for name, count in sorted(failures.items())
+        ]
+
+        if last_success is not None:
+            lines += [
+                "# HELP email_monitor_collection_duration_seconds Duration of the "
+                "last successful refresh",
+                "# TYPE email_monitor_collection_duration_seconds gauge",
+                _sample("email_monitor_collection_duration_seconds", last_duration),
+                "# HELP email_monitor_collection_last_success_timestamp_seconds "
+                "Date of the last successful refresh",
+                "# TYPE email_monitor_collection_last_success_timestamp_seconds gauge",
+                _sample(
+                    "email_monitor_collection_last_success_timestamp_seconds",
+                    last_success,
+                ),
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "0.0.0.0", port: int = 9842) -> None:
+        """Serve /metrics until interrupted, refreshing in the background
+
+        A first refresh is done before listening so the first scrape has data.
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on
+        """
+        self.refresh()
+        self.start()
+
+        exporter = self
+
+        class Handler(_MetricsHandler):
+            metrics = exporter
+
+        server = ThreadingHTTPServer((host, port), Handler)
+
+        try:
+            server.serve_forever()
+        finally:
+            self.stop()
+            server.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics: BackupExporter
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+
+        body = self.metrics.render().encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        # One line per scrape would flood the console
+        pass
+
+
+def _sample(name: str, value: float, **labels: str) -> str:
+    if not labels:
+        return f"{name} {value}"
+
+    pairs: List[str] = [f'{key}="{_escape(label)}"' for key, label in labels.items()]
+
+    return f"{name}{{{','.join(pairs)}}} {value}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,500 @@
+import base64
+from html import unescape
+import imaplib
+import quopri
+import re
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from email_monitor.monitor import UID_PATTERN, EmailBackup, EmailClient
+from email_monitor.profiling import profiler
+
+# Bytes of the text part fetched, the summary of a backup report comes first
+MAX_BODY_BYTES = 4096
+BODYSTRUCTURE_PATTERN = re.compile(rb"BODYSTRUCTURE ")
+TOKEN_PATTERN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+LITERAL_PATTERN = re.compile(rb"\{(\d+)\}$")
+TAG_PATTERN = re.compile(
+    r"<(style|script)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL
+)
+SPACE_PATTERN = re.compile(r"[ \t\r\f\v]+")
+UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4, "p": 1024**5}
+DURATION_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+class BackupMetrics(NamedTuple):
+    """Figures read from the body of a backup report, None when not found"""
+
+    vendor: str
+    size: Optional[int] = None  # Bytes transferred or written
+    duration: Optional[float] = None  # Seconds
+    jobs: Optional[int] = None
+    errors: Optional[int] = None
+
+
+class TextPart(NamedTuple):
+    section: str  # Part number for BODY[section], 1.2 is the second of the first
+    subtype: str  # plain or html
+    encoding: str
+    charset: str
+
+
+class VendorParser(NamedTuple):
+    """Patterns of a backup tool report, the first group of each is the value"""
+
+    name: str
+    detect: re.Pattern
+    size: Optional[re.Pattern] = None
+    duration: Optional[re.Pattern] = None
+    # Every match is added, a report lists the jobs by status
+    jobs: Optional[re.Pattern] = None
+    errors: Optional[re.Pattern] = None
+
+    def parse(self, text: str) -> BackupMetrics:
+        return BackupMetrics(
+            vendor=self.name,
+            size=_search(self.size, text, parse_size),
+            duration=_search(self.duration, text, parse_duration),
+            jobs=_total(self.jobs, text),
+            errors=_total(self.errors, text),
+        )
+
+
+# B or o (octets), 1024 based whatever the i
+SIZE = r"(\d[\d.,]*\s*[kmgtp]?i?[bo])\b"
+CLOCK = r"(\d+:\d{2}:\d{2}|(?:\d+\s*[a-z]+\s*)+)"
+
+# The first parser detecting its vendor in the text is used, the generic one last
+VENDORS: List[VendorParser] = [
+    VendorParser(
+        "veeam",
+        re.compile(r"veeam", re.IGNORECASE),
+        size=re.compile(r"transferred\s*:?\s*" + SIZE, re.IGNORECASE),
+        duration=re.compile(r"duration\s*:?\s*(\d+:\d{2}:\d{2})", re.IGNORECASE),
+        jobs=re.compile(r"\b(?:success|warning|error)\s*:?\s*(\d+)\b", re.IGNORECASE),
+        errors=re.compile(r"\berror\s*:?\s*(\d+)\b", re.IGNORECASE),
+    ),
+    VendorParser(
+        "bacula",
+        re.compile(r"bacula|bareos|SD Bytes Written", re.IGNORECASE),
+        size=re.compile(r"SD Bytes Written:\s*([\d,.]+)", re.IGNORECASE),
+        duration=re.compile(r"Elapsed time:\s*" + CLOCK, re.IGNORECASE),
+        jobs=re.compile(r"^\s*JobId:\s*()\d", re.IGNORECASE | re.MULTILINE),
+        errors=re.compile(r"(?:FD|SD) Errors:\s*(\d+)", re.IGNORECASE),
+    ),
+    VendorParser(
+        "generic",
+        re.compile(r""),
+        size=re.compile(
+            r"(?:transferred|total size|size|written)\s*:?\s*" + SIZE, re.IGNORECASE
+        ),
+        duration=re.compile(
+            r"(?:duration|elapsed(?: time)?)\s*:?\s*" + CLOCK, re.IGNORECASE
+        ),
+        jobs=re.compile(r"\bjobs?\s*:?\s*(\d+)\b", re.IGNORECASE),
+        errors=re.compile(r"\berrors?\s*:?\s*(\d+)\b", re.IGNORECASE),
+    ),
+]
+
+
+class MetricsExtractor:
+    def __init__(
+        self, max_bytes: int = MAX_BODY_BYTES, own_connections: bool = False
+    ) -> None:
+        """Read backup metrics from the first text part of the emails
+
+        The BODYSTRUCTURE of the emails is fetched first, then only the first
+        max_bytes of their first text part with partial BODY.PEEK fetches.
+        Attachments are never downloaded and the emails stay unread. Both
+        fetches are sent once per chunk of emails, not once per email.
+
+        Args:
+            max_bytes (int): Bytes of the text part fetched for each email
+            own_connections (bool): Fetch on a connection of its own to each
+                mailbox, needed while the mailboxes are still being searched in
+                other threads. They stay open until close
+        """
+        self.max_bytes = max_bytes
+        self.own_connections = own_connections
+        self._connections: Dict[EmailClient, EmailClient] = {}
+
+    def extract(self, emails: Iterable[EmailBackup]) -> int:
+        """Set the metrics of the emails fetched from an IMAP mailbox
+
+        Emails of archives, or already extracted, are skipped.
+
+        Args:
+            emails (Iterable[EmailBackup]): Emails, from several mailboxes or not
+
+        Returns:
+            int: Number of emails with metrics
+        """
+        by_source: Dict[EmailClient, Dict[int, EmailBackup]] = {}
+
+        for email in emails:
+            if (
+                isinstance(email.source, EmailClient)
+                and email.uid is not None
+                and email.metrics is None
+            ):
+                by_source.setdefault(email.source, {})[email.uid] = email
+
+        extracted = 0
+
+        for email_client, by_uid in by_source.items():
+            if self.own_connections:
+                if email_client not in self._connections:
+                    self._connections[email_client] = email_client.copy()
+
+                email_client = self._connections[email_client]
+
+            for uid, metrics in self.fetch_metrics(email_client, list(by_uid)):
+                if uid in by_uid:
+                    by_uid[uid].metrics = metrics
+                    extracted += 1
+
+        return extracted
+
+    def close(self) -> None:
+        """Close the connections of its own, if any"""
+        for email_client in self._connections.values():
+            email_client.disconnect()
+
+        self._connections.clear()
+
+    def fetch_metrics(
+        self, email_client: EmailClient, uids: List[int]
+    ) -> Iterator[Tuple[int, BackupMetrics]]:
+        """Metrics of the emails of a mailbox, connecting first if needed
+
+        Args:
+            email_client (EmailClient): Mailbox the UIDs belong to
+            uids (List[int]): Emails to read
+
+        Yields:
+            Tuple[int, BackupMetrics]: UID and metrics, emails without a text
+                part are skipped
+        """
+        email_client.ensure_connected()
+
+        for start in range(0, len(uids), email_client.fetch_chunk_size):
+            chunk = uids[start : start + email_client.fetch_chunk_size]
+            parts: Dict[TextPart, List[int]] = {}
+
+            for uid, part in self._fetch_text_parts(email_client, chunk):
+                parts.setdefault(part, []).append(uid)
+
+            # One partial fetch for all the emails sharing the same structure
+            for part, part_uids in parts.items():
+                for uid, data in self._fetch_section(email_client, part, part_uids):
+                    with profiler.span("parse.metrics"):
+                        yield uid, parse_metrics(decode_text(data, part))
+
+    def _fetch_text_parts(
+        self, email_client: EmailClient, uids: List[int]
+    ) -> Iterator[Tuple[int, TextPart]]:
+        with profiler.span("imap.fetch"):
+            status, data = email_client.mail.uid(
+                "FETCH", email_client._message_set(uids), "(UID BODYSTRUCTURE)"
+            )
+
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"FETCH BODYSTRUCTURE failed: {data}")
+
+        for response in _join_literals(data):
+            uid = UID_PATTERN.search(response)
+            structure = BODYSTRUCTURE_PATTERN.search(response)
+
+            if not uid or not structure:
+                continue
+
+            tokens = iter(TOKEN_PATTERN.findall(response[structure.end() :]))
+
+            if next(tokens, None) != b"(":
+                continue
+
+            part = find_text_part(_parse_list(tokens))
+
+            if part:
+                yield int(uid.group(1)), part
+
+    def _fetch_section(
+        self, email_client: EmailClient, part: TextPart, uids: List[int]
+    ) -> Iterator[Tuple[int, bytes]]:
+        item = f"BODY.PEEK[{part.section}]<0.{self.max_bytes}>"
+
+        with profiler.span("imap.fetch"):
+            status, data = email_client.mail.uid(
+                "FETCH", email_client._message_set(uids), f"(UID {item})"
+            )
+
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"FETCH BODY failed: {data}")
+
+        for response in data:
+            if isinstance(response, tuple):
+                uid = UID_PATTERN.search(response[0])
+
+                if uid:
+                    profiler.count("metrics.body_bytes", len(response[1]))
+                    yield int(uid.group(1)), response[1]
+
+
+def with_metrics(
+    backups: Iterable[Tuple[str, EmailBackup]],
+    extractor: Optional[MetricsExtractor] = None,
+    batch_size: int = 200,
+) -> Iterator[Tuple[str, EmailBackup]]:
+    """Extract the metrics of a stream of emails a batch at a time
+
+    The stream may still be searching the mailboxes in other threads, on their
+    connections, so the default extractor opens its own ones.
+
+    Args:
+        backups (Iterable[Tuple[str, EmailBackup]]): Client name and email
+        extractor (Optional[MetricsExtractor]): Extractor, one with its own
+            connections, closed at the end, if None
+        batch_size (int): Emails held while their metrics are fetched
+
+    Yields:
+        Tuple[str, EmailBackup]: The same pairs, in the same order
+    """
+    own_extractor = extractor is None
+    extractor = extractor or MetricsExtractor(own_connections=True)
+    batch = []
+
+    try:
+        for pair in backups:
+            batch.append(pair)
+
+            if len(batch) >= batch_size:
+                extractor.extract(email for _, email in batch)
+                yield from batch
+                batch = []
+
+        extractor.extract(email for _, email in batch)
+        yield from batch
+    finally:
+        if own_extractor:
+            extractor.close()
+
+
+def find_text_part(structure: list, section: str = "") -> Optional[TextPart]:
+    """First text/plain part of a parsed BODYSTRUCTURE, else the first text/html
+
+    Attachments and attached messages are skipped.
+
+    Args:
+        structure (list): BODYSTRUCTURE parsed by _parse_list
+        section (str): Part number of structure, empty for the message itself
+
+    Returns:
+        Optional[TextPart]: The part, None if the email has no text part
+    """
+    html = None
+
+    for part_section, part in _iter_leaves(structure, section):
+        if len(part) < 7 or not isinstance(part[0], str):
+            continue
+
+        main_type, subtype = part[0].lower(), str(part[1]).lower()
+        disposition = part[9] if main_type == "text" and len(part) > 9 else None
+
+        if (
+            main_type != "text"
+            or subtype not in ("plain", "html")
+            or isinstance(disposition, list)
+            and str(disposition[0]).lower() == "attachment"
+        ):
+            continue
+
+        params = part[2] if isinstance(part[2], list) else []
+        charset = dict(zip(params[::2], params[1::2]))
+
+        text_part = TextPart(
+            part_section,
+            subtype,
+            str(part[5] or "7bit").lower(),
+            next(
+                (v for k, v in charset.items() if str(k).lower() == "charset"), "utf-8"
+            ),
+        )
+
+        if subtype == "plain":
+            return text_part
+
+        html = html or text_part
+
+    return html
+
+
+def _iter_leaves(structure: list, section: str) -> Iterator[Tuple[str, list]]:
+    if structure and isinstance(structure[0], list):
+        # Multipart: the sub parts come first, then the subtype and extensions
+        for index, child in enumerate(_leading_lists(structure), 1):
+            yield from _iter_leaves(
+                child, f"{section}.{index}" if section else str(index)
+            )
+
+        return
+
+    # A single part message has a section 1 too
+    yield section or "1", structure
+
+
+def _leading_lists(structure: list) -> Iterator[list]:
+    for item in structure:
+        if not isinstance(item, list):
+            return
+
+        yield item
+
+
+def decode_text(data: bytes, part: TextPart) -> str:
+    """Text of a partial body fetch, the cut at the end is harmless"""
+    if part.encoding == "base64":
+        data = b"".join(data.split())
+        data = base64.b64decode(data[: len(data) - len(data) % 4])
+    elif part.encoding == "quoted-printable":
+        data = quopri.decodestring(data)
+
+    try:
+        text = data.decode(part.charset, errors="replace")
+    except LookupError:
+        text = data.decode("utf-8", errors="replace")
+
+    if part.subtype == "html":
+        text = unescape(TAG_PATTERN.sub(" ", text))
+
+    return SPACE_PATTERN.sub(" ", text)
+
+
+def parse_metrics(text: str) -> BackupMetrics:
+    """Metrics of a report body, with the parser of the first vendor detected"""
+    for vendor in VENDORS:
+        if vendor.detect.search(text):
+            return vendor.parse(text)
+
+    return BackupMetrics("unknown")
+
+
+def parse_size(value: str) -> Optional[int]:
+    """Bytes of "12.3 GB", "1,5 Go" or "123,456", units are powers of 1024"""
+    match = re.fullmatch(r"([\d.,]+)\s*([kmgtp]?)i?[bo]?", value.strip().lower())
+
+    if not match:
+        return None
+
+    number, unit = match.groups()
+
+    if unit:
+        # 1,5 GB or 1.5 GB, a thousands separator is unlikely with a unit
+        number = number.replace(",", ".")
+    else:
+        number = number.replace(",", "").replace(".", "")
+
+    try:
+        return int(float(number) * UNITS[unit])
+    except ValueError:
+        return None
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Seconds of "1:02:03" or "1 hour 2 mins 3 secs" """
+    value = value.strip().lower()
+
+    if ":" in value:
+        seconds = 0.0
+
+        for field in value.split(":"):
+            seconds = seconds * 60 + float(field)
+
+        return seconds
+
+    pairs = re.findall(r"(\d+)\s*([a-z]+)", value)
+
+    if not pairs:
+        return None
+
+    return float(
+        sum(int(number) * DURATION_UNITS.get(unit[0], 0) for number, unit in pairs)
+    )
+
+
+def _search(pattern: Optional[re.Pattern], text: str, convert: Callable):
+    match = pattern.search(text) if pattern else None
+
+    return convert(match.group(1)) if match else None
+
+
+def _total(pattern: Optional[re.Pattern], text: str) -> Optional[int]:
+    if not pattern:
+        return None
+
+    values = pattern.findall(text)
+
+    if not values:
+        return None
+
+    # An empty group counts the matches themselves
+    return sum(int(value) if value else 1 for value in values)
+
+
+def _join_literals(data: List[Union[bytes, tuple]]) -> Iterator[bytes]:
+    """One bytes per FETCH response, the literals put back as quoted strings"""
+    response = b""
+
+    for item in data:
+        if isinstance(item, tuple):
+            prefix, literal = item
+
+            # The literal of a new response, "2 (UID 9 BODYSTRUCTURE {12}"
+            if prefix[:1].isdigit() and response:
+                yield response
+                response = b""
+
+            response += LITERAL_PATTERN.sub(b"", prefix) + _quote(literal)
+        elif item and item[:1].isdigit() and response:
+            yield response
+            response = item
+        else:
+            response += item or b""
+
+    if response:
+        yield response
+
+
+def _quote(value: bytes) -> bytes:
+    return b'"' + value.replace(b"\\", b"\\\\").replace(b'"', b'\\"') + b'"'
+
+
+def _parse_list(tokens: Iterator[bytes]) -> list:
+    """Parse an IMAP parenthesized list whose opening parenthesis was consumed"""
+    result = []
+
+    for token in tokens:
+        if token == b"(":
+            result.append(_parse_list(tokens))
+        elif token == b")":
+            return result
+        elif token.upper() == b"NIL":
+            result.append(None)
+        elif token.startswith(b'"'):
+            result.append(
+                token[1:-1].replace(b'\\"', b'"').replace(b"\\\\", b"\\").decode()
+            )
+        elif token.isdigit():
+            result.append(int(token))
+        else:
+            result.append(token.decode(errors="replace"))
+
+    return result
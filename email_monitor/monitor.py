@@ -1,20 +1,93 @@
-from datetime import datetime, timedelta
-from typing import Dict, List, Union
-from pydantic import BaseModel
+from abc import ABC, abstractmethod
+from datetime import date as Date, datetime, timedelta
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 import imaplib
+import multiprocessing
+import queue
+import re
+import socket
+import threading
+import time
 from email import message_from_bytes
 from email.utils import parsedate_to_datetime
 from email.header import decode_header
 
-from email_monitor.conifg import PASS_KEYWORDS, WARNING_KEYWORDS, InvalidConfig
+from email_monitor.classifier import StatusClassifier, default_classifier
+from email_monitor.conifg import InvalidConfig
 from email_monitor.console import console
-from email_monitor.clients import ClientService
+from email_monitor.clients import ClientMatcher, ClientService
+from email_monitor.profiling import profiler
 
+if TYPE_CHECKING:
+    from email_monitor.cache import MailboxCache
+    from email_monitor.metrics import BackupMetrics
 
-class EmailBackup(BaseModel):
-    subject: str
-    sender: str
-    date: Union[datetime, str]
+HEADER_FIELDS = "BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)]"
+BACKUP_CRITERIA = "sauvegarde"
+# Above this many clients the OR chain gets too long for some servers' command
+# line limits, the subject keyword alone is sent instead
+MAX_SUBJECT_TERMS = 50
+UID_PATTERN = re.compile(rb"UID (\d+)")
+
+# imaplib only sends the commands it knows, RFC 4978
+imaplib.Commands.setdefault("COMPRESS", ("AUTH", "SELECTED"))
+
+
+class EmailBackup:
+    """Subject, sender and date of a backup email
+
+    A plain slotted record rather than a pydantic model: one is built for every
+    matching message from values parse_headers already decoded, there is nothing
+    left to validate. Pydantic is kept for the configuration file.
+    """
+
+    __slots__ = ("subject", "sender", "date", "uid", "source", "metrics", "_status")
+
+    def __init__(
+        self,
+        subject: str,
+        sender: str,
+        date: Union[datetime, str],
+        uid: Optional[int] = None,
+        source: Optional["MailSource"] = None,
+    ) -> None:
+        self.subject = subject
+        self.sender = sender
+        self.date = date
+        # Where the message can be fetched again, IMAP mailboxes only
+        self.uid = uid
+        self.source = source
+        # BackupMetrics read from the body, see email_monitor.metrics
+        self.metrics: Optional["BackupMetrics"] = None
+        # Classified once, by the monitor with the rules of the email's client
+        self._status: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"EmailBackup(subject={self.subject!r}, sender={self.sender!r}, "
+            f"date={self.date!r})"
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EmailBackup):
+            return NotImplemented
+
+        return (self.subject, self.sender, self.date) == (
+            other.subject,
+            other.sender,
+            other.date,
+        )
 
     def get_row(self):
         return (
@@ -26,55 +99,642 @@ class EmailBackup(BaseModel):
     def has_passed(self, pass_keywords: List[str] = None) -> bool:
 
         if pass_keywords is None:
-            pass_keywords = PASS_KEYWORDS
+            return self.get_status() == "success"
 
         return any(pass_key in self.subject.lower() for pass_key in pass_keywords)
 
-    def get_status(self):
+    def get_status(self) -> str:
+        """success, warning or failure, the default keywords if not classified"""
 
-        if any(pass_key in self.subject.lower() for pass_key in PASS_KEYWORDS):
-            return "success"
-        elif any(pass_key in self.subject.lower() for pass_key in WARNING_KEYWORDS):
-            return "warning"
-        else:
-            return "failure"
+        if self._status is None:
+            self._status = default_classifier.classify(self.subject)
+
+        return self._status
+
+    def classify(self, classifier: StatusClassifier, client: Optional[str] = None):
+        """Classify with the rules of client and keep the status
+
+        Returns:
+            str: success, warning or failure
+        """
+        self._status = classifier.classify(self.subject, client)
+
+        return self._status
+
+
+class BackupHistory:
+    def __init__(self, clients: List[str], first_day: Date, last_day: Date) -> None:
+        """Last backup email of every client for every day of a range
+
+        Days are local calendar days, a day without email is missing.
+
+        Args:
+            clients (List[str]): Client names, the rows of the matrix
+            first_day (Date): First day of the range
+            last_day (Date): Last day of the range, included
+        """
+        self.days = [
+            first_day + timedelta(days=offset)
+            for offset in range((last_day - first_day).days + 1)
+        ]
+        self.emails: Dict[str, Dict[Date, EmailBackup]] = {
+            client: {} for client in clients
+        }
+
+    def add(self, client: str, email: EmailBackup) -> bool:
+        """Keep email if it is the last one of its client and day
+
+        Returns:
+            bool: False if the email is outside of the range
+        """
+        day = self.get_day(email.date)
+
+        if not self.days or not self.days[0] <= day <= self.days[-1]:
+            return False
+
+        emails = self.emails.setdefault(client, {})
+        last = emails.get(day)
+
+        if last is None or last.date <= email.date:
+            emails[day] = email
+
+        return True
+
+    def get_status(self, client: str, day: Date) -> str:
+        """success, warning or failure from the last email of the day, or missing"""
+        email = self.emails[client].get(day)
+
+        return email.get_status() if email else "missing"
+
+    def success_rate(self, client: str) -> float:
+        """Share of the days whose last email is a success"""
+        successes = sum(self.get_status(client, day) == "success" for day in self.days)
+
+        return successes / len(self.days) if self.days else 0.0
+
+    def streak(self, client: str) -> int:
+        """Number of successful days in a row up to the last day"""
+        streak = 0
+
+        for day in reversed(self.days):
+            if self.get_status(client, day) != "success":
+                break
+
+            streak += 1
+
+        return streak
+
+    @staticmethod
+    def get_day(date: datetime) -> Date:
+        return date.astimezone().date() if date.tzinfo else date.date()
+
+
+def parse_headers(
+    raw_headers: bytes, criteria: str = BACKUP_CRITERIA
+) -> Optional[EmailBackup]:
+    """Build an EmailBackup from raw headers if its subject matches the criteria
+
+    A module function so archive parsing can run it in worker processes.
+
+    Args:
+        raw_headers (bytes): Headers as returned by FETCH
+        criteria (str): Keyword the lowercased subject has to contain
+
+    Returns:
+        Optional[EmailBackup]: The email, None if skipped
+    """
+    subject = None
+    profiler.count("messages.parsed")
+
+    try:
+        with profiler.span("parse.mime"):
+            msg = message_from_bytes(raw_headers)
+            subject = decode_part(msg.get("Subject"))
+            sender = decode_part(msg.get("From"))
+
+            date = parsedate_to_datetime(msg.get("Date"))
+
+        if subject:
+            if criteria in subject.lower():
+                with profiler.span("parse.model"):
+                    return EmailBackup(subject=subject, sender=sender, date=date)
+    except (TypeError, ValueError) as ex:
+        console.log_warning(ex)
+        console.log_warning(f"Skipping email {subject}")
+
+    return None
+
+
+def parse_headers_batch(
+    fetched: List[Tuple[bytes, bytes]], criteria: str = BACKUP_CRITERIA
+) -> List[Tuple[bytes, EmailBackup]]:
+    """The emails of a FETCH chunk matching criteria, with their id
+
+    Run by the worker processes of EmailClient.iter_parsed, only the matching
+    emails are sent back.
+
+    Args:
+        fetched (List[Tuple[bytes, bytes]]): Message ids and raw headers
+        criteria (str): Keyword the lowercased subject has to contain
+    """
+    parsed = ((email_id, parse_headers(raw, criteria)) for email_id, raw in fetched)
+
+    return [(email_id, email) for email_id, email in parsed if email]
+
+
+def init_worker() -> None:
+    """Disable in a worker process the profiler it may have inherited
+
+    Its timings would never reach the parent, and a fork can copy the lock of
+    the profiler held by another thread.
+    """
+    profiler.enabled = False
+    profiler._lock = threading.Lock()
+
+
+def ordered_map(executor: Executor, tasks: Iterator[tuple], window: int) -> Iterator:
+    """Run tasks in the executor keeping at most window of them in flight
+
+    Executor.map would submit every task at once, holding every input in
+    memory. The tasks are only pulled when there is room, so their producer
+    runs alongside the executor. The results come back in the tasks order.
+    """
+    pending = deque()
+
+    for function, *args in tasks:
+        pending.append(executor.submit(function, *args))
+
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+class ParsePool:
+    def __init__(self, workers: int) -> None:
+        """Processes parsing the headers of every source of a command
+
+        Created once per command, before the sources are searched in their
+        threads, then shared by them. The processes are started by a forkserver
+        where the platform has one, a process forked from a threaded one can
+        inherit a lock another thread was holding.
+
+        Args:
+            workers (int): Number of processes
+        """
+        self.workers = workers
+        context = (
+            multiprocessing.get_context("forkserver")
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else None
+        )
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, mp_context=context
+        )
+
+    def map(self, tasks: Iterator[tuple]) -> Iterator:
+        """Results of the tasks in their order, at most two per worker in flight"""
+        return ordered_map(self.executor, tasks, self.workers * 2)
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def decode_part(subject):
+    decoded_subject = []
+    for part, encoding in decode_header(subject):
+        if isinstance(part, bytes):
+            # Decode bytes to string
+            if encoding:
+                part = part.decode(encoding)
+            else:
+                part = part.decode()
+        decoded_subject.append(part)
+    return "".join(decoded_subject)
+
+
+class MailSource(ABC):
+    """Where a Monitor reads the emails from: an IMAP mailbox or an archive
+
+    Sources stream the backup emails of a window and release their connection or
+    files on logout. Several sources of a Monitor are read concurrently.
+    """
+
+    account: str
+    mailbox: str
+
+    @abstractmethod
+    def fetch_emails(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        criteria: str = BACKUP_CRITERIA,
+        client_names: List[str] = None,
+    ) -> Iterator[EmailBackup]:
+        """Stream the emails whose subject contains criteria
+
+        Args:
+            since (Optional[datetime]): Oldest day, None for the whole source
+            until (Optional[datetime]): Newest date, None for now
+            criteria (str): Keyword the lowercased subject has to contain
+            client_names (List[str]): Hint narrowing the search to these clients,
+                the emails are matched to the clients afterwards anyway
+
+        Yields:
+            EmailBackup: Emails, the dates are not filtered precisely
+        """
+
+    def logout(self) -> None:
+        pass
 
 
-class EmailClient:
+class EmailClient(MailSource):
     def __init__(
-        self, email: str, password: str, server: str = "ssl0.ovh.net", port: int = 993
+        self,
+        email: str,
+        password: str,
+        server: str = "ssl0.ovh.net",
+        port: int = 993,
+        fetch_chunk_size: int = 200,
+        mailbox: str = "INBOX",
+        ssl: bool = True,
+        compress: bool = True,
+        pool: Optional[ParsePool] = None,
     ):
+        """Connection to one mailbox of an IMAP account
+
+        Extensions advertised by the server are used when logged in:
+        COMPRESS=DEFLATE unless compress is False, QRESYNC or else CONDSTORE
+        for the HIGHESTMODSEQ of the mailbox, see get_highestmodseq. Without
+        them the client behaves exactly the same, with more bytes on the wire.
+
+        With a pool, the headers of large fetches are parsed by its processes
+        while the next chunks are fetched, see iter_parsed.
+        """
         self.server = server
         self.port = port
         self.email = email
         self.password = password
+        self.fetch_chunk_size = fetch_chunk_size
+        self.ssl = ssl
         self.mail = None
+        self.mailbox = mailbox
+        self.uidvalidity = None
+        self.uidnext = None
+        self.compress = compress
+        self.pool = pool
+        self.compressed = False
+        self.condstore = False
+        self.qresync = False
+        # HIGHESTMODSEQ of the last SELECT, not read yet by get_highestmodseq
+        self._selected_modseq: Optional[int] = None
 
     @classmethod
-    def from_config(cls, config: Dict[str, Union[str, int]]):
+    def from_config(
+        cls,
+        config: Dict[str, Union[str, int]],
+        mailbox: str = "INBOX",
+        pool: Optional[ParsePool] = None,
+    ):
         try:
 
             return EmailClient(
                 email=config["email"],
                 password=config["password"],
                 server=config["server"],
+                port=int(config.get("port", 993)),
+                fetch_chunk_size=int(config.get("fetch_chunk_size", 200)),
+                mailbox=mailbox,
+                ssl=bool(config.get("ssl", True)),
+                compress=bool(config.get("compress", True)),
+                pool=pool,
             )
         except KeyError as ex:
             raise InvalidConfig("La configuration du serveur de mail est incorrecte")
 
+    @classmethod
+    def from_configs(
+        cls,
+        configs: List[Dict[str, Union[str, int]]],
+        pool: Optional[ParsePool] = None,
+    ):
+        """One client per mailbox of every account, each with its own connection"""
+
+        return [
+            cls.from_config(config, mailbox, pool)
+            for config in configs
+            for mailbox in config.get("mailboxes", ["INBOX"])
+        ]
+
     def connect(self):
-        self.mail = imaplib.IMAP4_SSL(self.server, self.port, timeout=15)
-        self.mail.login(self.email, self.password)
+        with profiler.span("imap.connect"):
+            if self.ssl:
+                self.mail = imaplib.IMAP4_SSL(self.server, self.port, timeout=15)
+            else:
+                # Only for local test servers, the password is sent in clear
+                self.mail = imaplib.IMAP4(self.server, self.port, timeout=15)
+
+        profiler.watch_imap(self.mail)
+
+        with profiler.span("imap.login"):
+            self.mail.login(self.email, self.password)
+
+        self.compressed = self.condstore = self.qresync = False
+        self._enable_extensions()
+
+    def _enable_extensions(self) -> None:
+        """Use the extensions of the server, a refusal keeps the plain protocol"""
+        # Servers often advertise more once logged in, in the LOGIN response
+        _, data = self.mail.response("CAPABILITY")
+
+        if data and data[-1]:
+            self.mail.capabilities = tuple(data[-1].decode().upper().split())
+
+        capabilities = self.mail.capabilities
+
+        if self.compress and "COMPRESS=DEFLATE" in capabilities:
+            try:
+                with profiler.span("imap.compress"):
+                    status, _ = self.mail._simple_command("COMPRESS", "DEFLATE")
+            except imaplib.IMAP4.error:
+                status = "BAD"
+
+            if status == "OK":
+                from email_monitor.compress import DeflateStream
+
+                self.mail.sock = self.mail.file = DeflateStream(
+                    self.mail.sock, self.mail.file
+                )
+                self.compressed = True
+
+        if "QRESYNC" in capabilities and "ENABLE" in capabilities:
+            try:
+                status, _ = self.mail.enable("QRESYNC")
+            except imaplib.IMAP4.error:
+                status = "BAD"
+
+            # QRESYNC implies CONDSTORE
+            self.qresync = self.condstore = status == "OK"
+
+        if not self.condstore:
+            self.condstore = "CONDSTORE" in capabilities
+
+    @property
+    def account(self) -> str:
+        return f"{self.email}@{self.server}"
+
+    def __repr__(self) -> str:
+        return f"EmailClient({self.account}, {self.mailbox})"
+
+    def ensure_connected(self):
+        """Connect and select the current mailbox unless already done"""
+        if not self.mail:
+            self.connect()
+            self.select_mailbox(self.mailbox)
 
     def select_mailbox(self, mailbox="INBOX"):
         if not self.mail:
             raise Exception("You need to connect first")
-        self.mail.select(mailbox)
+        quoted = self._quote_mailbox(mailbox)
+
+        if self.condstore and not self.qresync:
+            # Makes sure the SELECT answers HIGHESTMODSEQ
+            quoted += " (CONDSTORE)"
+
+        with profiler.span("imap.select"):
+            status, data = self.mail.select(quoted)
+
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Couldn't select {mailbox}: {data}")
+
+        self.mailbox = mailbox
+        self.uidvalidity = self._get_untagged_int("UIDVALIDITY")
+        self.uidnext = self._get_untagged_int("UIDNEXT")
+        # NOMODSEQ mailboxes answer none
+        self._selected_modseq = self._get_untagged_int("HIGHESTMODSEQ")
+
+        if self._selected_modseq is None:
+            self.condstore = self.qresync = False
+
+    def _get_untagged_int(self, name: str) -> Optional[int]:
+        _, data = self.mail.response(name)
+        return int(data[-1]) if data and data[-1] else None
+
+    def get_highestmodseq(self) -> Optional[int]:
+        """HIGHESTMODSEQ of the selected mailbox, None without CONDSTORE
+
+        Taken from the SELECT response the first time, then from a new SELECT
+        of the mailbox as it may have changed since: STATUS isn't meant for the
+        selected mailbox and NOOP doesn't have to answer it. Every change of the
+        mailbox, new messages and expunges included, raises it.
+        """
+        if not self.condstore:
+            return None
+
+        if self._selected_modseq is None:
+            self.select_mailbox(self.mailbox)
+
+        modseq, self._selected_modseq = self._selected_modseq, None
+
+        return modseq
+
+    def get_vanished(self, last_uid: int, modseq: int) -> List[int]:
+        """UIDs up to last_uid expunged since modseq, [] without QRESYNC
+
+        Args:
+            last_uid (int): Highest UID to check, the known messages
+            modseq (int): HIGHESTMODSEQ when the messages were known
+
+        Returns:
+            List[int]: Expunged UIDs, a server may list some never known
+        """
+        if not self.qresync or last_uid < 1:
+            return []
+
+        with profiler.span("imap.fetch"):
+            status, data = self.mail.uid(
+                "FETCH", f"1:{last_uid}", f"(UID) (CHANGEDSINCE {modseq} VANISHED)"
+            )
+
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"FETCH VANISHED failed: {data}")
+
+        _, vanished = self.mail.response("VANISHED")
+
+        return [
+            uid
+            for line in vanished
+            if line
+            for uid in self._parse_message_set(line.rsplit(None, 1)[-1])
+        ]
+
+    @staticmethod
+    def _parse_message_set(message_set: Union[bytes, str]) -> List[int]:
+        """Ids of a message set such as ``1:4,7``, the reverse of _message_set"""
+        if isinstance(message_set, bytes):
+            message_set = message_set.decode()
+
+        ids = []
+
+        for part in message_set.split(","):
+            first, _, last = part.partition(":")
+            first, last = sorted((int(first), int(last or first)))
+            ids.extend(range(first, last + 1))
+
+        return ids
+
+    def get_last_uid(self) -> int:
+        """Highest UID of the selected mailbox, from UIDNEXT when the server sent it"""
+        if self.uidnext:
+            return self.uidnext - 1
+
+        return max(self.uid_search("UID *"), default=0)
+
+    def get_emails_after_uid(
+        self, last_uid: int, criteria: str = BACKUP_CRITERIA
+    ) -> Tuple[List[EmailBackup], int]:
+        """Fetch the backup emails that arrived after a known UID
+
+        Args:
+            last_uid (int): Highest UID already processed
+            criteria (str): Keyword the subjects have to contain
+
+        Returns:
+            Tuple[List[EmailBackup], int]: New emails and the new highest UID
+        """
+        search_query = f"(UID {last_uid + 1}:* {self.get_subject_imap_query(criteria)})"
+
+        # "UID n:*" always matches the last message, even below n
+        uids = [uid for uid in self.uid_search(search_query) if uid > last_uid]
+
+        return list(self.iter_parsed(uids, criteria)), max([last_uid, *uids])
+
+    def wait_for_new_emails(self, timeout: float = 600, poll_interval: float = 30):
+        """Block until the server reports new messages or the timeout expires
+
+        Uses IMAP IDLE when the server supports it, otherwise polls with NOOP.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds, IDLE is restarted
+                after it as servers drop idle connections after 30 minutes
+            poll_interval (float): Seconds between two NOOP without IDLE
+
+        Returns:
+            bool: True if new messages were reported
+        """
+        if not self.mail:
+            raise Exception("You need to connect first")
+
+        if "IDLE" in self.mail.capabilities:
+            return self._idle(timeout)
+
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            time.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
+
+            self.mail.noop()
+            _, data = self.mail.response("EXISTS")
+
+            if data and data[-1] is not None:
+                return True
+
+        return False
+
+    def _idle(self, timeout: float) -> bool:
+        tag = self.mail._new_tag()
+        profiler.count("imap.commands.IDLE")
+        self.mail.send(tag + b" IDLE\r\n")
+
+        line = self.mail.readline()
+
+        if not line.startswith(b"+"):
+            self.mail.tagged_commands.pop(tag, None)
+            raise imaplib.IMAP4.error(f"IDLE refused: {line!r}")
+
+        new_emails = False
+        deadline = time.monotonic() + timeout
+
+        while not new_emails:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+
+            line = self._readline(remaining)
+
+            if line is None:
+                break
+
+            if not line:
+                raise imaplib.IMAP4.abort("Connection closed during IDLE")
+
+            new_emails = line.rstrip().endswith(b"EXISTS")
+
+        self.mail.send(b"DONE\r\n")
+
+        # Drain the responses sent before the server saw DONE
+        while not (line := self.mail.readline()).startswith(tag):
+            if not line:
+                raise imaplib.IMAP4.abort("Connection closed during IDLE")
+
+            new_emails = new_emails or line.rstrip().endswith(b"EXISTS")
+
+        self.mail.tagged_commands.pop(tag, None)
+
+        return new_emails
+
+    def _readline(self, timeout: float) -> Optional[bytes]:
+        """Next line of the server, None if none came within timeout
+
+        The lines already buffered by imaplib are returned at once, unlike a
+        select on the socket. A socket file that timed out refuses any further
+        read, a new one is opened.
+        """
+        sock = self.mail.sock
+        previous = sock.gettimeout()
+        sock.settimeout(timeout)
+
+        try:
+            return self.mail.readline()
+        except socket.timeout:
+            from email_monitor.compress import DeflateStream
+
+            if isinstance(self.mail.file, DeflateStream):
+                self.mail.file.reopen()
+            else:
+                self.mail.file.close()
+                self.mail.file = sock.makefile("rb")
+
+            return None
+        finally:
+            sock.settimeout(previous)
 
     def search_emails(self, criteria="ALL"):
         if not self.mail:
             raise Exception("You need to connect first")
-        return self.mail.search(None, criteria)
+
+        with profiler.span("imap.search"):
+            return self.mail.search(None, criteria)
+
+    def uid_search(self, criteria="ALL") -> List[int]:
+        if not self.mail:
+            raise Exception("You need to connect first")
+
+        with profiler.span("imap.search"):
+            status, data = self.mail.uid("SEARCH", None, criteria)
+
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"UID SEARCH failed: {data}")
+
+        return [int(uid) for uid in data[0].split()]
 
     def fetch_email(self, email_id):
         if not self.mail:
@@ -82,95 +742,631 @@ class EmailClient:
         _, data = self.mail.fetch(email_id, "(RFC822)")
         return data[0][1]
 
+    def fetch_headers(
+        self, email_ids: List[Union[bytes, int]], uid: bool = False
+    ) -> Iterator[Tuple[bytes, bytes]]:
+        """Fetch the Subject/From/Date headers of several messages
+
+        The ids are sent in chunks of ``fetch_chunk_size`` with a single FETCH
+        command per chunk. ``BODY.PEEK`` is used so the messages are not
+        flagged as \\Seen.
+
+        Args:
+            email_ids (List[Union[bytes, int]]): Message ids returned by SEARCH
+            uid (bool): The ids are UIDs, use UID FETCH
+
+        Yields:
+            Tuple[bytes, bytes]: Message id (the UID if ``uid``) and its raw headers
+        """
+        for chunk in self.fetch_header_chunks(email_ids, uid=uid):
+            yield from chunk
+
+    def fetch_header_chunks(
+        self, email_ids: List[Union[bytes, int]], uid: bool = False
+    ) -> Iterator[List[Tuple[bytes, bytes]]]:
+        """The headers of fetch_headers, a list per FETCH command"""
+        if not self.mail:
+            raise Exception("You need to connect first")
+
+        for start in range(0, len(email_ids), self.fetch_chunk_size):
+            chunk = email_ids[start : start + self.fetch_chunk_size]
+
+            with profiler.span("imap.fetch"):
+                if uid:
+                    status, data = self.mail.uid(
+                        "FETCH", self._message_set(chunk), f"(UID {HEADER_FIELDS})"
+                    )
+                else:
+                    status, data = self.mail.fetch(
+                        self._message_set(chunk), f"({HEADER_FIELDS})"
+                    )
+
+            if status != "OK":
+                raise imaplib.IMAP4.error(f"FETCH failed: {data}")
+
+            if uid:
+                yield self._headers_by_uid(data)
+            else:
+                # Literal responses come as (b"<id> (BODY[...] {n}", b"<headers>")
+                yield [
+                    (item[0].split(None, 1)[0], item[1])
+                    for item in data
+                    if isinstance(item, tuple)
+                ]
+
+    @staticmethod
+    def _headers_by_uid(data: List[Union[bytes, tuple]]) -> List[Tuple[bytes, bytes]]:
+        """UID and headers of the responses of a UID FETCH
+
+        The UID is usually sent before the literal, (b"1 (UID 5 BODY[...] {n}",
+        b"<headers>"), but some servers send it after, in the bytes item closing
+        the response: b" UID 5)".
+        """
+        fetched = []
+        # Headers of the current response, its UID not seen yet
+        pending = None
+
+        for item in data:
+            if isinstance(item, tuple):
+                if pending is not None:
+                    console.log_warning("FETCH response without UID, skipped")
+
+                match = UID_PATTERN.search(item[0])
+
+                if match:
+                    fetched.append((match.group(1), item[1]))
+                    pending = None
+                else:
+                    pending = item[1]
+            elif pending is not None and item:
+                match = UID_PATTERN.search(item)
+
+                if match:
+                    fetched.append((match.group(1), pending))
+                    pending = None
+
+        if pending is not None:
+            console.log_warning("FETCH response without UID, skipped")
+
+        return fetched
+
+    def iter_parsed(
+        self, uids: List[int], criteria: str = BACKUP_CRITERIA
+    ) -> Iterator[EmailBackup]:
+        """Fetch the headers of uids and yield the emails matching criteria
+
+        With a pool and more than one FETCH chunk, the chunks are parsed by its
+        processes while the next ones are fetched, at most two per worker in
+        flight. The emails come in the uids order either way.
+
+        Args:
+            uids (List[int]): UIDs of the messages, from uid_search
+            criteria (str): Keyword the lowercased subject has to contain
+
+        Yields:
+            EmailBackup: Emails with their uid and source
+        """
+        chunks = self.fetch_header_chunks(uids, uid=True)
+
+        if self.pool is None or len(uids) <= self.fetch_chunk_size:
+            batches = (parse_headers_batch(chunk, criteria) for chunk in chunks)
+            yield from self._with_source(batches)
+            return
+
+        tasks = ((parse_headers_batch, chunk, criteria) for chunk in chunks)
+        yield from self._with_source(self.pool.map(tasks))
+
+    def _with_source(
+        self, batches: Iterable[List[Tuple[bytes, EmailBackup]]]
+    ) -> Iterator[EmailBackup]:
+        for batch in batches:
+            for uid, email_backup in batch:
+                email_backup.uid, email_backup.source = int(uid), self
+                yield email_backup
+
+    @staticmethod
+    def _message_set(email_ids: List[bytes]) -> str:
+        """Build a compact IMAP message set, collapsing consecutive ids into ranges
+
+        Args:
+            email_ids (List[Union[bytes, int]]): Message sequence numbers or UIDs
+
+        Returns:
+            str: Message set such as ``1:4,7,9:10``
+        """
+        ranges = []
+
+        for email_id in sorted(int(i) for i in email_ids):
+            if ranges and ranges[-1][1] + 1 == email_id:
+                ranges[-1][1] = email_id
+            else:
+                ranges.append([email_id, email_id])
+
+        return ",".join(
+            str(first) if first == last else f"{first}:{last}" for first, last in ranges
+        )
+
     def get_all_emails(
-        self, imap_query="ALL", criteria: str = "sauvegarde"
+        self, imap_query="ALL", criteria: str = BACKUP_CRITERIA
     ) -> List[EmailBackup]:
+
+        return list(self.iter_emails(imap_query, criteria))
+
+    def iter_emails(
+        self, imap_query="ALL", criteria: str = BACKUP_CRITERIA
+    ) -> Iterator[EmailBackup]:
+        """Yield the matching emails as their FETCH chunks come in
+
+        Args:
+            imap_query (str): IMAP SEARCH criteria
+            criteria (str): Keyword the lowercased subject has to contain
+
+        Yields:
+            EmailBackup: Emails in the server's order
+        """
         if not self.mail:
             raise Exception("You need to connect first")
 
-        email_subjects = []
+        # UIDs rather than sequence numbers, the emails can be fetched again later
+        yield from self.iter_parsed(self.uid_search(imap_query), criteria)
 
-        email_ids = self.search_emails(criteria=imap_query)
+    def fetch_emails(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        criteria: str = BACKUP_CRITERIA,
+        client_names: List[str] = None,
+    ) -> Iterator[EmailBackup]:
+        """Search the mailbox, connecting first if needed, see MailSource"""
 
-        for email_id in email_ids[1][0].split():
+        if since:
+            imap_query = self.get_since_imap_query(
+                since, criteria=criteria, client_names=client_names, until=until
+            )
+        else:
+            imap_query = self.get_subject_imap_query(
+                criteria=criteria, client_names=client_names
+            )
 
-            try:
-                raw_email_data = self.fetch_email(email_id)
-                msg = message_from_bytes(raw_email_data)
-                subject = self.decode_part(msg.get("Subject"))
-                sender = self.decode_part(msg.get("From"))
+        self.ensure_connected()
 
-                date = parsedate_to_datetime(msg.get("Date"))
+        yield from self.iter_emails(imap_query, criteria=criteria)
 
-                if subject:
-                    if criteria in subject.lower():
-                        email_subjects.append(
-                            EmailBackup(subject=subject, sender=sender, date=date)
-                        )
-            except ValueError as ex:
-                console.log_warning(ex)
-                console.log_warning(f"Skipping email {subject}")
+    def parse_headers(
+        self, raw_headers: bytes, criteria: str = BACKUP_CRITERIA
+    ) -> Optional[EmailBackup]:
+        """Build an EmailBackup from raw headers, see parse_headers"""
 
-        return email_subjects
+        return parse_headers(raw_headers, criteria)
 
     def decode_part(self, subject):
-        decoded_subject = []
-        for part, encoding in decode_header(subject):
-            if isinstance(part, bytes):
-                # Decode bytes to string
-                if encoding:
-                    part = part.decode(encoding)
-                else:
-                    part = part.decode()
-            decoded_subject.append(part)
-        return "".join(decoded_subject)
+        return decode_part(subject)
+
+    def copy(self) -> "EmailClient":
+        """Client of the same mailbox with a connection of its own, not open yet"""
+        return EmailClient(
+            self.email,
+            self.password,
+            self.server,
+            self.port,
+            fetch_chunk_size=self.fetch_chunk_size,
+            mailbox=self.mailbox,
+            ssl=self.ssl,
+            compress=self.compress,
+            pool=self.pool,
+        )
 
     def logout(self):
         if self.mail:
             self.mail.logout()
             self.mail = None
 
+    def disconnect(self) -> None:
+        """Close the connection even if it was dropped, the next use reconnects
+
+        A connection the server already closed can't send LOGOUT, its socket is
+        shut down instead of being left open.
+        """
+        mail, self.mail = self.mail, None
+
+        if mail is None:
+            return
+
+        try:
+            mail.logout()
+        except (imaplib.IMAP4.error, OSError):
+            try:
+                mail.shutdown()
+            except OSError:
+                pass
+
     @staticmethod
-    def get_date_imap_query(date: datetime) -> str:
+    def get_date_imap_query(
+        date: datetime, criteria: str = None, client_names: List[str] = None
+    ) -> str:
 
         twenty_four_hours_ago = date - timedelta(hours=24)
 
-        twenty_four_hours_ago_str = twenty_four_hours_ago.strftime("%d-%b-%Y")
-        date_str = date.strftime("%d-%b-%Y")
+        return EmailClient.get_since_imap_query(
+            twenty_four_hours_ago, criteria, client_names
+        )
+
+    @staticmethod
+    def get_since_imap_query(
+        since: datetime,
+        criteria: str = None,
+        client_names: List[str] = None,
+        until: datetime = None,
+    ) -> str:
+
+        since_str = since.strftime("%d-%b-%Y")
+
+        terms = [f'SINCE "{since_str}"']
+
+        if until:
+            # BEFORE excludes its day, the dates are then filtered precisely
+            before_str = (until + timedelta(days=1)).strftime("%d-%b-%Y")
+            terms.append(f'BEFORE "{before_str}"')
+
+        terms += EmailClient._get_subject_terms(criteria, client_names)
+
+        return f"({' '.join(terms)})"
+
+    @staticmethod
+    def get_subject_imap_query(
+        criteria: str = None, client_names: List[str] = None
+    ) -> str:
+
+        terms = EmailClient._get_subject_terms(criteria, client_names)
+
+        return f"({' '.join(terms)})" if terms else "ALL"
+
+    @staticmethod
+    def _get_subject_terms(
+        criteria: str = None, client_names: List[str] = None
+    ) -> List[str]:
+        """Build the SUBJECT search keys narrowing SEARCH to candidate emails
+
+        Servers match SUBJECT case-insensitively but not always accent-folded,
+        so non ASCII values are left out and checked in Python instead. The
+        client names are ORed together and skipped when the list is too long.
+
+        Args:
+            criteria (str): Keyword every backup email subject contains
+            client_names (List[str]): Client names, one of them must be in the subject
 
-        return f'(SINCE "{twenty_four_hours_ago_str}")'
+        Returns:
+            List[str]: IMAP search keys, to be ANDed with the other keys
+        """
+        terms = []
+
+        if criteria and criteria.isascii():
+            terms.append(f"SUBJECT {EmailClient._quote(criteria)}")
+
+        if (
+            client_names
+            and len(client_names) <= MAX_SUBJECT_TERMS
+            and all(name.isascii() for name in client_names)
+        ):
+            subjects = [f"SUBJECT {EmailClient._quote(name)}" for name in client_names]
+            terms.append(" ".join(["OR"] * (len(subjects) - 1) + subjects))
+
+        return terms
+
+    @staticmethod
+    def _quote_mailbox(mailbox: str) -> str:
+        if mailbox.startswith('"') or re.fullmatch(r"[\w./-]+", mailbox):
+            return mailbox
+
+        return EmailClient._quote(mailbox)
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
 
 
 class Monitor:
     def __init__(
-        self, client_service: ClientService, email_client: EmailClient
+        self,
+        client_service: ClientService,
+        email_client: EmailClient = None,
+        server_side_filter: bool = True,
+        cache: Optional["MailboxCache"] = None,
+        match_sender: Optional[bool] = None,
+        email_clients: List[MailSource] = None,
+        max_workers: int = 8,
     ) -> None:
+        """Find the backup emails of every client
+
+        Args:
+            client_service (ClientService): Clients to monitor
+            email_client (EmailClient): Mailbox to search
+            server_side_filter (bool): Put the client names in the IMAP query
+            cache (Optional[MailboxCache]): Read the emails through this cache
+            match_sender (Optional[bool]): Match emails to clients by sender too,
+                the match_sender key of the configuration by default
+            email_clients (List[MailSource]): Several mailboxes to search instead
+                of email_client, each one needs its own connection. Archives
+                (see email_monitor.archive) can be searched too
+            max_workers (int): Maximum number of mailboxes searched at once
+        """
+        self.client_service = client_service
+        self.match_sender = match_sender
         self.clients = client_service.get_all()
-        self.email_client = email_client
+        self.matcher = ClientMatcher(self.clients, match_sender=self._match_sender())
+        self.classifier = client_service.get_classifier()
+        self.email_clients = email_clients or [email_client]
+        self.email_client = self.email_clients[0]
+        self.server_side_filter = server_side_filter
+        self.cache = cache
+        self.max_workers = max_workers
 
-    def get_backups(self, date: datetime):
+    def get_emails(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[EmailBackup]:
+        """Backup emails of all the mailboxes, sorted by date
 
-        twenty_four_hours_ago = date - timedelta(hours=24)
+        Args:
+            since (Optional[datetime]): Oldest day, None for the whole mailboxes
+            until (Optional[datetime]): Newest date, None for now
 
-        emails = self.email_client.get_all_emails(EmailClient.get_date_imap_query(date))
+        Returns:
+            List[EmailBackup]: Emails, the dates are not filtered precisely
+        """
+        return sorted(self.iter_emails(since, until), key=lambda obj: obj.date)
 
-        emails.sort(key=lambda obj: obj.date)
+    def iter_emails(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Iterator[EmailBackup]:
+        """Stream the backup emails of all the mailboxes, in no particular order
 
-        emails = [
-            e
-            for e in emails
-            if twenty_four_hours_ago.replace(tzinfo=e.date.tzinfo)
-            <= e.date
-            <= date.replace(tzinfo=e.date.tzinfo)
+        The mailboxes are searched concurrently, so the wall time is the one of
+        the slowest mailbox. The clients connect on demand.
+
+        Args:
+            since (Optional[datetime]): Oldest day, None for the whole mailboxes
+            until (Optional[datetime]): Newest date, None for now
+
+        Yields:
+            EmailBackup: Emails, the dates are not filtered precisely
+        """
+        sources = [
+            self._iter_mailbox(email_client, since, until)
+            for email_client in self.email_clients
         ]
 
-        result_dict = {
-            key: [item for item in emails if key in item.subject]
-            for key in self._client_names
-        }
+        if len(sources) == 1:
+            return sources[0]
+
+        return _merge(sources, min(self.max_workers, len(sources)))
+
+    def _iter_mailbox(
+        self,
+        source: MailSource,
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> Iterator[EmailBackup]:
+
+        # Archives are read directly, only IMAP mailboxes go through the cache
+        if self.cache and isinstance(source, EmailClient):
+            emails = self.cache.fetch_emails(source, since=since, until=until)
+        else:
+            client_names = self._client_names if self.server_side_filter else None
+            emails = source.fetch_emails(
+                since, until, criteria=BACKUP_CRITERIA, client_names=client_names
+            )
+
+            # The server searched the days of the window
+            if isinstance(source, EmailClient):
+                yield from emails
+                return
+
+        # The cache and the archives keep a day of margin, the days of the
+        # SINCE/BEFORE search of the server are kept
+        first_day = since.date() if since else Date.min
+        last_day = until.date() if until else Date.max
+
+        for email in emails:
+            if first_day <= email.date.date() <= last_day:
+                yield email
+
+    def logout(self) -> None:
+        for email_client in self.email_clients:
+            email_client.logout()
+
+    def iter_backups(self, date: datetime) -> Iterator[Tuple[str, EmailBackup]]:
+        """Stream the emails of the 24 hours before date with their client
+
+        Emails matching no client are dropped.
+
+        Args:
+            date (datetime): End of the window
+
+        Yields:
+            Tuple[str, EmailBackup]: Client name and email
+        """
+        twenty_four_hours_ago = date - timedelta(hours=24)
+
+        self._reload_clients()
+
+        for e in self.iter_emails(since=twenty_four_hours_ago, until=date):
+            if (
+                twenty_four_hours_ago.replace(tzinfo=e.date.tzinfo)
+                <= e.date
+                <= date.replace(tzinfo=e.date.tzinfo)
+            ):
+                with profiler.span("monitor.match"):
+                    client_name = self.matcher.match(e.subject, e.sender)
+
+                if client_name:
+                    e.classify(self.classifier, client_name)
+                    yield client_name, e
+
+    def get_backups(self, date: datetime) -> Dict[str, List[EmailBackup]]:
+        """Emails of every client in the 24 hours before date, sorted by date"""
+        self._reload_clients()
+
+        result_dict = {key: [] for key in self._client_names}
+
+        for client_name, email in self.iter_backups(date):
+            result_dict.setdefault(client_name, []).append(email)
+
+        for emails in result_dict.values():
+            emails.sort(key=lambda obj: obj.date)
 
         return result_dict
 
+    def get_last_backups(self, date: datetime) -> Dict[str, Optional[EmailBackup]]:
+        """Last email of every client in the 24 hours before date
+
+        Only one email per client is kept while streaming, the memory used doesn't
+        depend on the number of emails.
+
+        Args:
+            date (datetime): End of the window
+
+        Returns:
+            Dict[str, Optional[EmailBackup]]: None for clients without email
+        """
+        self._reload_clients()
+
+        result_dict = dict.fromkeys(self._client_names)
+
+        for client_name, email in self.iter_backups(date):
+            last = result_dict.get(client_name)
+
+            if last is None or last.date <= email.date:
+                result_dict[client_name] = email
+
+        return result_dict
+
+    def get_history(self, since: datetime, until: datetime) -> BackupHistory:
+        """Last email of every client for every day between since and until
+
+        The whole range is searched at once, each email is fetched once.
+
+        Args:
+            since (datetime): Start of the first day
+            until (datetime): End of the last day
+
+        Returns:
+            BackupHistory: Per client and day matrix
+        """
+        self._reload_clients()
+
+        history = BackupHistory(self._client_names, since.date(), until.date())
+
+        for e in self.iter_emails(since=since, until=until):
+            with profiler.span("monitor.match"):
+                client_name = self.matcher.match(e.subject, e.sender)
+
+            if client_name:
+                e.classify(self.classifier, client_name)
+                history.add(client_name, e)
+
+        return history
+
+    def assign(self, emails: List[EmailBackup]) -> Dict[str, List[EmailBackup]]:
+        """Group emails by client, every client gets a list even if empty"""
+        self._reload_clients()
+
+        result_dict = {key: [] for key in self._client_names}
+
+        for item in emails:
+            client_name = self.matcher.match(item.subject, item.sender)
+
+            if client_name:
+                item.classify(self.classifier, client_name)
+                result_dict[client_name].append(item)
+
+        return result_dict
+
+    def _reload_clients(self) -> None:
+        """Rebuild the matcher if the configuration file changed its clients"""
+        clients = self.client_service.get_all()
+
+        if clients is not self.clients:
+            self.clients = clients
+            self.matcher = ClientMatcher(clients, match_sender=self._match_sender())
+            self.classifier = self.client_service.get_classifier()
+
+    def _match_sender(self) -> bool:
+        if self.match_sender is None:
+            return self.client_service.get_match_sender()
+
+        return self.match_sender
+
     @property
     def _client_names(self):
         return [c.name for c in self.clients]
+
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+def _merge(sources: List[Iterable], max_workers: int) -> Iterator:
+    """Consume iterables in worker threads and yield their items as they come
+
+    A bounded queue keeps the producers at most a few items ahead. Exceptions
+    raised by a source are raised again in the consumer, and the producers stop
+    when the consumer does.
+    """
+    items = queue.Queue(maxsize=1000)
+    pending = queue.Queue()
+    stop = threading.Event()
+
+    for source in sources:
+        pending.put(source)
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def worker():
+        while not stop.is_set():
+            try:
+                source = pending.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                for item in source:
+                    if not put(item):
+                        return
+            except BaseException as ex:
+                put(_Failure(ex))
+                return
+
+        put(_DONE)
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(max_workers)]
+
+    for thread in workers:
+        thread.start()
+
+    running = len(workers)
+
+    try:
+        while running:
+            item = items.get()
+
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, _Failure):
+                raise item.exception
+            else:
+                yield item
+    finally:
+        stop.set()
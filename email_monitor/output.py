@@ -0,0 +1,244 @@
+from abc import ABC, abstractmethod
+import csv
+from datetime import date as Date, datetime
+import json
+import sys
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from email_monitor.monitor import BackupHistory, EmailBackup
+
+FORMATS = ["table", "json", "jsonl", "csv", "parquet"]
+EMAIL_COLUMNS = ["sender", "subject", "date"]
+BACKUP_COLUMNS = ["client", "status", "sender", "subject", "date"]
+HISTORY_COLUMNS = ["client", "day", "status", "sender", "subject", "date"]
+# Added by --metrics, see email_monitor.metrics.BackupMetrics
+METRICS_COLUMNS = ["vendor", "size", "duration", "jobs", "errors"]
+# Rows buffered per Parquet row group, the only rows held in memory
+ROW_GROUP_SIZE = 10_000
+
+
+class RecordWriter(ABC):
+    def __init__(self, stream: BinaryIO, columns: List[str]) -> None:
+        """Write records one at a time, nothing is kept once written
+
+        Args:
+            stream (BinaryIO): Binary output, the text formats are UTF-8
+            columns (List[str]): Keys of the records, in order
+        """
+        self.stream = stream
+        self.columns = columns
+
+    @abstractmethod
+    def write(self, record: Dict[str, str]) -> None:
+        """Write one record, keyed by column"""
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class JsonLinesWriter(RecordWriter):
+    def write(self, record: Dict[str, str]) -> None:
+        self.stream.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+
+
+class JsonWriter(RecordWriter):
+    """A JSON array written element by element, valid once closed"""
+
+    def __init__(self, stream: BinaryIO, columns: List[str]) -> None:
+        super().__init__(stream, columns)
+        self.stream.write(b"[")
+        self._separator = b"\n"
+
+    def write(self, record: Dict[str, str]) -> None:
+        self.stream.write(
+            self._separator + json.dumps(record, ensure_ascii=False).encode()
+        )
+        self._separator = b",\n"
+
+    def close(self) -> None:
+        self.stream.write(b"\n]\n")
+        super().close()
+
+
+class CsvWriter(RecordWriter):
+    def __init__(self, stream: BinaryIO, columns: List[str]) -> None:
+        super().__init__(stream, columns)
+        self._text = _TextStream(stream)
+        self._writer = csv.DictWriter(self._text, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, record: Dict[str, str]) -> None:
+        self._writer.writerow(record)
+
+
+class ParquetWriter(RecordWriter):
+    """Parquet file of string columns, written a row group at a time"""
+
+    def __init__(self, stream: BinaryIO, columns: List[str]) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as ex:
+            raise RuntimeError(
+                "The parquet format needs pyarrow: pip install email-monitor[parquet]"
+            ) from ex
+
+        super().__init__(stream, columns)
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema(
+            [(column, pyarrow.string()) for column in columns]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(stream, self._schema)
+        self._rows: List[Dict[str, str]] = []
+
+    def write(self, record: Dict[str, str]) -> None:
+        self._rows.append(record)
+
+        if len(self._rows) >= ROW_GROUP_SIZE:
+            self._flush_rows()
+
+    def _flush_rows(self) -> None:
+        if self._rows:
+            self._writer.write_table(
+                self._pyarrow.Table.from_pylist(self._rows, schema=self._schema)
+            )
+            self._rows = []
+
+    def close(self) -> None:
+        self._flush_rows()
+        self._writer.close()
+        super().close()
+
+
+WRITERS = {
+    "json": JsonWriter,
+    "jsonl": JsonLinesWriter,
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def write_records(
+    records: Iterable[Dict[str, str]],
+    output_format: str,
+    columns: List[str],
+    stream: Optional[BinaryIO] = None,
+) -> int:
+    """Write the records as they come, the memory used doesn't depend on their number
+
+    Args:
+        records (Iterable[Dict[str, str]]): Records keyed by column
+        output_format (str): json, jsonl, csv or parquet
+        columns (List[str]): Columns of the records, in order
+        stream (Optional[BinaryIO]): Binary output, stdout by default
+
+    Returns:
+        int: Number of records written
+    """
+    writer = WRITERS[output_format](stream or sys.stdout.buffer, columns)
+    written = 0
+
+    try:
+        for record in records:
+            writer.write(record)
+            written += 1
+    finally:
+        writer.close()
+
+    return written
+
+
+def email_records(emails: Iterable[EmailBackup]) -> Iterator[Dict[str, str]]:
+    for email in emails:
+        yield {
+            "sender": email.sender,
+            "subject": email.subject,
+            "date": _format_date(email.date),
+        }
+
+
+def backup_records(
+    backups: Iterable[Tuple[str, EmailBackup]],
+    clients: List[str],
+    metrics: bool = False,
+) -> Iterator[Dict[str, str]]:
+    """Every backup email with its client, then the clients without any
+
+    Only the names of the clients seen are kept while streaming.
+
+    Args:
+        backups (Iterable[Tuple[str, EmailBackup]]): Client name and email
+        clients (List[str]): All the clients, the missing ones are listed last
+        metrics (bool): Add the METRICS_COLUMNS
+    """
+    seen = set()
+    columns = BACKUP_COLUMNS + METRICS_COLUMNS if metrics else BACKUP_COLUMNS
+
+    for client, email in backups:
+        seen.add(client)
+
+        record = {
+            "client": client,
+            "status": email.get_status(),
+            "sender": email.sender,
+            "subject": email.subject,
+            "date": _format_date(email.date),
+        }
+
+        yield record | _metrics_record(email) if metrics else record
+
+    for client in clients:
+        if client not in seen:
+            yield dict.fromkeys(columns, "") | {
+                "client": client,
+                "status": "missing",
+            }
+
+
+def history_records(
+    history: BackupHistory, metrics: bool = False
+) -> Iterator[Dict[str, str]]:
+    """One record per client and day, the last email of the day if any"""
+    empty = dict.fromkeys(METRICS_COLUMNS, "") if metrics else {}
+
+    for client, emails in history.emails.items():
+        for day in history.days:
+            email = emails.get(day)
+
+            record = {
+                "client": client,
+                "day": day.isoformat(),
+                "status": email.get_status() if email else "missing",
+                "sender": email.sender if email else "",
+                "subject": email.subject if email else "",
+                "date": _format_date(email.date) if email else "",
+            }
+
+            if metrics:
+                record |= _metrics_record(email) if email else empty
+
+            yield record
+
+
+def _metrics_record(email: EmailBackup) -> Dict[str, str]:
+    if email.metrics is None:
+        return dict.fromkeys(METRICS_COLUMNS, "")
+
+    return {
+        column: "" if value is None else str(value)
+        for column, value in zip(METRICS_COLUMNS, email.metrics)
+    }
+
+
+def _format_date(date) -> str:
+    return date.isoformat() if isinstance(date, (datetime, Date)) else str(date)
+
+
+class _TextStream:
+    """Minimal text wrapper for csv, encoding to a binary stream it doesn't own"""
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        return self.stream.write(text.encode())
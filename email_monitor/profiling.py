@@ -0,0 +1,204 @@
+from contextlib import contextmanager, nullcontext
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+
+from rich.table import Table
+
+from email_monitor.console import console
+
+_DISABLED = nullcontext()
+
+
+class Profiler:
+    def __init__(self) -> None:
+        """Record the time spent in each phase of a command and a few counters
+
+        Disabled by default, span and count then return at once so the
+        instrumented code pays a function call and an attribute lookup.
+        Spans of the same name add up, whatever the thread recording them.
+        """
+        self.enabled = False
+        # name: [calls, total seconds, max seconds]
+        self.spans: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.wall_time = 0.0
+        self._started = 0.0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self.spans = {}
+        self.counters = {}
+        self.wall_time = 0.0
+        self._started = time.perf_counter()
+        self.enabled = True
+
+    def stop(self) -> None:
+        if self.enabled:
+            self.wall_time = time.perf_counter() - self._started
+            self.enabled = False
+
+    def span(self, name: str):
+        """Context manager timing the code it wraps under name"""
+        if not self.enabled:
+            return _DISABLED
+
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            span = self.spans.setdefault(name, [0, 0.0, 0.0])
+            span[0] += 1
+            span[1] += seconds
+            span[2] = max(span[2], seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def watch_imap(self, mail) -> None:
+        """Count the commands and bytes of an imaplib connection
+
+        The connection methods are wrapped on the instance, nothing is wrapped
+        when the profiler is disabled.
+
+        Args:
+            mail (imaplib.IMAP4): Open connection
+        """
+        if not self.enabled:
+            return
+
+        command, send = mail._command, mail.send
+        read, readline = mail.read, mail.readline
+
+        def counted_command(name, *args):
+            counter = f"UID {args[0]}" if name == "UID" else name
+            self.count(f"imap.commands.{counter}")
+            return command(name, *args)
+
+        def counted_read(size):
+            data = read(size)
+            self.count("imap.bytes_read", len(data))
+            return data
+
+        def counted_readline():
+            line = readline()
+            self.count("imap.bytes_read", len(line))
+            return line
+
+        def counted_send(data):
+            self.count("imap.bytes_sent", len(data))
+            return send(data)
+
+        mail._command = counted_command
+        mail.read = counted_read
+        mail.readline = counted_readline
+        mail.send = counted_send
+
+    def watch_smtp(self, server) -> None:
+        """Count the commands and bytes sent of an smtplib connection
+
+        Args:
+            server (smtplib.SMTP): Open connection
+        """
+        if not self.enabled:
+            return
+
+        putcmd, send = server.putcmd, server.send
+
+        def counted_putcmd(cmd, args=""):
+            self.count(f"smtp.commands.{cmd.upper()}")
+            return putcmd(cmd, args)
+
+        def counted_send(data):
+            self.count("smtp.bytes_sent", len(data))
+            return send(data)
+
+        server.putcmd = counted_putcmd
+        server.send = counted_send
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "wall_time": self.wall_time,
+            "spans": {
+                name: {"calls": calls, "total": total, "max": longest}
+                for name, (calls, total, longest) in sorted(self.spans.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def write_json(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def build_tables(self) -> List[Table]:
+        """Rich tables of the spans, slowest first, and of the counters"""
+        wall_ms = self.wall_time * 1000 or 1
+
+        spans = console.build_table(
+            title=f"Profile ({self.wall_time * 1000:.1f} ms)",
+            header=["Phase", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)", "%"],
+            rows=[
+                [
+                    name,
+                    str(calls),
+                    f"{total * 1000:.1f}",
+                    f"{total * 1000 / calls:.3f}",
+                    f"{longest * 1000:.3f}",
+                    f"{total * 100_000 / wall_ms:.1f}",
+                ]
+                for name, (calls, total, longest) in sorted(
+                    self.spans.items(), key=lambda item: -item[1][1]
+                )
+            ],
+        )
+        counters = console.build_table(
+            title="Counters",
+            header=["Counter", "Value"],
+            rows=[[name, str(value)] for name, value in sorted(self.counters.items())],
+        )
+
+        return [spans, counters]
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def profile_command(enabled: bool, json_file: Path = None) -> Iterator[Profiler]:
+    """Profile the commands run inside, then print or write the results
+
+    Args:
+        enabled (bool): Print the summary tables
+        json_file (Path): Write the results there as JSON, also enables profiling
+    """
+    if not (enabled or json_file):
+        yield profiler
+        return
+
+    profiler.start()
+
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+        if json_file:
+            profiler.write_json(json_file)
+
+        if enabled:
+            for table in profiler.build_tables():
+                console.print(table)
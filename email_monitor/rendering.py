@@ -0,0 +1,330 @@
+from collections import OrderedDict
+import csv
+from datetime import datetime
+import hashlib
+from html import escape
+import io
+import json
+from string import Template
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional, TextIO
+
+if TYPE_CHECKING:
+    from email_monitor.clients import Client
+    from email_monitor.monitor import BackupHistory, EmailBackup
+    from email_monitor.smtp_client import OutgoingEmail
+    from email_monitor.snapshots import ClientState, Transition
+
+# Rendered reports kept, a send-report fan-out renders one per client
+CACHE_SIZE = 256
+DATE_FORMAT = "%A, %d %B %Y %I:%M %p"
+
+PAGE_START = Template("""<html><head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>$title</title>
+            <style>
+                body {
+                    font-family: Arial, sans-serif;
+                    margin: 0;
+                    padding: 0;
+                }
+                h1 {
+                    text-align: center;
+                    margin-top: 20px;
+                }
+                table {
+                    width: 80%;
+                    border-collapse: collapse;
+                    margin: 20px auto;
+                }
+                th, td {
+                    border: 1px solid #ddd;
+                    padding: 8px;
+                    text-align: left;
+                }
+                th {
+                    background-color: #f2f2f2;
+                }
+                tr:nth-child(even) {
+                    background-color: #f2f2f2;
+                }
+                tr:hover {
+                    background-color: #ddd;
+                }
+                .success {
+                    color: green;
+                    font-weight: bold;
+                }
+                .failure {
+                    color: red;
+                    font-weight: bold;
+                }
+                .warning {
+                    color: #FFBF00;
+                    font-weight: bold;
+                }
+            </style>
+        </head><body><h1>$title</h1><br><br>
+<table><thead><tr>$header</tr></thead><tbody>
+""")
+PAGE_END = "</tbody></table></body></html>"
+HEADER_CELL = Template("<th>$text</th>")
+CELL = Template("<td>$text</td>")
+STATUS_CELL = Template('<td class="$css">$text</td>')
+
+
+class Cell(NamedTuple):
+    text: str
+    # CSS class of the HTML cell, success, warning or failure
+    css: str = ""
+
+
+class ReportTable(NamedTuple):
+    """A report, every format is rendered from it"""
+
+    title: str
+    columns: List[str]
+    rows: List[List[Cell]]
+
+    def digest(self) -> str:
+        """Hash of the content, equal tables render the same
+
+        Fed row by row with separator characters that can't appear in a report,
+        several times faster than hashing a JSON dump of the table.
+        """
+        digest = hashlib.sha256(f"{self.title}\x1d".encode())
+        digest.update("\x1f".join(self.columns).encode())
+
+        for row in self.rows:
+            digest.update(
+                "".join(f"\x1e{cell.text}\x1f{cell.css}" for cell in row).encode()
+            )
+
+        return digest.hexdigest()
+
+
+def results_report(
+    results: Dict[str, List["EmailBackup"]], clients: List[str] = None
+) -> ReportTable:
+    """Table of the last email of every client, or of some of them only
+
+    Args:
+        results (Dict[str, List[EmailBackup]]): Emails of every client by date
+        clients (List[str]): Clients to keep, all by default
+
+    Returns:
+        ReportTable: One row per client
+    """
+    rows = []
+
+    for client in clients or results.keys():
+        if results.get(client):
+            last_email = results[client][-1]
+            status = last_email.get_status()
+
+            rows.append(
+                [
+                    Cell(client),
+                    Cell(last_email.subject),
+                    Cell(last_email.date.strftime(DATE_FORMAT)),
+                    Cell(status.title(), status),
+                ]
+            )
+        else:
+            rows.append(
+                [Cell(client), Cell("-"), Cell("Missing"), Cell("Failure", "failure")]
+            )
+
+    return ReportTable(
+        "Rapport des Sauvegardes", ["Client", "Email", "Date", "Status"], rows
+    )
+
+
+def changes_report(
+    transitions: List["Transition"], clients: List[str] = None
+) -> ReportTable:
+    """Table of the clients whose status changed, or of some of them only
+
+    Args:
+        transitions (List[Transition]): Changes since the previous snapshot
+        clients (List[str]): Clients to keep, all by default
+
+    Returns:
+        ReportTable: One row per change, the previous status then the new one
+    """
+
+    def status_cell(state: Optional["ClientState"]) -> Cell:
+        if state is None:
+            return Cell("-")
+
+        css = "failure" if state.status == "missing" else state.status
+
+        return Cell(state.status.title(), css)
+
+    rows = []
+
+    for transition in transitions:
+        if clients and transition.client not in clients:
+            continue
+
+        after = transition.after
+        date = datetime.fromisoformat(after.date) if after.date else None
+
+        rows.append(
+            [
+                Cell(transition.client),
+                status_cell(transition.before),
+                status_cell(after),
+                Cell(after.subject),
+                Cell(date.strftime(DATE_FORMAT) if date else "Missing"),
+            ]
+        )
+
+    return ReportTable(
+        "Changements des Sauvegardes",
+        ["Client", "Avant", "Status", "Email", "Date"],
+        rows,
+    )
+
+
+def history_report(history: "BackupHistory", clients: List[str] = None) -> ReportTable:
+    """Table of the daily statuses of every client, or of some of them only"""
+    rows = []
+
+    for client in clients or history.emails.keys():
+        row = [Cell(client)]
+
+        for day in history.days:
+            status = history.get_status(client, day)
+            row.append(
+                Cell(status.title(), "failure" if status == "missing" else status)
+            )
+
+        row += [
+            Cell(f"{history.success_rate(client):.0%}"),
+            Cell(str(history.streak(client))),
+        ]
+        rows.append(row)
+
+    return ReportTable(
+        "Historique des Sauvegardes",
+        ["Client", *(day.strftime("%d/%m") for day in history.days), "Succès", "Série"],
+        rows,
+    )
+
+
+def write_html(table: ReportTable, stream: TextIO) -> None:
+    """Write the report as an HTML page, every text is escaped"""
+    stream.write(
+        PAGE_START.substitute(
+            title=escape(table.title),
+            header="".join(
+                HEADER_CELL.substitute(text=escape(column)) for column in table.columns
+            ),
+        )
+    )
+
+    for row in table.rows:
+        stream.write("<tr>")
+
+        for cell in row:
+            if cell.css:
+                stream.write(
+                    STATUS_CELL.substitute(css=cell.css, text=escape(cell.text))
+                )
+            else:
+                stream.write(CELL.substitute(text=escape(cell.text)))
+
+        stream.write("</tr>\n")
+
+    stream.write(PAGE_END)
+
+
+def write_csv(table: ReportTable, stream: TextIO) -> None:
+    writer = csv.writer(stream)
+    writer.writerow(table.columns)
+    writer.writerows([cell.text for cell in row] for row in table.rows)
+
+
+def write_json(table: ReportTable, stream: TextIO) -> None:
+    """Write the report as a JSON array of objects keyed by column, row by row"""
+    stream.write("[")
+
+    for index, row in enumerate(table.rows):
+        if index:
+            stream.write(",")
+
+        record = {column: cell.text for column, cell in zip(table.columns, row)}
+        stream.write("\n" + json.dumps(record, ensure_ascii=False))
+
+    stream.write("\n]\n")
+
+
+WRITERS = {"html": write_html, "csv": write_csv, "json": write_json}
+
+_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def render(table: ReportTable, report_format: str = "html") -> str:
+    """Render the report, or return it from the cache if the table was rendered
+
+    Args:
+        table (ReportTable): Report to render
+        report_format (str): html, csv or json
+
+    Returns:
+        str: The rendered report
+    """
+    key = (report_format, table.digest())
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    stream = io.StringIO()
+    WRITERS[report_format](table, stream)
+    text = stream.getvalue()
+
+    with _cache_lock:
+        _cache[key] = text
+
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return text
+
+
+def report_emails(
+    build_table: Callable[..., ReportTable],
+    subject: str,
+    recipients: List[str],
+    clients: List["Client"] = None,
+) -> List["OutgoingEmail"]:
+    """The full report for every recipient and its own report for every client
+
+    Rendered once per distinct table, the recipients share theirs.
+
+    Args:
+        build_table (Callable[..., ReportTable]): Builds the report, of the clients
+            of its clients keyword argument only if given
+        subject (str): Subject of the emails
+        recipients (List[str]): Addresses receiving the full report
+        clients (List[Client]): Clients receiving their own report at their email
+
+    Returns:
+        List[OutgoingEmail]: One email per recipient then per client
+    """
+    from email_monitor.smtp_client import OutgoingEmail
+
+    tables = [(address, build_table()) for address in recipients]
+    tables += [
+        (client.email, build_table(clients=[client.name])) for client in clients or []
+    ]
+
+    return [
+        OutgoingEmail(address, subject, render(table, "html"), render(table, "csv"))
+        for address, table in tables
+    ]
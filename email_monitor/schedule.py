@@ -0,0 +1,355 @@
+from datetime import datetime, timedelta
+from functools import partial
+import imaplib
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from email_monitor.console import console
+
+if TYPE_CHECKING:
+    from email_monitor.conifg import Config
+    from email_monitor.monitor import BackupHistory, EmailBackup, Monitor
+    from email_monitor.settings import ScheduledJob
+    from email_monitor.smtp_client import OutgoingEmail, SendResult, SMTPClient
+    from email_monitor.snapshots import ClientState, SnapshotStore
+
+# name: (first, last) of the five fields of a cron expression
+CRON_FIELDS = {
+    "minute": (0, 59),
+    "hour": (0, 23),
+    "day": (1, 31),
+    "month": (1, 12),
+    # Sunday is 0 or 7
+    "weekday": (0, 7),
+}
+CRON_NAMES = {
+    "month": ["jan", "feb", "mar", "apr", "may", "jun"]
+    + ["jul", "aug", "sep", "oct", "nov", "dec"],
+    "weekday": ["sun", "mon", "tue", "wed", "thu", "fri", "sat"],
+}
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+class CronExpression:
+    def __init__(self, expression: str) -> None:
+        """Five field cron expression: minute hour day month weekday
+
+        Fields accept *, lists, ranges, steps (*/15, 1-5/2) and the English
+        month and weekday abbreviations. Sunday is 0 or 7. As in cron, a day
+        matches either field when both day and weekday are restricted.
+
+        Args:
+            expression (str): Expression, or @hourly, @daily, @weekly, @monthly
+
+        Raises:
+            ValueError: The expression is invalid
+        """
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"A cron expression has 5 fields: {expression!r}")
+
+        self.values: Dict[str, Set[int]] = {
+            name: self._parse(name, field) for name, field in zip(CRON_FIELDS, fields)
+        }
+        # As in cron, a field starting with * is unrestricted, */2 included
+        self._any_day = fields[2].startswith("*")
+        self._any_weekday = fields[4].startswith("*")
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+
+    @staticmethod
+    def _parse(name: str, field: str) -> Set[int]:
+        first, last = CRON_FIELDS[name]
+        names = CRON_NAMES.get(name, [])
+        values = set()
+
+        def number(text: str) -> int:
+            text = text.lower()
+
+            if text in names:
+                return names.index(text) + first
+
+            return int(text)
+
+        for part in field.split(","):
+            part_range, _, step = part.partition("/")
+
+            try:
+                if part_range == "*":
+                    start, end = first, last
+                elif "-" in part_range:
+                    start, end = (number(value) for value in part_range.split("-", 1))
+                else:
+                    start = end = number(part_range)
+                    end = last if step else end
+
+                step = int(step) if step else 1
+            except ValueError as ex:
+                raise ValueError(f"Invalid cron {name} field: {field!r}") from ex
+
+            if not first <= start <= end <= last or step < 1:
+                raise ValueError(f"Invalid cron {name} field: {field!r}")
+
+            values.update(range(start, end + 1, step))
+
+        if name == "weekday" and 7 in values:
+            values.discard(7)
+            values.add(0)
+
+        return values
+
+    def matches(self, date: datetime) -> bool:
+        """Whether the minute of date is one of the expression"""
+        values = self.values
+        day = date.day in values["day"]
+        weekday = (date.weekday() + 1) % 7 in values["weekday"]
+
+        if self._any_day or self._any_weekday:
+            day_matches = day and weekday
+        else:
+            day_matches = day or weekday
+
+        return (
+            date.minute in values["minute"]
+            and date.hour in values["hour"]
+            and date.month in values["month"]
+            and day_matches
+        )
+
+
+class Snapshot:
+    def __init__(self, monitor: "Monitor", date: datetime) -> None:
+        """Backups of one tick, collected on first use and shared by its jobs
+
+        Args:
+            monitor (Monitor): Monitor whose connections are reused
+            date (datetime): Time of the tick, the end of the windows
+        """
+        self.monitor = monitor
+        self.date = date
+        self._results: Optional[Dict[str, List["EmailBackup"]]] = None
+        self._histories: Dict[int, "BackupHistory"] = {}
+
+    def results(self) -> Dict[str, List["EmailBackup"]]:
+        """Last email of every client in the 24 hours before the tick"""
+        if self._results is None:
+            last_backups = self._collect(
+                lambda: self.monitor.get_last_backups(self.date)
+            )
+            self._results = {
+                client: [email] if email else []
+                for client, email in last_backups.items()
+            }
+
+        return self._results
+
+    def history(self, days: int) -> "BackupHistory":
+        """Daily backups of the days days ending with the day of the tick"""
+        if days not in self._histories:
+            last_day = self.date.replace(hour=0, minute=0, second=0, microsecond=0)
+            since = last_day - timedelta(days=days - 1)
+            until = last_day + timedelta(days=1, microseconds=-1)
+
+            self._histories[days] = self._collect(
+                lambda: self.monitor.get_history(since, until)
+            )
+
+        return self._histories[days]
+
+    def _collect(self, collect: Callable):
+        """Run collect, once more on fresh connections if one was dropped
+
+        Servers close idle connections between two ticks, the error only shows
+        on the next command.
+        """
+        from email_monitor.monitor import EmailClient
+
+        try:
+            return collect()
+        except (imaplib.IMAP4.abort, OSError) as ex:
+            console.log_warning(f"IMAP connection lost ({ex}), reconnecting")
+
+            for email_client in self.monitor.email_clients:
+                if isinstance(email_client, EmailClient):
+                    email_client.disconnect()
+
+            return collect()
+
+
+class Scheduler:
+    def __init__(
+        self,
+        monitor: "Monitor",
+        app_config: "Config",
+        smtp_client: "SMTPClient",
+        connections: int = 4,
+    ) -> None:
+        """Run the jobs of the configuration file in one process
+
+        The jobs are read from the configuration at every tick, so an edited
+        file applies without restarting. All the jobs due at the same minute
+        share one collection of the backups and one fan-out of the emails, the
+        IMAP connections stay open between the ticks.
+
+        Args:
+            monitor (Monitor): Monitor whose connections are kept open
+            app_config (Config): Configuration, its schedule key lists the jobs
+            smtp_client (SMTPClient): Sender of the reports
+            connections (int): SMTP connections used at once per tick
+        """
+        self.monitor = monitor
+        self.app_config = app_config
+        self.smtp_client = smtp_client
+        self.connections = connections
+        self._crons: Dict[str, CronExpression] = {}
+        self._snapshots: Optional["SnapshotStore"] = None
+
+    @property
+    def snapshots(self) -> "SnapshotStore":
+        """Statuses last sent by the on_change jobs, opened on first use"""
+        if self._snapshots is None:
+            from email_monitor.snapshots import SnapshotStore
+
+            self._snapshots = SnapshotStore(self.app_config.get_snapshot_file())
+
+        return self._snapshots
+
+    def get_jobs(self) -> List["ScheduledJob"]:
+        return self.app_config.settings.schedule
+
+    def due_jobs(self, date: datetime) -> List["ScheduledJob"]:
+        jobs = []
+
+        for job in self.get_jobs():
+            if job.cron not in self._crons:
+                self._crons[job.cron] = CronExpression(job.cron)
+
+            if self._crons[job.cron].matches(date):
+                jobs.append(job)
+
+        return jobs
+
+    def run(self) -> None:
+        """Run the due jobs at the start of every minute, until interrupted"""
+        while True:
+            now = datetime.now()
+            tick = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+            time.sleep((tick - now).total_seconds())
+
+            jobs = self.due_jobs(tick)
+
+            if not jobs:
+                continue
+
+            try:
+                self.run_jobs(jobs, tick)
+            except Exception as ex:
+                # Another try at the next due tick, a bad job doesn't stop the
+                # others for good
+                console.log_error(f"Jobs of {tick:%d-%m-%Y %H:%M} failed: {ex!r}")
+
+    def run_jobs(
+        self, jobs: List["ScheduledJob"], date: Optional[datetime] = None
+    ) -> List["SendResult"]:
+        """Run jobs on one snapshot of the backups and send their emails at once
+
+        Args:
+            jobs (List[ScheduledJob]): Jobs to run
+            date (Optional[datetime]): Time of the tick, now by default
+
+        Returns:
+            List[SendResult]: Result of every email sent
+        """
+        from email_monitor import rendering
+        from email_monitor.clients import ClientService
+        from email_monitor.snapshots import client_states
+
+        snapshot = Snapshot(self.monitor, date or datetime.now())
+        clients = ClientService(self.app_config).get_all()
+        emails: List["OutgoingEmail"] = []
+        # scope, statuses, first and last index of the job's emails
+        sent_states: List[Tuple[str, Dict[str, "ClientState"], int, int]] = []
+
+        for job in jobs:
+            if job.action == "collect":
+                results = snapshot.results()
+                missing = [client for client, emails in results.items() if not emails]
+                console.print(
+                    f"{snapshot.date:%d-%m-%Y %H:%M} {job.name}: "
+                    f"{len(results) - len(missing)} client(s) with a backup, "
+                    f"{len(missing)} without"
+                )
+                continue
+
+            job_clients = clients if job.to_clients else []
+
+            if job.days > 1:
+                build_table = partial(
+                    rendering.history_report, snapshot.history(job.days)
+                )
+            else:
+                build_table = partial(rendering.results_report, snapshot.results())
+
+            if job.on_change:
+                states = client_states(snapshot.results())
+                transitions = self.snapshots.changes(f"schedule:{job.name}", states)
+                changed = {transition.client for transition in transitions}
+                job_clients = [
+                    client for client in job_clients if client.name in changed
+                ]
+                build_table = partial(rendering.changes_report, transitions)
+
+            if job.on_change and not transitions:
+                job_emails = []
+            else:
+                job_emails = rendering.report_emails(
+                    build_table,
+                    job.subject,
+                    [*job.to, *self.app_config.get_report_recipients()],
+                    job_clients,
+                )
+
+            console.print(
+                f"{snapshot.date:%d-%m-%Y %H:%M} {job.name}: "
+                f"{len(job_emails)} email(s)"
+            )
+
+            if job.on_change and job_emails:
+                sent_states.append(
+                    (
+                        f"schedule:{job.name}",
+                        states,
+                        len(emails),
+                        len(emails) + len(job_emails),
+                    )
+                )
+
+            emails += job_emails
+
+        if not emails:
+            return []
+
+        sent = self.smtp_client.send_many(emails, max_connections=self.connections)
+
+        for scope, states, start, end in sent_states:
+            # A job whose emails failed reports the same changes next time
+            if all(result.ok for result in sent[start:end]):
+                self.snapshots.save(scope, states)
+
+        for result in sent:
+            if result.ok:
+                console.log_success(f"Report sent to {result.to_address}")
+            else:
+                console.log_error(
+                    f"Couldn't send the report to {result.to_address}: {result.error}"
+                )
+
+        return sent
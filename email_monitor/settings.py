@@ -0,0 +1,96 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, PositiveInt, field_validator, model_validator
+
+from email_monitor.clients import Client, Keywords
+
+
+class AccountSettings(BaseModel):
+    server: str
+    email: str
+    password: str
+    port: int = 993
+    ssl: bool = True
+    fetch_chunk_size: PositiveInt = 200
+    mailboxes: List[str] = ["INBOX"]
+    smtp_server: Optional[str] = None
+    smtp_port: int = 465
+    # COMPRESS=DEFLATE when the server has it, False saves CPU on fast links
+    compress: bool = True
+
+
+class ScheduledJob(BaseModel):
+    """A job of the schedule command"""
+
+    name: str
+    # minute hour day month weekday, or @hourly, @daily, @weekly, @monthly
+    cron: str
+    # report sends the report, collect only refreshes the backups
+    action: Literal["report", "collect"] = "report"
+    to: List[str] = []
+    to_clients: bool = False
+    subject: str = "Rapport des Sauvegardes"
+    # Days of the report, a history report above 1
+    days: int = 1
+    # Only the clients whose status changed since the job's previous report
+    on_change: bool = False
+
+    @field_validator("cron")
+    @classmethod
+    def valid_cron(cls, value):
+        from email_monitor.schedule import CronExpression
+
+        CronExpression(value)
+        return value
+
+    @field_validator("days")
+    @classmethod
+    def at_least_one_day(cls, value):
+        if value < 1:
+            raise ValueError("A report covers at least one day")
+        return value
+
+    @model_validator(mode="after")
+    def on_change_of_last_backups(self):
+        if self.on_change and self.days > 1:
+            raise ValueError("on_change compares the last backups, not a history")
+        return self
+
+
+class Settings(BaseModel):
+    """Content of the configuration file"""
+
+    clients: List[Client]
+    email: List[AccountSettings]
+    cache_file: Optional[str] = None
+    snapshot_file: Optional[str] = None
+    # Receive the full report on every send-report
+    report_recipients: List[str] = []
+    # Assign the emails naming no client to the client of their sender address
+    match_sender: bool = False
+    # Keywords of the success and warning subjects, for every client
+    keywords: Keywords = Keywords()
+    # Jobs of the schedule command
+    schedule: List[ScheduledJob] = []
+
+    @field_validator("email", mode="before")
+    @classmethod
+    def single_account(cls, value):
+        return value if isinstance(value, list) else [value]
+
+    @field_validator("email")
+    @classmethod
+    def at_least_one_account(cls, value):
+        if not value:
+            raise ValueError("At least one email account is required")
+        return value
+
+    @field_validator("schedule")
+    @classmethod
+    def unique_job_names(cls, value):
+        # The on_change jobs keep their snapshots under their name
+        names = [job.name for job in value]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+
+        if duplicates:
+            raise ValueError(f"Job names must be unique: {', '.join(duplicates)}")
+        return value
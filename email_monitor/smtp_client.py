@@ -1,15 +1,39 @@
 from email.header import Header
 from email.utils import formataddr
+import queue
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
 
 from email_monitor.console import console
+from email_monitor.profiling import profiler
+
+
+class OutgoingEmail(NamedTuple):
+    to_address: str
+    subject: str
+    html_text: str
+    csv_text: str = ""
+
+
+class SendResult(NamedTuple):
+    to_address: str
+    ok: bool
+    latency: float
+    error: str = ""
 
 
 class SMTPClient:
     def __init__(
-        self, smtp_server: str, smtp_port: int, username: str, password: str = None
+        self,
+        smtp_server: str,
+        smtp_port: int,
+        username: str,
+        password: str = None,
+        ssl: bool = True,
     ):
         """Generate an SMTP Client
 
@@ -18,55 +42,210 @@ class SMTPClient:
             smtp_port (int): Server port
             username (str): Authentication username
             password (str): Authentication password
+            ssl (bool): Use SMTP over SSL for the html emails, plain SMTP is only
+                meant for local test servers
         """
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.username = username
         self.password = password
+        self.ssl = ssl
+        self._server: Optional[smtplib.SMTP] = None
 
-    def send_html_email(
-        self, to_address: str, subject: str, html_text: str, csv_text: str
-    ):
-        """Sends an embedded HTML email using the SMTP Client
+    @classmethod
+    def from_config(cls, email_config: Dict[str, Any]) -> "SMTPClient":
+        """Client of an email account of the configuration, the SMTP server
+        defaults to its IMAP one
 
         Args:
-            to_address (str): Address to write to
-            subject   (str): Email's Subject
-            html_text (str): Email's message in html
-            csv_text  (str): Email's backup plaintext
+            email_config (Dict[str, Any]): An account of Config.get_email_configs
         """
-        try:
-            msg = MIMEMultipart(
-                "alternative", None, [MIMEText(csv_text), MIMEText(html_text, "html")]
-            )
+        return cls(
+            username=email_config["email"],
+            password=email_config["password"],
+            smtp_server=email_config["smtp_server"] or email_config["server"],
+            smtp_port=email_config["smtp_port"],
+            ssl=email_config["ssl"],
+        )
 
-            msg["From"] = formataddr(
-                (str(Header("ITWORK Monitor", "utf-8")), f"{self.username}")
-            )
-            msg["To"] = to_address
-            msg["Subject"] = subject
+    def __enter__(self) -> "SMTPClient":
+        self.connect()
+        return self
 
-            # Establish a connection to the SMTP server
-            server = smtplib.SMTP_SSL(
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def connect(self) -> None:
+        """Open an authenticated connection reused by the next sends until close"""
+        if self._server is None:
+            self._server = self._open()
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except smtplib.SMTPException:
+                pass
+            finally:
+                self._server = None
+
+    def _open(self) -> smtplib.SMTP:
+        # Establish a connection to the SMTP server
+        smtp_class = smtplib.SMTP_SSL if self.ssl else smtplib.SMTP
+
+        with profiler.span("smtp.connect"):
+            server = smtp_class(
                 host=self.smtp_server,
                 port=self.smtp_port,
                 timeout=10,
             )
-            # server.starttls()  # Upgrade the connection to a secure SSL connection
+        # server.starttls()  # Upgrade the connection to a secure SSL connection
 
-            if self.password:
+        profiler.watch_smtp(server)
+
+        if self.password:
+            with profiler.span("smtp.login"):
                 server.login(self.username, self.password)  # Login to the SMTP server
 
-            # Send the email
-            server.sendmail(self.username, to_address, msg.as_string())
+        return server
 
-            # Close the connection
-            server.quit()
+    def build_html_email(
+        self, to_address: str, subject: str, html_text: str, csv_text: str = ""
+    ) -> MIMEMultipart:
+        msg = MIMEMultipart(
+            "alternative", None, [MIMEText(csv_text), MIMEText(html_text, "html")]
+        )
+
+        msg["From"] = formataddr(
+            (str(Header("ITWORK Monitor", "utf-8")), f"{self.username}")
+        )
+        msg["To"] = to_address
+        msg["Subject"] = subject
+
+        return msg
+
+    def send_message(self, msg: MIMEMultipart) -> None:
+        """Send over the open connection, or over a new one closed right after
+
+        A connection dropped by the server, which many do after a number of
+        messages, is opened again once.
+
+        Raises:
+            smtplib.SMTPException: The message was refused
+        """
+        if self._server is None:
+            server = self._open()
+
+            try:
+                with profiler.span("smtp.send"):
+                    server.sendmail(self.username, msg["To"], msg.as_string())
+            finally:
+                server.quit()
+
+            return
+
+        try:
+            with profiler.span("smtp.send"):
+                self._server.sendmail(self.username, msg["To"], msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            self._server = self._open()
+
+            with profiler.span("smtp.send"):
+                self._server.sendmail(self.username, msg["To"], msg.as_string())
+
+    def send_html_email(
+        self, to_address: str, subject: str, html_text: str, csv_text: str
+    ) -> bool:
+        """Sends an embedded HTML email using the SMTP Client
+
+        Args:
+            to_address (str): Address to write to
+            subject   (str): Email's Subject
+            html_text (str): Email's message in html
+            csv_text  (str): Email's backup plaintext
+
+        Returns:
+            bool: True if the email was sent
+        """
+        try:
+            self.send_message(
+                self.build_html_email(to_address, subject, html_text, csv_text)
+            )
 
             console.print(f"Email sent to {to_address} successfully!")
+            return True
         except Exception:
             console.log_error("Failed to send email")
             console.print_exception()
+            return False
+
+    def send_many(
+        self, emails: List[OutgoingEmail], max_connections: int = 4
+    ) -> List[SendResult]:
+        """Send HTML emails over at most max_connections authenticated connections
+
+        Each worker thread keeps its own connection for all the emails it sends,
+        a failure only affects its recipient, the next email connects again.
+
+        Args:
+            emails (List[OutgoingEmail]): Emails to send
+            max_connections (int): Connections, and threads, used at once
+
+        Returns:
+            List[SendResult]: One result per email, in the same order
+        """
+        results: List[SendResult] = [None] * len(emails)
+        pending = queue.Queue()
+
+        for index, email in enumerate(emails):
+            pending.put((index, email))
+
+        def work() -> None:
+            client = self.copy()
+
+            try:
+                while True:
+                    try:
+                        index, email = pending.get_nowait()
+                    except queue.Empty:
+                        return
+
+                    results[index] = client._send_timed(email)
+            finally:
+                client.close()
+
+        workers = [
+            threading.Thread(target=work, daemon=True)
+            for _ in range(min(max_connections, len(emails)))
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+        return results
+
+    def copy(self) -> "SMTPClient":
+        """Same settings, without the connection"""
+        return SMTPClient(
+            self.smtp_server, self.smtp_port, self.username, self.password, self.ssl
+        )
+
+    def _send_timed(self, email: OutgoingEmail) -> SendResult:
+        start = time.perf_counter()
+
+        try:
+            # Connects on the first email, or again after a failed connection
+            self.connect()
+            self.send_message(self.build_html_email(*email))
+        except (smtplib.SMTPException, OSError) as ex:
+            return SendResult(
+                email.to_address, False, time.perf_counter() - start, str(ex)
+            )
+
+        return SendResult(email.to_address, True, time.perf_counter() - start)
 
     def send_email(self, to_address: str, subject: str, message: str):
         """Sends an email using the SMTP Client
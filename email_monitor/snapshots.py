@@ -0,0 +1,140 @@
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from email_monitor.monitor import EmailBackup
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    scope TEXT NOT NULL,
+    taken_at REAL NOT NULL,
+    states TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_taken_at ON snapshots (scope, taken_at);
+"""
+# Snapshots kept per scope, only the last one is compared
+KEEP_RUNS = 100
+
+
+class ClientState(NamedTuple):
+    """Status of a client in a snapshot and the email it comes from"""
+
+    status: str
+    subject: str = "-"
+    # ISO date of the email, empty if missing
+    date: str = ""
+
+
+class Transition(NamedTuple):
+    client: str
+    # None when the client wasn't in the previous snapshot
+    before: Optional[ClientState]
+    after: ClientState
+
+
+def client_states(results: Dict[str, List["EmailBackup"]]) -> Dict[str, ClientState]:
+    """State of every client from its last email, missing if none"""
+    states = {}
+
+    for client, emails in results.items():
+        if emails:
+            email = emails[-1]
+            states[client] = ClientState(
+                email.get_status(), email.subject, email.date.isoformat()
+            )
+        else:
+            states[client] = ClientState("missing")
+
+    return states
+
+
+def diff(
+    previous: Optional[Dict[str, ClientState]], current: Dict[str, ClientState]
+) -> List[Transition]:
+    """Clients whose status changed since previous, in the order of current
+
+    A new email with the same status isn't a change. Without a previous
+    snapshot every client is one, the first report is the full one.
+    """
+    previous = previous or {}
+    transitions = []
+
+    for client, state in current.items():
+        before = previous.get(client)
+
+        if before is None or before.status != state.status:
+            transitions.append(Transition(client, before, state))
+
+    return transitions
+
+
+class SnapshotStore:
+    def __init__(self, snapshot_file: Path) -> None:
+        """Per-run snapshots of the client statuses, in a SQLite file
+
+        A snapshot maps every client to its status and last email, stored as
+        one compact JSON row per run. Snapshots are grouped by scope, one per
+        report comparing with its own previous run: "send-report:<subject>"
+        for send-report --on-change, "schedule:<name>" for a scheduled job.
+        Only the reports sent on change take snapshots.
+
+        Args:
+            snapshot_file (Path): SQLite database, created if missing
+        """
+        self.snapshot_file = Path(snapshot_file)
+        self.snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.snapshot_file, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def last(self, scope: str) -> Optional[Tuple[float, Dict[str, ClientState]]]:
+        """Time and states of the last snapshot of scope, None if never taken"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT taken_at, states FROM snapshots WHERE scope = ?"
+                " ORDER BY taken_at DESC LIMIT 1",
+                (scope,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        taken_at, states = row
+
+        return taken_at, {
+            client: ClientState(*state) for client, state in json.loads(states).items()
+        }
+
+    def changes(self, scope: str, states: Dict[str, ClientState]) -> List[Transition]:
+        """Transitions of states since the last snapshot of scope"""
+        last = self.last(scope)
+
+        return diff(last[1] if last else None, states)
+
+    def save(self, scope: str, states: Dict[str, ClientState]) -> None:
+        """Record states as the last snapshot of scope, dropping the oldest ones"""
+        data = json.dumps(
+            {client: list(state) for client, state in states.items()},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO snapshots (scope, taken_at, states) VALUES (?, ?, ?)",
+                (scope, time.time(), data),
+            )
+            self._db.execute(
+                "DELETE FROM snapshots WHERE scope = ? AND taken_at NOT IN"
+                " (SELECT taken_at FROM snapshots WHERE scope = ?"
+                " ORDER BY taken_at DESC LIMIT ?)",
+                (scope, scope, KEEP_RUNS),
+            )
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,81 @@
+"""Fixtures of the unit tests: the fake servers of the benchmarks, small mailboxes"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "benchmarks"))
+
+from fake_servers import FakeIMAPServer, FakeSMTPServer, build_mailbox
+
+from email_monitor.monitor import EmailClient
+
+CLIENTS = ["Acme", "Globex", "Initech", "Umbrella"]
+
+
+@pytest.fixture
+def imap_server():
+    with FakeIMAPServer(build_mailbox(200, CLIENTS)) as server:
+        yield server
+
+
+@pytest.fixture
+def smtp_server():
+    with FakeSMTPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def config_file(tmp_path, imap_server, smtp_server):
+    """Configuration of the clients, pointing to the fake servers"""
+    config = {
+        "clients": [
+            {"name": name, "email": f"backup-{name.lower()}@example.com"}
+            for name in CLIENTS
+        ],
+        "email": {
+            "server": "127.0.0.1",
+            "port": imap_server.port,
+            "ssl": False,
+            "smtp_server": "127.0.0.1",
+            "smtp_port": smtp_server.port,
+            "email": "monitor@example.com",
+            "password": "secret",
+        },
+        "cache_file": str(tmp_path / "cache.sqlite3"),
+        "snapshot_file": str(tmp_path / "snapshots.sqlite3"),
+    }
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+
+    return path
+
+
+@pytest.fixture
+def connect():
+    """Connect EmailClients to a fake server, logged out at the end of the test"""
+    email_clients = []
+
+    def connect(server: FakeIMAPServer, **kwargs) -> EmailClient:
+        email_client = EmailClient(
+            "monitor@example.com",
+            "secret",
+            "127.0.0.1",
+            server.port,
+            ssl=False,
+            **kwargs,
+        )
+        email_client.ensure_connected()
+        email_clients.append(email_client)
+
+        return email_client
+
+    yield connect
+
+    for email_client in email_clients:
+        try:
+            email_client.logout()
+        except Exception:
+            pass
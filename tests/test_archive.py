@@ -0,0 +1,119 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from email_monitor.archive import ArchiveSource, _mbox_spans
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.monitor import MailSource, Monitor, ParsePool
+
+NOW = datetime.now(timezone.utc)
+
+
+def message(subject, date=NOW, newline="\n"):
+    lines = [
+        f"Subject: {subject}",
+        "From: backup@example.com",
+        f"Date: {format_datetime(date)}",
+        "",
+        "Body of the report",
+        "",
+    ]
+
+    return newline.join(lines)
+
+
+def mbox(tmp_path, *messages):
+    path = tmp_path / "archive.mbox"
+    path.write_text(
+        "".join(
+            f"From backup@example.com Sat Oct 17 08:00:00 2026\n{m}" for m in messages
+        )
+    )
+
+    return path
+
+
+def test_mbox_spans_cover_the_headers_only(tmp_path):
+    path = mbox(tmp_path, message("[Sauvegarde] Acme"), message("[Sauvegarde] Globex"))
+    data = path.read_bytes()
+
+    headers = [data[start:end] for start, end in _mbox_spans(path)]
+
+    assert len(headers) == 2
+    assert headers[0].startswith(b"Subject: [Sauvegarde] Acme\n")
+    assert headers[1].startswith(b"Subject: [Sauvegarde] Globex\n")
+    assert all(h.endswith(b"\n") and b"Body" not in h for h in headers)
+
+
+def test_mbox_spans_handle_crlf_and_leading_garbage(tmp_path):
+    path = tmp_path / "archive.mbox"
+    path.write_bytes(
+        b"garbage\n"
+        + b"From x Sat Oct 17 08:00:00 2026\n"
+        + message("[Sauvegarde] Acme", newline="\r\n").encode()
+    )
+    data = path.read_bytes()
+
+    [(start, end)] = _mbox_spans(path)
+
+    assert data[start:end].startswith(b"Subject: [Sauvegarde] Acme\r\n")
+    assert b"Body" not in data[start:end]
+
+
+def test_mbox_spans_of_an_empty_file(tmp_path):
+    path = tmp_path / "empty.mbox"
+    path.touch()
+
+    assert list(_mbox_spans(path)) == []
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_archive_source_reads_mbox(tmp_path, workers):
+    path = mbox(tmp_path, message("[Sauvegarde] Acme"), message("Newsletter"))
+
+    with ParsePool(workers) if workers else nullcontext() as pool:
+        emails = list(ArchiveSource(path, pool=pool).fetch_emails())
+
+    assert [email.subject for email in emails] == ["[Sauvegarde] Acme"]
+
+
+def test_archive_source_reads_maildir(tmp_path):
+    for folder, subject in [
+        ("cur", "[Sauvegarde] Acme"),
+        ("new", "[Sauvegarde] Globex"),
+    ]:
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "1.host").write_text(message(subject))
+
+    emails = list(ArchiveSource(tmp_path).fetch_emails())
+
+    assert sorted(e.subject for e in emails) == [
+        "[Sauvegarde] Acme",
+        "[Sauvegarde] Globex",
+    ]
+
+
+def test_mail_source_is_abstract():
+    with pytest.raises(TypeError):
+        MailSource()
+
+
+def test_monitor_keeps_the_days_of_the_window(tmp_path, config_file):
+    since = datetime.combine(NOW.date() - timedelta(days=2), datetime.min.time())
+    # Within the day of margin of the archive, on the day before the window
+    before = since.replace(tzinfo=timezone.utc) - timedelta(hours=12)
+    path = mbox(
+        tmp_path,
+        message("[Sauvegarde] Acme old", before),
+        message("[Sauvegarde] Acme new", NOW),
+    )
+    monitor = Monitor(
+        ClientService(Config(config_file)), email_clients=[ArchiveSource(path)]
+    )
+
+    emails = monitor.get_emails(since=since)
+
+    assert [email.subject for email in emails] == ["[Sauvegarde] Acme new"]
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+from fake_servers import FakeIMAPServer, build_mailbox
+import pytest
+
+from email_monitor.cache import MailboxCache
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.monitor import EmailClient, Monitor
+
+from tests.conftest import CLIENTS
+
+EXTENSIONS = ("IMAP4rev1", "IDLE", "UIDPLUS", "ENABLE", "CONDSTORE", "QRESYNC")
+
+
+def backup_uids(server, since=None):
+    return [
+        m.uid
+        for m in server.mailbox.messages
+        if "sauvegarde" in m.subject.lower()
+        and (since is None or m.date.date() >= since.date())
+    ]
+
+
+def cached_uids(cache):
+    return [uid for (uid,) in cache._db.execute("SELECT uid FROM emails ORDER BY uid")]
+
+
+def test_sync_only_searches_new_uids(tmp_path, imap_server, connect):
+    cache = MailboxCache(tmp_path / "cache.sqlite3")
+    email_client = connect(imap_server)
+    email_client.select_mailbox()
+
+    assert cache.sync(email_client) == len(backup_uids(imap_server))
+
+    message = imap_server.deliver("[Sauvegarde] Acme - success", "b@example.com")
+    email_client.select_mailbox()
+
+    assert cache.sync(email_client) == 1
+    assert cached_uids(cache)[-1] == message.uid
+
+
+def test_sync_resets_on_uidvalidity_change(tmp_path, imap_server, connect):
+    cache = MailboxCache(tmp_path / "cache.sqlite3")
+    email_client = connect(imap_server)
+    email_client.select_mailbox()
+    cache.sync(email_client)
+    cache._db.execute("UPDATE emails SET subject = 'stale'")
+
+    imap_server.reset_uidvalidity(2)
+    email_client.select_mailbox()
+    cache.sync(email_client)
+
+    subjects = [
+        subject for (subject,) in cache._db.execute("SELECT subject FROM emails")
+    ]
+    assert "stale" not in subjects
+    assert cached_uids(cache) == backup_uids(imap_server)
+
+
+def test_sync_backfills_an_older_window(tmp_path, imap_server, connect):
+    cache = MailboxCache(tmp_path / "cache.sqlite3")
+    email_client = connect(imap_server)
+    email_client.select_mailbox()
+    recent = datetime.now() - timedelta(days=2)
+    older = datetime.now() - timedelta(days=5)
+
+    cache.sync(email_client, since=recent)
+    assert cached_uids(cache) == backup_uids(imap_server, recent)
+
+    cache.sync(email_client, since=older)
+    assert cached_uids(cache) == backup_uids(imap_server, older)
+
+
+def test_monitor_keeps_the_days_of_the_window(config_file, imap_server, connect):
+    app_config = Config(config_file)
+    cache = MailboxCache(app_config.get_cache_file())
+    monitor = Monitor(
+        ClientService(app_config), email_client=connect(imap_server), cache=cache
+    )
+    since = datetime.now() - timedelta(days=3)
+    # The cache now holds the days before the window
+    monitor.get_emails(since=since - timedelta(days=2), until=datetime.now())
+
+    emails = monitor.get_emails(since=since, until=datetime.now())
+
+    assert emails
+    assert min(email.date.date() for email in emails) == since.date()
+    assert [email.uid for email in emails] == backup_uids(imap_server, since)
+
+
+def test_read_survives_a_sync_of_another_mailbox(tmp_path, imap_server, connect):
+    cache = MailboxCache(tmp_path / "cache.sqlite3")
+    inbox = connect(imap_server)
+    inbox.select_mailbox()
+    cache.sync(inbox)
+    other = connect(imap_server)
+    other.select_mailbox()
+    other.mailbox = "Archives"
+
+    emails = cache.iter_emails(inbox.account, "INBOX")
+    first = next(emails)
+    # Commits on the shared connection while the reader's cursor is open
+    cache.sync(other)
+
+    uids = [first.uid, *(email.uid for email in emails)]
+    assert sorted(uids) == backup_uids(imap_server)
+
+
+@pytest.fixture
+def modseq_server():
+    with FakeIMAPServer(build_mailbox(200, CLIENTS), capabilities=EXTENSIONS) as server:
+        yield server
+
+
+def test_sync_skips_an_unchanged_mailbox(tmp_path, modseq_server, connect):
+    cache = MailboxCache(tmp_path / "cache.sqlite3")
+    email_client = connect(modseq_server)
+    email_client.select_mailbox()
+    cache.sync(email_client)
+    searches = modseq_server.counters.commands["UID SEARCH"]
+
+    assert email_client.qresync
+    assert cache.sync(email_client) == 0
+    assert modseq_server.counters.commands["UID SEARCH"] == searches
+    # The selected mailbox is selected again, never asked with STATUS
+    assert "STATUS" not in modseq_server.counters.commands
+
+
+def test_sync_sees_the_changes_without_reselecting(tmp_path, modseq_server, connect):
+    cache = MailboxCache(tmp_path / "cache.sqlite3")
+    email_client = connect(modseq_server)
+    email_client.select_mailbox()
+    cache.sync(email_client)
+    expunged = backup_uids(modseq_server)[:3]
+
+    modseq_server.expunge(expunged)
+    message = modseq_server.deliver("[Sauvegarde] Acme - success", "b@example.com")
+
+    assert cache.sync(email_client) == 1
+    assert cached_uids(cache) == backup_uids(modseq_server)
+    assert message.uid in cached_uids(cache)
+
+
+@pytest.mark.parametrize(
+    "message_set, ids",
+    [(b"1:4,7", [1, 2, 3, 4, 7]), ("9", [9]), ("5:3", [3, 4, 5])],
+)
+def test_parse_message_set(message_set, ids):
+    assert EmailClient._parse_message_set(message_set) == ids
+    assert EmailClient._parse_message_set(EmailClient._message_set(ids)) == ids
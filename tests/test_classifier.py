@@ -0,0 +1,56 @@
+import pytest
+
+from email_monitor.classifier import StatusClassifier, fold
+
+
+@pytest.mark.parametrize(
+    "text, folded",
+    [
+        ("Succès", "succes"),
+        ("RÉUSSI", "reussi"),
+        ("Backup OK", "backup ok"),
+        # No ASCII base letter, dropped
+        ("ok ✓", "ok "),
+    ],
+)
+def test_fold(text, folded):
+    assert fold(text) == folded
+
+
+@pytest.mark.parametrize(
+    "subject, status",
+    [
+        ("[Sauvegarde] Acme - SUCCÈS", "success"),
+        ("[Sauvegarde] Acme - succes", "success"),
+        ("[Sauvegarde] Acme - success with warning", "success"),
+        ("[Sauvegarde] Acme - Warning", "warning"),
+        ("[Sauvegarde] Acme - échec", "failure"),
+    ],
+)
+def test_default_keywords(subject, status):
+    assert StatusClassifier().classify(subject) == status
+
+
+def test_client_overrides_keep_the_global_list_left_to_none():
+    classifier = StatusClassifier(
+        ["success"],
+        ["warning"],
+        {
+            "Acme": {"success": ["terminé"], "warning": None},
+            "Globex": {"success": None, "warning": None},
+        },
+    )
+
+    assert classifier.classify("Sauvegarde terminee", "Acme") == "success"
+    assert classifier.classify("Sauvegarde success", "Acme") == "failure"
+    assert classifier.classify("Sauvegarde warning", "Acme") == "warning"
+    assert classifier.classify("Sauvegarde terminée", "Globex") == "failure"
+    assert classifier.classify("Sauvegarde terminée") == "failure"
+    assert "Globex" not in classifier.rules
+
+
+def test_blank_keywords_are_ignored():
+    classifier = StatusClassifier(["", "  ", "ok"], [])
+
+    assert classifier.classify("Sauvegarde échouée") == "failure"
+    assert classifier.classify("Sauvegarde ok") == "success"
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from email_monitor.clients import Client, ClientMatcher, ClientService
+from email_monitor.conifg import Config
+from email_monitor.monitor import Monitor
+
+
+def matcher(*names, match_sender=False):
+    clients = [
+        Client(name=name, email=f"client{index}@example.com")
+        for index, name in enumerate(names)
+    ]
+
+    return ClientMatcher(clients, match_sender=match_sender)
+
+
+@pytest.mark.parametrize(
+    "subject, client",
+    [
+        ("[Sauvegarde] Client 1 - success", "Client 1"),
+        ("[Sauvegarde] Client 10 - success", "Client 10"),
+        ("[Sauvegarde] client 10 job 1 - success", "Client 10"),
+        ("[Sauvegarde] Client 2 - success", None),
+    ],
+)
+def test_longest_name_wins(subject, client):
+    assert matcher("Client 1", "Client 10").match(subject) == client
+
+
+@pytest.mark.parametrize(
+    "subject, client",
+    [
+        # Punctuation is ignored, in the names and the subjects
+        ("[Sauvegarde] A&B - success", "A&B"),
+        ("[Sauvegarde] A B - success", "A&B"),
+        # A name inside a longer word isn't found, unlike a substring search
+        ("[Sauvegarde] AcmeCorp - success", None),
+        ("[Sauvegarde] Acme-Corp - success", "Acme"),
+    ],
+)
+def test_names_are_matched_word_by_word(subject, client):
+    assert matcher("A&B", "Acme").match(subject) == client
+
+
+def test_name_without_word_never_matches():
+    assert matcher("---").match("[Sauvegarde] --- success") is None
+
+
+def test_sender_is_only_a_fallback():
+    clients = matcher("Acme", "Globex", match_sender=True)
+
+    assert clients.match("Sauvegarde ok", "Backup <CLIENT1@example.com>") == "Globex"
+    assert clients.match("Sauvegarde Acme", "client1@example.com") == "Acme"
+    assert matcher("Acme").match("Sauvegarde ok", "client0@example.com") is None
+
+
+def test_monitor_reads_match_sender_from_config(config_file, imap_server):
+    config = json.loads(config_file.read_text())
+
+    for match_sender, client in [(False, None), (True, "Acme")]:
+        config["match_sender"] = match_sender
+        config_file.write_text(json.dumps(config))
+        monitor = Monitor(ClientService(Config(config_file)))
+
+        assert monitor.matcher.match("Sauvegarde ok", "backup-acme@example.com") == (
+            client
+        )
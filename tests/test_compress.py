@@ -0,0 +1,62 @@
+import socket
+import zlib
+
+import pytest
+
+from email_monitor.compress import DeflateStream
+
+
+@pytest.fixture
+def streams():
+    """A DeflateStream and the raw socket of the other end"""
+    client, server = socket.socketpair()
+    stream = DeflateStream(client, client.makefile("rb"))
+
+    yield stream, server
+
+    stream.close()
+    stream.close()
+    server.close()
+
+
+def deflate(*chunks: bytes) -> bytes:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+    return b"".join(
+        compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        for chunk in chunks
+    )
+
+
+def test_reads_lines_and_literals(streams):
+    stream, server = streams
+    literal = bytes(range(256)) * 40
+    server.sendall(
+        deflate(b"* 1 FETCH (BODY[] {10240}\r\n", literal + b")\r\n", b"A1 OK done\r\n")
+    )
+
+    assert stream.readline() == b"* 1 FETCH (BODY[] {10240}\r\n"
+    assert stream.read(len(literal)) == literal
+    assert stream.readline() == b")\r\n"
+    assert stream.readline(4) == b"A1 O"
+    assert stream.readline() == b"K done\r\n"
+
+
+def test_commands_are_flushed_one_by_one(streams):
+    stream, server = streams
+    decompressor = zlib.decompressobj(-15)
+
+    stream.sendall(b"A1 NOOP\r\n")
+    assert decompressor.decompress(server.recv(1024)) == b"A1 NOOP\r\n"
+
+    stream.sendall(b"A2 LOGOUT\r\n")
+    assert decompressor.decompress(server.recv(1024)) == b"A2 LOGOUT\r\n"
+
+
+def test_end_of_stream(streams):
+    stream, server = streams
+    server.sendall(deflate(b"* BYE"))
+    server.shutdown(socket.SHUT_WR)
+
+    assert stream.readline() == b"* BYE"
+    assert stream.read(10) == b""
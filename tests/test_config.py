@@ -0,0 +1,64 @@
+import json
+import os
+
+from email_monitor.conifg import Config
+
+
+def rewrite(path, config, mtime_ns):
+    path.write_text(json.dumps(config))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_file_is_parsed_again_only_when_it_changes(config_file, monkeypatch):
+    config = json.loads(config_file.read_text())
+    mtime_ns = config_file.stat().st_mtime_ns
+    app_config = Config(config_file)
+    reads = []
+    read_config = Config._read_config
+
+    def counted(self):
+        reads.append(self)
+        return read_config(self)
+
+    monkeypatch.setattr(Config, "_read_config", counted)
+    settings = app_config.settings
+
+    assert app_config.settings is settings
+    assert app_config.clients is settings.clients
+    assert reads == []
+
+    # Same mtime, other size
+    config["report_recipients"] = ["admin@example.com"]
+    rewrite(config_file, config, mtime_ns)
+
+    assert app_config.get_report_recipients() == ["admin@example.com"]
+    assert len(reads) == 1
+
+    # Same size, other mtime
+    config["report_recipients"] = ["other@example.com"]
+    rewrite(config_file, config, mtime_ns + 10**9)
+
+    assert app_config.get_report_recipients() == ["other@example.com"]
+    assert len(reads) == 2
+
+
+def test_invalid_edit_keeps_the_previous_settings(config_file, capsys):
+    config = json.loads(config_file.read_text())
+    mtime_ns = config_file.stat().st_mtime_ns
+    app_config = Config(config_file)
+    settings = app_config.settings
+
+    config_file.write_text('{"clients": "none"}')
+    os.utime(config_file, ns=(mtime_ns + 10**9,) * 2)
+
+    assert app_config.settings is settings
+    assert "keeping the previous one" in capsys.readouterr().out
+
+    # Reported once, not at every access
+    assert app_config.settings is settings
+    assert "keeping the previous one" not in capsys.readouterr().out
+
+    config["report_recipients"] = ["admin@example.com"]
+    rewrite(config_file, config, mtime_ns + 2 * 10**9)
+
+    assert app_config.get_report_recipients() == ["admin@example.com"]
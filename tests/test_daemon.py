@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+import imaplib
+
+import pytest
+
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.daemon import MonitorDaemon
+from email_monitor.monitor import EmailBackup, EmailClient, Monitor
+
+
+@pytest.mark.parametrize(
+    "error", [imaplib.IMAP4.error("IDLE refused"), imaplib.IMAP4.abort("EOF")]
+)
+def test_watch_reconnects_after_an_imap_error(config_file, imap_server, error):
+    app_config = Config(config_file)
+    monitor = Monitor(
+        ClientService(app_config),
+        email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+    )
+    daemon = MonitorDaemon(monitor, idle_timeout=0.1, poll_interval=0)
+    daemon.load()
+    email_client = monitor.email_client
+    dropped = email_client.mail
+    polls = []
+
+    def poll(email_client):
+        polls.append(email_client.mail)
+
+        if len(polls) == 1:
+            raise error
+        if len(polls) == 2:
+            raise KeyboardInterrupt
+
+        return {}
+
+    daemon.poll = poll
+
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            daemon._watch(email_client, lambda client, email: None)
+    finally:
+        monitor.logout()
+
+    assert polls[0] is dropped
+    assert polls[1] is not None and polls[1] is not dropped
+    assert dropped.sock.fileno() == -1
+
+
+def test_watch_expires_the_backups_older_than_a_day(config_file, imap_server):
+    app_config = Config(config_file)
+    monitor = Monitor(
+        ClientService(app_config),
+        email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+    )
+    daemon = MonitorDaemon(monitor, idle_timeout=0.1, poll_interval=0)
+    daemon.load()
+    now = datetime.now(timezone.utc)
+    recent = EmailBackup("[Sauvegarde] Acme - success", "b", now - timedelta(hours=1))
+    old = EmailBackup("[Sauvegarde] Globex - success", "b", now - timedelta(hours=25))
+    daemon.status = {"Acme": recent, "Globex": old, "Initech": None}
+    changes = []
+
+    def poll(email_client):
+        if changes:
+            raise KeyboardInterrupt
+
+        return {}
+
+    daemon.poll = poll
+
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            daemon._watch(monitor.email_client, lambda *change: changes.append(change))
+    finally:
+        monitor.logout()
+
+    assert changes == [("Globex", None)]
+    assert daemon.status == {"Acme": recent, "Globex": None, "Initech": None}
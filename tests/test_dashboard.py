@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from rich.console import Console
+
+from email_monitor.dashboard import StatusBoard
+from email_monitor.monitor import EmailBackup
+
+
+def render(board):
+    console = Console(width=100, record=True, color_system=None)
+    console.print(board)
+
+    return console.export_text()
+
+
+def test_only_the_updated_rows_are_rendered_again():
+    email = EmailBackup("[Sauvegarde] Acme - success", "b", datetime(2026, 10, 18, 8))
+    board = StatusBoard({"Acme": email, "Globex": email, "Initech": None})
+
+    render(board)
+    assert board.rendered_rows == 3
+
+    render(board)
+    assert board.rendered_rows == 3
+
+    board.update("Acme", None)
+    text = render(board)
+
+    assert board.rendered_rows == 4
+    acme = next(line for line in text.splitlines() if line.startswith("Acme"))
+    assert "Missing" in acme
+    assert "2/3 failing" in text
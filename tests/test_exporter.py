@@ -0,0 +1,59 @@
+import imaplib
+
+from email_monitor.exporter import BackupExporter
+
+
+class FailingMonitor:
+    def __init__(self, email_clients, error):
+        self.email_clients = email_clients
+        self.error = error
+
+    def get_last_backups(self, date):
+        raise self.error
+
+
+def test_any_error_is_counted_and_status_kept(imap_server, connect):
+    email_client = connect(imap_server)
+    exporter = BackupExporter(FailingMonitor([email_client], KeyError("subject")))
+    exporter.status = {"Acme": None}
+
+    assert not exporter.refresh()
+
+    metrics = exporter.render()
+    assert 'email_monitor_collection_errors_total{type="KeyError"} 1' in metrics
+    assert 'email_monitor_backup_status{client="Acme",status="missing"} 1' in metrics
+
+
+def test_refresh_thread_survives_an_unexpected_error(imap_server, connect):
+    monitor = FailingMonitor([connect(imap_server)], RuntimeError("bug"))
+    exporter = BackupExporter(monitor, ttl=0.01)
+
+    exporter.start()
+    exporter._stop.wait(0.2)
+    exporter.stop()
+
+    assert exporter.failures["RuntimeError"] > 1
+
+
+def test_failed_refresh_closes_the_connection(imap_server, connect):
+    email_client = connect(imap_server)
+    mail = email_client.mail
+    error = imaplib.IMAP4.abort("socket error: EOF")
+    exporter = BackupExporter(FailingMonitor([email_client], error))
+
+    exporter.refresh()
+
+    assert email_client.mail is None
+    assert mail.sock.fileno() == -1
+    assert exporter.errors == {"abort": 1}
+
+
+def test_dropped_connection_is_shut_down(imap_server, connect):
+    email_client = connect(imap_server)
+    mail = email_client.mail
+    mail.sock.shutdown(2)
+
+    email_client.disconnect()
+
+    assert email_client.mail is None
+    assert mail.sock.fileno() == -1
@@ -0,0 +1,50 @@
+from fake_servers import build_mailbox
+
+from email_monitor.smtp_client import OutgoingEmail, SMTPClient
+
+from tests.conftest import CLIENTS
+
+
+def test_build_mailbox_is_reproducible():
+    first = build_mailbox(50, CLIENTS, seed=3)
+    second = build_mailbox(50, CLIENTS, seed=3)
+
+    assert [m.subject for m in first] == [m.subject for m in second]
+    assert [m.uid for m in first] == list(range(1, 51))
+
+
+def test_imap_search_and_fetch_headers(imap_server, connect):
+    email_client = connect(imap_server)
+    email_client.select_mailbox()
+
+    uids = email_client.uid_search("ALL")
+    headers = dict(email_client.fetch_headers(uids[:3], uid=True))
+
+    assert uids == [m.uid for m in imap_server.mailbox.messages]
+    assert set(headers) == {b"1", b"2", b"3"}
+    assert headers[b"1"].startswith(b"Subject: ")
+    assert imap_server.counters.commands["UID SEARCH"] == 1
+    assert imap_server.counters.commands["UID FETCH"] == 1
+
+
+def test_delivered_message_is_searchable(imap_server, connect):
+    email_client = connect(imap_server)
+    email_client.select_mailbox()
+    message = imap_server.deliver("[Sauvegarde] Acme - success", "b@example.com")
+
+    assert email_client.uid_search("ALL")[-1] == message.uid
+
+
+def test_smtp_server_records_messages(smtp_server):
+    smtp_client = SMTPClient(
+        "127.0.0.1", smtp_server.port, "m@example.com", "x", ssl=False
+    )
+
+    [result] = smtp_client.send_many(
+        [OutgoingEmail("ops@example.com", "Rapport", "<p>ok</p>")]
+    )
+
+    assert result.ok
+    sender, recipients, data = smtp_server.messages[-1]
+    assert recipients == ["ops@example.com"]
+    assert b"Subject: Rapport" in data
@@ -0,0 +1,47 @@
+from datetime import date, datetime
+
+from email_monitor.monitor import BackupHistory, EmailBackup
+
+
+def history(statuses):
+    """History of Acme with one email per day, None for a missing day"""
+    history = BackupHistory(["Acme"], date(2026, 10, 1), date(2026, 10, len(statuses)))
+
+    for day, status in enumerate(statuses, 1):
+        if status:
+            history.add(
+                "Acme",
+                EmailBackup(
+                    f"Acme {status}", "b@example.com", datetime(2026, 10, day, 8)
+                ),
+            )
+
+    return history
+
+
+def test_streak_counts_the_last_successful_days():
+    assert history(["success", "failed", "success", "success"]).streak("Acme") == 2
+
+
+def test_streak_is_broken_by_a_missing_or_warning_day():
+    assert history(["success", "success", None]).streak("Acme") == 0
+    assert history(["success", "warning"]).streak("Acme") == 0
+
+
+def test_success_rate_counts_missing_days():
+    assert history(["success", None, "failed", "success"]).success_rate("Acme") == 0.5
+
+
+def test_last_email_of_the_day_wins():
+    backups = history(["failed"])
+    backups.add("Acme", EmailBackup("Acme success", "b", datetime(2026, 10, 1, 9)))
+    backups.add("Acme", EmailBackup("Acme failed", "b", datetime(2026, 10, 1, 7)))
+
+    assert backups.get_status("Acme", date(2026, 10, 1)) == "success"
+
+
+def test_emails_outside_the_range_are_ignored():
+    backups = history(["success"])
+
+    assert not backups.add("Acme", EmailBackup("Acme", "b", datetime(2026, 10, 2, 8)))
+    assert backups.get_status("Acme", date(2026, 10, 1)) == "success"
@@ -0,0 +1,99 @@
+"""Check the CLI import cost against a budget with ``python -X importtime``
+
+Typer (and the Rich modules it loads) is measured apart since it is out of our
+hands, the budget covers what email_monitor adds on top of it. The modules only
+some commands need must not be imported at all.
+
+    EMAIL_MONITOR_IMPORT_BUDGET_MS=50 python -m pytest tests/test_importtime.py
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+BUDGET_MS = float(os.environ.get("EMAIL_MONITOR_IMPORT_BUDGET_MS", "50"))
+RUNS = 5
+
+LAZY_MODULES = [
+    "pydantic",
+    "email_validator",
+    "imaplib",
+    "smtplib",
+    "sqlite3",
+    "email_monitor.archive",
+    "email_monitor.cache",
+    "email_monitor.classifier",
+    "email_monitor.clients",
+    "email_monitor.compress",
+    "email_monitor.daemon",
+    "email_monitor.dashboard",
+    "email_monitor.exporter",
+    "email_monitor.metrics",
+    "email_monitor.monitor",
+    "email_monitor.output",
+    "email_monitor.rendering",
+    "email_monitor.schedule",
+    "email_monitor.settings",
+    "email_monitor.smtp_client",
+    "email_monitor.snapshots",
+]
+
+LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure() -> dict:
+    """Cumulative import time in microseconds of the top level imports"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import email_monitor"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    ).stderr
+
+    modules = {}
+
+    for line in output.splitlines():
+        match = LINE_PATTERN.match(line)
+
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+
+    return modules
+
+
+@pytest.fixture(scope="module")
+def loaded_modules():
+    return subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, email_monitor; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+
+@pytest.mark.parametrize("module", LAZY_MODULES)
+def test_module_is_not_imported_at_startup(module, loaded_modules):
+    assert module not in loaded_modules
+
+
+def test_import_time_budget():
+    # Best of several runs, the first one also pays for the disk cache
+    own_costs = []
+
+    for _ in range(RUNS):
+        modules = measure()
+        own_costs.append(modules["email_monitor"] - modules.get("typer", 0))
+
+    own_cost_ms = min(own_costs) / 1000
+
+    assert own_cost_ms <= BUDGET_MS, f"email_monitor on top of typer: {own_cost_ms} ms"
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+from fake_servers import FakeIMAPServer, build_mailbox
+import pytest
+
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.metrics import (
+    TextPart,
+    _join_literals,
+    find_text_part,
+    parse_duration,
+    parse_size,
+    with_metrics,
+)
+from email_monitor.monitor import EmailClient, Monitor
+
+from tests.conftest import CLIENTS
+
+
+@pytest.mark.parametrize(
+    "value, size",
+    [
+        ("12 GB", 12 * 1024**3),
+        ("1,5 Go", int(1.5 * 1024**3)),
+        ("1.5 GiB", int(1.5 * 1024**3)),
+        ("123,456", 123456),
+        ("512 KB", 512 * 1024),
+        ("lots", None),
+    ],
+)
+def test_parse_size(value, size):
+    assert parse_size(value) == size
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [
+        ("0:02:03", 123.0),
+        ("1:00:00", 3600.0),
+        ("1 hour 2 mins 3 secs", 3723.0),
+        ("45s", 45.0),
+        ("soon", None),
+    ],
+)
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_find_text_part_prefers_plain_and_skips_attachments():
+    html = ["text", "html", ["charset", "iso-8859-1"], None, None, "qp", 10, 1]
+    plain = ["text", "plain", ["charset", "utf-8"], None, None, "base64", 10, 1]
+    log = ["text", "plain", None, None, None, "7bit", 10, 1, None, ["attachment"]]
+
+    alternative = [plain, html, "alternative"]
+
+    assert find_text_part([[html, log, "mixed"], log, "mixed"]) == TextPart(
+        "1.1", "html", "qp", "iso-8859-1"
+    )
+    assert find_text_part([alternative, log, "mixed"]) == TextPart(
+        "1.1", "plain", "base64", "utf-8"
+    )
+    assert find_text_part(plain) == TextPart("1", "plain", "base64", "utf-8")
+    assert find_text_part([log, "mixed"]) is None
+
+
+def test_join_literals_splits_responses_starting_with_a_literal():
+    data = [
+        (b'1 (UID 7 BODYSTRUCTURE ("text" {5}', b"plain"),
+        b' NIL NIL "7bit" 5 1))',
+        (b'2 (UID 8 BODYSTRUCTURE ("text" {4}', b"html"),
+        b' NIL NIL "7bit" 4 1))',
+        b'3 (UID 9 BODYSTRUCTURE ("text" "plain" NIL NIL "7bit" 3 1))',
+    ]
+
+    responses = list(_join_literals(data))
+
+    assert len(responses) == 3
+    assert responses[0].startswith(b"1 (UID 7") and b'"plain"' in responses[0]
+    assert responses[1].startswith(b"2 (UID 8") and b'"html"' in responses[1]
+    assert responses[2].startswith(b"3 (UID 9")
+
+
+def test_metrics_of_several_mailboxes_streamed(config_file):
+    end = datetime.now(timezone.utc)
+    mailboxes = [
+        build_mailbox(40, CLIENTS, end=end, span=timedelta(hours=20), seed=seed)
+        for seed in (1, 2)
+    ]
+
+    with FakeIMAPServer(mailboxes[0]) as first, FakeIMAPServer(mailboxes[1]) as second:
+        for mailbox in mailboxes:
+            for message in mailbox:
+                message.body = (
+                    b"Veeam Backup\r\nTransferred 2.0 GB\r\nDuration 0:01:00\r\n"
+                )
+
+        monitor = Monitor(
+            ClientService(Config(config_file)),
+            email_clients=[
+                EmailClient("m@example.com", "x", "127.0.0.1", server.port, ssl=False)
+                for server in (first, second)
+            ],
+        )
+
+        try:
+            backups = list(with_metrics(monitor.iter_backups(end), batch_size=3))
+        finally:
+            monitor.logout()
+
+        assert backups
+        assert all(email.metrics.size == 2 * 1024**3 for _, email in backups)
+        # The search and the metrics each on their own connection
+        assert first.counters.connections == second.counters.connections == 2
@@ -0,0 +1,232 @@
+from datetime import datetime
+import imaplib
+import socket
+import threading
+import time
+
+from fake_servers import FakeIMAPServer, build_mailbox
+import pytest
+
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.monitor import (
+    MAX_SUBJECT_TERMS,
+    EmailClient,
+    Monitor,
+    ParsePool,
+    _merge,
+)
+
+from tests.conftest import CLIENTS
+
+
+def failing():
+    yield 1
+    raise ValueError("mailbox gone")
+
+
+def test_merge_yields_every_item():
+    sources = [iter(range(0, 50)), iter(range(50, 120)), iter([])]
+
+    assert sorted(_merge(sources, max_workers=2)) == list(range(120))
+
+
+def test_merge_raises_the_error_of_a_source():
+    with pytest.raises(ValueError, match="mailbox gone"):
+        list(_merge([iter(range(10)), failing()], max_workers=2))
+
+
+def test_merge_stops_the_producers_with_the_consumer():
+    consumed = []
+
+    def endless():
+        index = 0
+
+        while True:
+            consumed.append(index)
+            yield index
+            index += 1
+
+    merged = _merge([endless()], max_workers=1)
+    next(merged)
+    merged.close()
+    time.sleep(0.3)
+    stopped_at = len(consumed)
+    time.sleep(0.3)
+
+    assert len(consumed) == stopped_at
+
+
+def test_mailboxes_share_one_parse_pool(config_file):
+    with FakeIMAPServer(build_mailbox(300, CLIENTS, seed=1)) as first, FakeIMAPServer(
+        build_mailbox(300, CLIENTS, seed=2)
+    ) as second, ParsePool(2) as pool:
+        found = {}
+
+        for shared in (None, pool):
+            monitor = Monitor(
+                ClientService(Config(config_file)),
+                email_clients=[
+                    EmailClient(
+                        "m@example.com",
+                        "x",
+                        "127.0.0.1",
+                        server.port,
+                        fetch_chunk_size=50,
+                        ssl=False,
+                        pool=shared,
+                    )
+                    for server in (first, second)
+                ],
+            )
+
+            try:
+                found[shared] = sorted(
+                    (email.source.port, email.uid) for email in monitor.iter_emails()
+                )
+            finally:
+                monitor.logout()
+
+        assert found[pool] and found[pool] == found[None]
+
+
+@pytest.fixture
+def idle_server():
+    """Server answering IDLE with its continuation and EXISTS in one write"""
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        connection, _ = listener.accept()
+
+        with connection, connection.makefile("rb") as lines:
+            connection.sendall(b"* OK ready\r\n")
+            tag = b""
+
+            for line in lines:
+                if line.strip().upper() == b"DONE":
+                    connection.sendall(tag + b" OK IDLE terminated\r\n")
+                    continue
+
+                tag, command = line.split()[:2]
+
+                if command.upper() == b"CAPABILITY":
+                    connection.sendall(
+                        b"* CAPABILITY IMAP4rev1 IDLE\r\n" + tag + b" OK done\r\n"
+                    )
+                elif command.upper() == b"IDLE":
+                    connection.sendall(b"+ idling\r\n* 5 EXISTS\r\n")
+                else:
+                    connection.sendall(b"* BYE\r\n" + tag + b" OK done\r\n")
+                    return
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+
+    with listener:
+        yield listener.getsockname()[1]
+
+    thread.join(1)
+
+
+def test_idle_sees_the_lines_buffered_with_the_continuation(idle_server):
+    email_client = EmailClient("m@example.com", "x", "127.0.0.1", idle_server)
+    email_client.mail = imaplib.IMAP4("127.0.0.1", idle_server)
+    start = time.monotonic()
+
+    assert email_client.wait_for_new_emails(timeout=3)
+    assert time.monotonic() - start < 1
+    email_client.logout()
+
+
+@pytest.mark.parametrize(
+    "capabilities",
+    [("IMAP4rev1", "IDLE"), ("IMAP4rev1", "IDLE", "COMPRESS=DEFLATE")],
+)
+def test_idle_timeout_keeps_the_connection_usable(capabilities, connect):
+    with FakeIMAPServer(
+        build_mailbox(20, CLIENTS), capabilities=capabilities
+    ) as server:
+        email_client = connect(server)
+        email_client.select_mailbox()
+
+        assert not email_client.wait_for_new_emails(timeout=0.3)
+
+        message = server.deliver("[Sauvegarde] Acme - success", "b@example.com")
+
+        assert email_client.wait_for_new_emails(timeout=3)
+        assert email_client.uid_search("ALL")[-1] == message.uid
+
+
+def test_uid_sent_after_the_literal(capsys):
+    data = [
+        (b"1 (UID 5 BODY[HEADER.FIELDS (SUBJECT)] {14}", b"Subject: one\r\n"),
+        b")",
+        (b"2 (BODY[HEADER.FIELDS (SUBJECT)] {14}", b"Subject: two\r\n"),
+        b" UID 9)",
+        (b"3 (BODY[HEADER.FIELDS (SUBJECT)] {16}", b"Subject: three\r\n"),
+        b")",
+    ]
+
+    assert EmailClient._headers_by_uid(data) == [
+        (b"5", b"Subject: one\r\n"),
+        (b"9", b"Subject: two\r\n"),
+    ]
+    assert "without UID" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "names, expected",
+    [
+        (["Acme"], 'SUBJECT "Acme"'),
+        (["Acme", "Globex"], 'OR SUBJECT "Acme" SUBJECT "Globex"'),
+        (
+            ["Acme", "Globex", "Initech"],
+            'OR OR SUBJECT "Acme" SUBJECT "Globex" SUBJECT "Initech"',
+        ),
+    ],
+)
+def test_client_names_are_ored_in_prefix_notation(names, expected):
+    assert EmailClient._get_subject_terms("Sauvegarde", names) == [
+        'SUBJECT "Sauvegarde"',
+        expected,
+    ]
+
+
+def test_ored_names_find_the_emails_of_these_clients(imap_server, connect):
+    email_client = connect(imap_server)
+    email_client.select_mailbox()
+    query = EmailClient.get_subject_imap_query("Sauvegarde", ["Acme", "Initech"])
+
+    uids = email_client.uid_search(query)
+
+    assert uids == [
+        message.uid
+        for message in imap_server.mailbox.messages
+        if "Sauvegarde" in message.subject
+        and ("Acme" in message.subject or "Initech" in message.subject)
+    ]
+
+
+def test_non_ascii_values_are_left_out():
+    assert EmailClient._get_subject_terms("Sauvegardé", ["Acme"]) == ['SUBJECT "Acme"']
+    assert EmailClient._get_subject_terms("Sauvegarde", ["Acme", "Société"]) == [
+        'SUBJECT "Sauvegarde"'
+    ]
+    assert EmailClient.get_subject_imap_query("Sauvegardé", ["Crédit"]) == "ALL"
+
+
+def test_too_many_names_fall_back_to_the_criteria():
+    names = [f"Client{index}" for index in range(MAX_SUBJECT_TERMS + 1)]
+
+    assert EmailClient._get_subject_terms("Sauvegarde", names) == [
+        'SUBJECT "Sauvegarde"'
+    ]
+    assert len(EmailClient._get_subject_terms("Sauvegarde", names[:-1])) == 2
+
+
+def test_before_is_the_day_after_until():
+    query = EmailClient.get_since_imap_query(
+        datetime(2026, 10, 1), until=datetime(2026, 10, 31, 23, 59)
+    )
+
+    assert query == '(SINCE "01-Oct-2026" BEFORE "01-Nov-2026")'
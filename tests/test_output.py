@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from email_monitor import app
+from email_monitor.output import RecordWriter, write_records
+
+RECORDS = [{"sender": "b@example.com", "subject": "Acme, ok", "date": "2026-10-17"}]
+COLUMNS = ["sender", "subject", "date"]
+
+
+def written(output_format):
+    stream = io.BytesIO()
+    write_records(iter(RECORDS * 2), output_format, COLUMNS, stream)
+
+    return stream.getvalue().decode()
+
+
+def test_json_is_one_valid_array():
+    assert json.loads(written("json")) == RECORDS * 2
+
+
+def test_jsonl_has_one_record_per_line():
+    lines = written("jsonl").splitlines()
+
+    assert [json.loads(line) for line in lines] == RECORDS * 2
+
+
+def test_csv_quotes_the_commas():
+    assert written("csv").splitlines() == [
+        "sender,subject,date",
+        'b@example.com,"Acme, ok",2026-10-17',
+        'b@example.com,"Acme, ok",2026-10-17',
+    ]
+
+
+def test_record_writer_is_abstract():
+    with pytest.raises(TypeError):
+        RecordWriter(io.BytesIO(), COLUMNS)
+
+
+def test_warnings_go_to_stderr_with_records_on_stdout(tmp_path, config_file):
+    archive = tmp_path / "archive.mbox"
+    archive.write_text(
+        "From x Sat Oct 17 08:00:00 2026\n"
+        "Subject: [Sauvegarde] Acme success\nFrom: b@example.com\n"
+        "Date: Sat, 17 Oct 2026 08:00:00 +0000\n\n"
+        "From x Sat Oct 17 09:00:00 2026\n"
+        "Subject: [Sauvegarde] Acme broken\nFrom: b@example.com\nDate: someday\n\n"
+    )
+
+    result = CliRunner(mix_stderr=False).invoke(
+        app,
+        ["emails", "--config", str(config_file), "--archive", str(archive)]
+        + ["--format", "jsonl"],
+    )
+
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [record["subject"] for record in records] == ["[Sauvegarde] Acme success"]
+    assert "Skipping email" in result.stderr
+
+
+@pytest.mark.parametrize("command", ["emails", "backups"])
+def test_unknown_format_is_a_usage_error(config_file, command):
+    result = CliRunner(mix_stderr=False).invoke(
+        app, [command, "--config", str(config_file), "--format", "xml"]
+    )
+
+    assert result.exit_code == 2
+    assert "xml isn't one of" in result.stderr
+
+
+def test_history_table_rejects_metrics(config_file):
+    result = CliRunner(mix_stderr=False).invoke(
+        app,
+        ["backups", "--config", str(config_file), "--from", "01-10-2026"]
+        + ["--metrics"],
+    )
+
+    assert result.exit_code == 2
+    assert "the history table has no metrics" in result.stderr
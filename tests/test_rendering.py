@@ -0,0 +1,51 @@
+from datetime import datetime
+import io
+
+from email_monitor import rendering
+from email_monitor.monitor import EmailBackup
+from email_monitor.rendering import (
+    Cell,
+    ReportTable,
+    render,
+    results_report,
+    write_html,
+)
+
+
+def test_subject_and_client_are_escaped_in_html():
+    email = EmailBackup(
+        "[Sauvegarde] <script>alert(1)</script> & co - success",
+        "b",
+        datetime(2026, 10, 18, 8),
+    )
+    table = results_report({"Tom & <b>Jerry</b>": [email]})
+    stream = io.StringIO()
+
+    write_html(table, stream)
+    html = stream.getvalue()
+
+    assert "<script>" not in html
+    assert "&lt;script&gt;alert(1)&lt;/script&gt; &amp; co" in html
+    assert "<td>Tom &amp; &lt;b&gt;Jerry&lt;/b&gt;</td>" in html
+    assert '<td class="success">Success</td>' in html
+
+
+def test_render_returns_the_cached_result_for_an_equal_table(monkeypatch):
+    monkeypatch.setattr(rendering, "_cache", type(rendering._cache)())
+    calls = []
+
+    def write(table, stream):
+        calls.append(table)
+        stream.write(table.title)
+
+    monkeypatch.setitem(rendering.WRITERS, "html", write)
+
+    first = render(ReportTable("Rapport", ["Client"], [[Cell("Acme", "success")]]))
+    second = render(ReportTable("Rapport", ["Client"], [[Cell("Acme", "success")]]))
+
+    assert second is first
+    assert len(calls) == 1
+
+    render(ReportTable("Rapport", ["Client"], [[Cell("Acme", "failure")]]))
+
+    assert len(calls) == 2
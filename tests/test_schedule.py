@@ -0,0 +1,80 @@
+from datetime import datetime
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from email_monitor.schedule import CronExpression, Scheduler, Snapshot
+
+
+@pytest.mark.parametrize(
+    "expression, date, matches",
+    [
+        ("*/15 8-18 * * mon-fri", datetime(2026, 11, 2, 8, 45), True),
+        ("*/15 8-18 * * mon-fri", datetime(2026, 11, 2, 8, 50), False),
+        ("*/15 8-18 * * mon-fri", datetime(2026, 11, 1, 8, 45), False),
+        ("0 8 1,15 * *", datetime(2026, 11, 15, 8, 0), True),
+        ("0 8 * jan,dec 7", datetime(2026, 12, 6, 8, 0), True),
+        ("@daily", datetime(2026, 11, 3, 0, 0), True),
+        ("@daily", datetime(2026, 11, 3, 0, 1), False),
+        # Both restricted, either one is enough
+        ("0 8 1 * mon", datetime(2026, 11, 2, 8, 0), True),
+        ("0 8 1 * mon", datetime(2026, 11, 1, 8, 0), True),
+        # A day field starting with * is unrestricted, the weekday must match
+        ("0 8 */2 * mon", datetime(2026, 11, 3, 8, 0), False),
+        ("0 8 */2 * mon", datetime(2026, 11, 9, 8, 0), True),
+        ("0 8 */2 * mon", datetime(2026, 11, 2, 8, 0), False),
+    ],
+)
+def test_cron_matches(expression, date, matches):
+    assert CronExpression(expression).matches(date) is matches
+
+
+@pytest.mark.parametrize(
+    "expression", ["0 8 * *", "60 * * * *", "* * 0 * *", "*/0 * * * *", "0 8 * * xyz"]
+)
+def test_invalid_cron(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_run_survives_a_failing_tick(monkeypatch):
+    ticks = []
+
+    def sleep(seconds):
+        if len(ticks) == 2:
+            raise KeyboardInterrupt
+
+    def run_jobs(jobs, tick):
+        ticks.append(tick)
+        raise KeyError("clients")
+
+    scheduler = Scheduler(None, None, None)
+    monkeypatch.setattr(time, "sleep", sleep)
+    monkeypatch.setattr(scheduler, "due_jobs", lambda tick: ["job"])
+    monkeypatch.setattr(scheduler, "run_jobs", run_jobs)
+
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run()
+
+    assert len(ticks) == 2
+
+
+def test_collect_closes_the_dropped_connections(imap_server, connect):
+    email_client = connect(imap_server)
+    dropped = email_client.mail
+    calls = []
+
+    def collect():
+        calls.append(email_client.mail)
+
+        if len(calls) == 1:
+            raise OSError("Connection reset by peer")
+
+        return "collected"
+
+    snapshot = Snapshot(SimpleNamespace(email_clients=[email_client]), datetime.now())
+
+    assert snapshot._collect(collect) == "collected"
+    assert calls == [dropped, None]
+    assert dropped.sock.fileno() == -1
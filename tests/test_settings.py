@@ -0,0 +1,33 @@
+import json
+
+from pydantic import ValidationError
+import pytest
+
+from email_monitor.settings import AccountSettings, Settings
+
+ACCOUNT = {"server": "imap.example.com", "email": "m@example.com", "password": "x"}
+
+
+@pytest.mark.parametrize("size", [0, -1])
+def test_fetch_chunk_size_is_positive(size):
+    with pytest.raises(ValidationError):
+        AccountSettings(**ACCOUNT, fetch_chunk_size=size)
+
+
+def test_headers_are_fetched_in_chunks(imap_server, connect):
+    email_client = connect(imap_server, fetch_chunk_size=64)
+    email_client.select_mailbox()
+    uids = email_client.uid_search("ALL")
+
+    fetched = list(email_client.fetch_headers(uids, uid=True))
+
+    assert [int(uid) for uid, _ in fetched] == uids
+    assert imap_server.counters.commands["UID FETCH"] == 4
+
+
+def test_job_names_are_unique(config_file):
+    config = json.loads(config_file.read_text())
+    config["schedule"] = [{"name": "daily", "cron": "@daily"}] * 2
+
+    with pytest.raises(ValidationError, match="unique: daily"):
+        Settings.model_validate(config)
@@ -0,0 +1,60 @@
+from fake_servers import FakeSMTPServer
+
+from email_monitor.smtp_client import OutgoingEmail, SMTPClient
+
+
+def client_of(server):
+    return SMTPClient("127.0.0.1", server.port, "monitor@example.com", ssl=False)
+
+
+def outgoing(count):
+    return [
+        OutgoingEmail(f"admin{index}@example.com", "Rapport", f"<p>{index}</p>")
+        for index in range(count)
+    ]
+
+
+def test_one_connection_sends_several_messages(smtp_server):
+    results = client_of(smtp_server).send_many(outgoing(5), max_connections=1)
+
+    assert all(result.ok for result in results)
+    assert smtp_server.counters.connections == 1
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.counters.commands["QUIT"] == 1
+
+
+def test_refused_recipient_does_not_stop_the_others():
+    emails = outgoing(4)
+
+    with FakeSMTPServer(refused=[emails[1].to_address]) as server:
+        results = client_of(server).send_many(emails, max_connections=1)
+
+    assert [result.ok for result in results] == [True, False, True, True]
+    assert "admin1@example.com" in results[1].error
+    assert [recipients for _, recipients, _ in server.messages] == [
+        ["admin0@example.com"],
+        ["admin2@example.com"],
+        ["admin3@example.com"],
+    ]
+    assert server.counters.connections == 1
+
+
+def test_results_are_in_the_order_of_the_emails(smtp_server):
+    emails = outgoing(12)
+
+    results = client_of(smtp_server).send_many(emails, max_connections=4)
+
+    assert [result.to_address for result in results] == [
+        email.to_address for email in emails
+    ]
+    assert all(result.ok for result in results)
+    assert smtp_server.counters.connections == 4
+
+
+def test_dropped_connection_is_opened_again_once():
+    with FakeSMTPServer(messages_per_connection=2) as server:
+        results = client_of(server).send_many(outgoing(3), max_connections=1)
+
+    assert all(result.ok for result in results)
+    assert len(server.messages) == 3
+    assert server.counters.connections == 2
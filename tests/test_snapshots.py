@@ -0,0 +1,114 @@
+from datetime import datetime
+import json
+
+from typer.testing import CliRunner
+
+from email_monitor import app
+from email_monitor.clients import ClientService
+from email_monitor.conifg import Config
+from email_monitor.monitor import EmailClient, Monitor
+from email_monitor.schedule import Scheduler
+from email_monitor.smtp_client import SMTPClient
+from email_monitor import snapshots
+from email_monitor.snapshots import ClientState, SnapshotStore, Transition, diff
+
+OK = ClientState("success", "[Sauvegarde] Acme - success", "2026-10-17T08:00:00")
+NEWER_OK = ClientState("success", "[Sauvegarde] Acme - success", "2026-10-18T08:00:00")
+FAILED = ClientState("failure", "[Sauvegarde] Acme - failed", "2026-10-18T08:00:00")
+MISSING = ClientState("missing")
+
+
+def test_diff_only_keeps_status_changes():
+    previous = {"Acme": OK, "Globex": OK, "Initech": MISSING}
+    current = {"Acme": NEWER_OK, "Globex": FAILED, "Initech": OK, "Umbrella": OK}
+
+    assert diff(previous, current) == [
+        Transition("Globex", OK, FAILED),
+        Transition("Initech", MISSING, OK),
+        Transition("Umbrella", None, OK),
+    ]
+
+
+def test_first_diff_is_the_full_report():
+    assert diff(None, {"Acme": OK}) == [Transition("Acme", None, OK)]
+
+
+def test_store_compares_with_the_last_snapshot_of_its_scope(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshots.sqlite3")
+
+    store.save("daily", {"Acme": OK, "Globex": MISSING})
+    store.save("daily", {"Acme": FAILED, "Globex": MISSING})
+    store.save("weekly", {"Acme": OK})
+
+    _, states = store.last("daily")
+    assert states == {"Acme": FAILED, "Globex": MISSING}
+    assert store.changes("daily", {"Acme": FAILED, "Globex": OK}) == [
+        Transition("Globex", MISSING, OK)
+    ]
+    assert store.changes("weekly", {"Acme": OK}) == []
+    assert store.last("monthly") is None
+    store.close()
+
+
+def test_store_keeps_the_last_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "KEEP_RUNS", 3)
+    store = SnapshotStore(tmp_path / "snapshots.sqlite3")
+
+    for _ in range(5):
+        store.save("daily", {"Acme": OK})
+
+    [(count,)] = store._db.execute("SELECT COUNT(*) FROM snapshots").fetchall()
+    assert count == 3
+    store.close()
+
+
+def send_report(config_file, *args):
+    return CliRunner(mix_stderr=False).invoke(
+        app,
+        ["send-report", "--config", str(config_file), "-t", "ops@example.com"]
+        + ["-s", "Rapport", *args],
+    )
+
+
+def test_only_on_change_reports_take_snapshots(config_file, smtp_server):
+    store = SnapshotStore(json.loads(config_file.read_text())["snapshot_file"])
+
+    assert send_report(config_file).exit_code == 0
+    assert store.last("send-report:Rapport") is None
+
+    assert send_report(config_file, "--on-change").exit_code == 0
+    assert store.last("send-report:Rapport") is not None
+    sent = len(smtp_server.messages)
+
+    result = send_report(config_file, "--on-change")
+    assert "No status change" in result.stdout
+    assert len(smtp_server.messages) == sent
+    store.close()
+
+
+def test_jobs_sharing_a_subject_have_their_own_snapshots(config_file, smtp_server):
+    config = json.loads(config_file.read_text())
+    config["schedule"] = [
+        {"name": name, "cron": "@daily", "to": ["ops@example.com"], "on_change": True}
+        for name in ("morning", "evening")
+    ]
+    config_file.write_text(json.dumps(config))
+    app_config = Config(config_file)
+    monitor = Monitor(
+        ClientService(app_config),
+        email_clients=EmailClient.from_configs(app_config.get_email_configs()),
+    )
+    scheduler = Scheduler(
+        monitor, app_config, SMTPClient.from_config(app_config.get_email_config())
+    )
+
+    try:
+        [morning] = scheduler.run_jobs(scheduler.get_jobs()[:1], datetime.now())
+        [evening] = scheduler.run_jobs(scheduler.get_jobs()[1:], datetime.now())
+        again = scheduler.run_jobs(scheduler.get_jobs(), datetime.now())
+    finally:
+        monitor.logout()
+        scheduler.snapshots.close()
+
+    assert morning.ok and evening.ok
+    assert again == []